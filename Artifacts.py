@@ -0,0 +1,100 @@
+import json
+import os
+import sys
+import tempfile
+import pandas as pd
+import plotly.io as pio
+
+# ======================== 1. ARTIFACT LAYOUT ========================
+
+ARTIFACTS_DIRECTORY = "artifacts"
+
+FIGURES = [f"figure{number}" for number in range(1, 16)]
+
+TABLES = ["database_revenue", "comparison_table", "optimal_price_intervals", "demand_forecast", "projected_cash_flow", "simulated_cash_flow", "liquidity_ratios", "financial_ratios"]
+
+DELIVERABLE = "Projeções.xlsx"
+
+def _write(path, write):
+    # Every file is written under a unique name beside its final one and swapped in, so neither a reader nor a
+    # concurrent build ever sees half of it
+    descriptor, temporary_path = tempfile.mkstemp(dir = os.path.dirname(path) or ".", suffix = ".tmp")
+    os.close(descriptor)
+
+    try:
+        write(temporary_path)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+def _write_text(text):
+    def write(path):
+        with open(path, "w", encoding = "utf-8") as f:
+            f.write(text)
+    return write
+
+def _write_bytes(content):
+    def write(path):
+        with open(path, "wb") as f:
+            f.write(content)
+    return write
+
+# ======================== 2. OFFLINE BUILD ========================
+
+def build_artifacts(directory = ARTIFACTS_DIRECTORY):
+    # The whole pipeline runs here, so the dashboard replicas never import pygam or statsmodels
+    import Conector as con
+
+    os.makedirs(directory, exist_ok = True)
+
+    manifest = {"fingerprint": con.data_fingerprint(), "figures": {}, "tables": {}}
+
+    for name in FIGURES:
+        file_name = f"{name}.json"
+        _write(os.path.join(directory, file_name), _write_text(pio.to_json(getattr(con, name))))
+        manifest["figures"][name] = file_name
+
+    for name in TABLES:
+        file_name = f"{name}.parquet"
+        # Row labels are kept (the cash-flow tables are indexed by rubric); a plain range index is stored as metadata only
+        _write(os.path.join(directory, file_name), lambda path: getattr(con, name).to_parquet(path))
+        manifest["tables"][name] = file_name
+
+    _write(os.path.join(directory, DELIVERABLE), _write_bytes(con.buffer_excel_formatted(con.comparison_table)))
+    manifest["deliverable"] = DELIVERABLE
+
+    # The manifest goes last: it is what marks a build as complete
+    _write(os.path.join(directory, "manifest.json"), _write_text(json.dumps(manifest, indent = 1, ensure_ascii = False)))
+
+    return manifest
+
+# ======================== 3. PRECOMPUTED SERVING ========================
+
+def load_manifest(directory = ARTIFACTS_DIRECTORY):
+    manifest_path = os.path.join(directory, "manifest.json")
+
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"Nenhum artefato encontrado em {directory}! Execute python Artifacts.py {directory}")
+
+    with open(manifest_path, encoding = "utf-8") as f:
+        return json.load(f)
+
+def load_artifact(name, directory = ARTIFACTS_DIRECTORY):
+    manifest = load_manifest(directory)
+
+    if name in manifest["figures"]:
+        with open(os.path.join(directory, manifest["figures"][name]), encoding = "utf-8") as f:
+            return pio.from_json(f.read())
+    if name in manifest["tables"]:
+        return pd.read_parquet(os.path.join(directory, manifest["tables"][name]))
+
+    raise KeyError(f"Artefato não encontrado: {name}")
+
+def load_deliverable(directory = ARTIFACTS_DIRECTORY):
+    with open(os.path.join(directory, load_manifest(directory)["deliverable"]), "rb") as f:
+        return f.read()
+
+# python Artifacts.py [diretório]
+if __name__ == "__main__":
+    build_artifacts(sys.argv[1] if len(sys.argv) > 1 else ARTIFACTS_DIRECTORY)
@@ -0,0 +1,477 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import sqlite3
+import tempfile
+import pandas as pd
+import Ingestion as ing
+
+# ======================== 1. TABLE LAYOUT ========================
+
+COLUMN_MAPS = {
+    "Receita": {
+        "Data": "date",
+        "Preço": "price",
+        "Nome do Café": "item"
+    },
+    "Despesa": {
+        "Data": "date",
+        "Insumo": "material",
+        "Quantidade Adquirida": "quantity_purchased",
+        "Custo Unitário": "unit_cost",
+        "Subtotal": "subtotal"
+    },
+    # Every column besides the heading is a period, so new quarters are read as they are added to the sheet
+    "Balanço Patrimonial": {
+        "Rubrica": "heading",
+        ing.OTHER_COLUMNS: None
+    },
+    "Quadro de Funcionários": {
+        "Data": "date",
+        "Funcionário": "employee",
+        "Cargo": "position",
+        "Salário": "wage"
+    }
+}
+
+SHEET_TABLES = {
+    "Receita": "revenue",
+    "Despesa": "expense",
+    "Balanço Patrimonial": "balance_accounts",
+    "Quadro de Funcionários": "employees"
+}
+
+COLUMN_TYPES = {
+    "revenue": dict(categories = ["item"], floats = ["price"], dates = ["date"]),
+    "expense": dict(categories = ["material"], dates = ["date"]),
+    "balance_accounts": dict(),
+    "employees": dict(categories = ["position"], dates = ["date"], date_format = "%d/%m/%Y")
+}
+
+class DataSource:
+    def __init__(self):
+        self.tables = {}
+        self.footprint = {}
+
+    def _typed(self, table):
+        # Each table is read and typed once per source; of the raw frame only its size is kept, for the memory report
+        if table not in self.tables:
+            frame = self.table(table)
+            typed = ing.compact_types(frame, **COLUMN_TYPES[table])
+            self.footprint[table] = (ing.frame_bytes(frame), ing.frame_bytes(typed))
+            self.tables[table] = typed
+        return self.tables[table]
+
+    def rows_since(self, table, offset):
+        # The rows added after the first `offset` ones; every source keeps its rows in the order they were appended
+        return self._typed(table).iloc[offset:]
+
+    def memory_report(self):
+        return ing.memory_report({table: sizes[0] for table, sizes in self.footprint.items()},
+                                 {table: sizes[1] for table, sizes in self.footprint.items()})
+
+    def revenue(self):
+        return self._typed("revenue")
+
+    def expense(self):
+        return self._typed("expense")
+
+    def balance_accounts(self):
+        return self._typed("balance_accounts")
+
+    def employees(self):
+        return self._typed("employees")
+
+    def balance_sheet(self):
+        return balance_long(self.balance_accounts())
+
+# ======================== 2. WORKBOOK SOURCE ========================
+
+class ExcelSource(DataSource):
+    # Aggregations run in pandas over the full transaction tables
+    def __init__(self, path, column_maps = COLUMN_MAPS, cache_directory = ing.CACHE_DIRECTORY):
+        super().__init__()
+        self.path = path
+        self.column_maps = column_maps
+        self.cache_directory = cache_directory
+        self._sheets = None
+
+    def table(self, table):
+        sheet_name = {name: sheet for sheet, name in SHEET_TABLES.items()}[table]
+
+        if self._sheets is None:
+            self._sheets = ing.read_workbook(self.path, self.column_maps, self.cache_directory)
+
+        # Every raw sheet is handed over once and dropped, so only the typed copy stays in memory
+        if sheet_name in self._sheets:
+            return self._sheets.pop(sheet_name)
+        return ing.read_sheet(self.path, sheet_name, self.column_maps[sheet_name], self.cache_directory)
+
+    def sales_summary(self):
+        revenue = self.revenue()
+        return revenue.groupby(["item", "price"], observed = True).size().reset_index(name = "quantity_sold")
+
+    def latest_prices(self):
+        latest = self.revenue().sort_values("date", kind = "stable").groupby("item", observed = True).tail(1)
+        return latest.set_index("item")["price"]
+
+    def daily_sales(self):
+        daily = self.revenue().groupby(["date", "item"], observed = True)["price"]
+        return pd.DataFrame({"daily_revenue": daily.sum(), "quantity_sold": daily.size()}).reset_index()
+
+    def monthly_revenue(self):
+        revenue = self.revenue()
+        monthly = revenue.groupby(pd.Grouper(key = "date", freq = "M"))["price"].sum().reset_index()
+        return monthly.rename(columns = {"price": "monthly_revenue"})
+
+    def monthly_expense(self):
+        expense = self.expense()
+        monthly = expense.groupby(pd.Grouper(key = "date", freq = "M"))["subtotal"].sum().reset_index()
+        return monthly.rename(columns = {"subtotal": "monthly_expense"})
+
+    def monthly_expense_by_material(self):
+        expense = self.expense()
+        return expense.groupby([pd.Grouper(key = "date", freq = "M"), "material"], observed = True)["subtotal"].sum().reset_index()
+
+    def daily_purchases(self):
+        return self.expense().groupby(["date", "material"], observed = True).agg({
+            "quantity_purchased": "sum",
+            "subtotal": "sum"
+        }).reset_index()
+
+EXPORT_EXTENSIONS = (".csv", ".txt", ".parquet")
+
+class ExportSource(ExcelSource):
+    # Sales come from a CSV or Parquet export streamed in chunks, so the revenue aggregates never hold the whole
+    # table at once; expenses, balance sheet and staff still come from the workbook
+    def __init__(self, path, workbook_path, column_maps = COLUMN_MAPS, cache_directory = ing.CACHE_DIRECTORY):
+        super().__init__(workbook_path, {sheet_name: column_map for sheet_name, column_map in column_maps.items() if SHEET_TABLES[sheet_name] != "revenue"}, cache_directory)
+        self.export_path = path
+        self.revenue_map = column_maps["Receita"]
+        self._aggregates = None
+
+    def table(self, table):
+        if table == "revenue":
+            return pd.concat(ing.iterate_chunks(self.export_path, self.revenue_map), ignore_index = True)
+        return super().table(table)
+
+    def rows_since(self, table, offset):
+        if table != "revenue":
+            return super().rows_since(table, offset)
+
+        # Whole chunks before the offset are skipped without being kept
+        chunks, position = [], 0
+        for chunk in ing.iterate_chunks(self.export_path, self.revenue_map):
+            if position + len(chunk) > offset or not chunks:
+                chunks.append(chunk.iloc[max(offset - position, 0):])
+            position += len(chunk)
+
+        return ing.compact_types(pd.concat(chunks, ignore_index = True), **COLUMN_TYPES[table])
+
+    def revenue_aggregates(self):
+        if self._aggregates is None:
+            self._aggregates = ing.stream_revenue_aggregates(self.export_path, self.revenue_map)
+        return self._aggregates
+
+    def sales_summary(self):
+        return self.revenue_aggregates()["sales_summary"]
+
+    def latest_prices(self):
+        return self.revenue_aggregates()["latest_prices"]
+
+    def daily_sales(self):
+        return self.revenue_aggregates()["daily_sales"]
+
+    def monthly_revenue(self):
+        return self.revenue_aggregates()["monthly_revenue"]
+
+# ======================== 3. EMBEDDED SQL SOURCES ========================
+
+class SQLSource(DataSource):
+    # Group-bys are pushed down to the engine, so only the aggregated result sets reach pandas
+    day = "date(date)"
+    month = "strftime('%Y-%m-01', date)"
+    skip = "LIMIT -1 OFFSET {}"
+
+    def __init__(self, connection):
+        super().__init__()
+        self.connection = connection
+
+    def query(self, sql):
+        return pd.read_sql_query(sql, self.connection)
+
+    def _dated(self, frame, month = False):
+        frame["date"] = pd.to_datetime(frame["date"])
+        if month:
+            frame["date"] = frame["date"] + pd.offsets.MonthEnd(0)
+        return frame
+
+    def table(self, table):
+        frame = self.query(f'SELECT * FROM "{table}"')
+        return self._dated(frame) if "date" in frame.columns else frame
+
+    def rows_since(self, table, offset):
+        frame = self.query(f'SELECT * FROM "{table}" ORDER BY rowid {self.skip.format(int(offset))}')
+        frame = self._dated(frame) if "date" in frame.columns else frame
+        return ing.compact_types(frame, **COLUMN_TYPES[table])
+
+    def sales_summary(self):
+        return self.query("""
+            SELECT item, price, COUNT(*) AS quantity_sold
+            FROM revenue GROUP BY item, price ORDER BY item, price
+        """)
+
+    def latest_prices(self):
+        latest = self.query("""
+            SELECT item, price FROM (
+                SELECT item, price, ROW_NUMBER() OVER (PARTITION BY item ORDER BY date DESC, rowid DESC) AS position
+                FROM revenue
+            ) WHERE position = 1 ORDER BY item
+        """)
+        return latest.set_index("item")["price"]
+
+    def daily_sales(self):
+        return self._dated(self.query(f"""
+            SELECT {self.day} AS date, item, SUM(price) AS daily_revenue, COUNT(*) AS quantity_sold
+            FROM revenue GROUP BY 1, 2 ORDER BY 1, 2
+        """))
+
+    def monthly_revenue(self):
+        return self._dated(self.query(f"""
+            SELECT {self.month} AS date, SUM(price) AS monthly_revenue
+            FROM revenue GROUP BY 1 ORDER BY 1
+        """), month = True)
+
+    def monthly_expense(self):
+        return self._dated(self.query(f"""
+            SELECT {self.month} AS date, SUM(subtotal) AS monthly_expense
+            FROM expense GROUP BY 1 ORDER BY 1
+        """), month = True)
+
+    def monthly_expense_by_material(self):
+        return self._dated(self.query(f"""
+            SELECT {self.month} AS date, material, SUM(subtotal) AS subtotal
+            FROM expense GROUP BY 1, 2 ORDER BY 1, 2
+        """), month = True)
+
+    def daily_purchases(self):
+        return self._dated(self.query(f"""
+            SELECT {self.day} AS date, material, SUM(quantity_purchased) AS quantity_purchased, SUM(subtotal) AS subtotal
+            FROM expense GROUP BY 1, 2 ORDER BY 1, 2
+        """))
+
+    def write(self, table, frame):
+        frame.to_sql(table, self.connection, if_exists = "replace", index = False)
+
+class SQLiteSource(SQLSource):
+    def __init__(self, path):
+        super().__init__(sqlite3.connect(path, check_same_thread = False))
+
+class DuckDBSource(SQLSource):
+    day = "CAST(date AS DATE)"
+    month = "date_trunc('month', date)"
+    skip = "OFFSET {}"
+
+    def __init__(self, path):
+        try:
+            import duckdb
+        except ImportError:
+            raise Exception("Instale o pacote duckdb para usar uma base .duckdb!")
+
+        super().__init__(duckdb.connect(path))
+
+    def query(self, sql):
+        return self.connection.execute(sql).df()
+
+    def write(self, table, frame):
+        self.connection.register("incoming_frame", frame)
+        self.connection.execute(f'CREATE OR REPLACE TABLE "{table}" AS SELECT * FROM incoming_frame')
+        self.connection.unregister("incoming_frame")
+
+# ======================== 4. SOURCE SELECTION ========================
+
+def open_source(path, column_maps = COLUMN_MAPS, cache_directory = ing.CACHE_DIRECTORY, workbook_path = None):
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension in (".xlsx", ".xlsm"):
+        return ExcelSource(path, column_maps, cache_directory)
+    if extension in EXPORT_EXTENSIONS:
+        if workbook_path is None:
+            raise ValueError(f"Informe a planilha com as demais tabelas para usar a exportação {path}!")
+        return ExportSource(path, workbook_path, column_maps, cache_directory)
+    if extension in (".sqlite", ".sqlite3", ".db"):
+        return SQLiteSource(path)
+    if extension == ".duckdb":
+        return DuckDBSource(path)
+
+    raise ValueError(f"Fonte de dados não suportada: {path}")
+
+def export_workbook(workbook_path, destination, column_maps = COLUMN_MAPS):
+    # Loads every sheet of the workbook into the embedded database, one table per sheet
+    source = open_source(destination, column_maps)
+    workbook = ing.read_workbook(workbook_path, column_maps)
+
+    for sheet_name, frame in workbook.items():
+        source.write(SHEET_TABLES[sheet_name], frame)
+
+    if isinstance(source, SQLiteSource):
+        source.connection.execute("CREATE INDEX IF NOT EXISTS revenue_date ON revenue (date, item)")
+        source.connection.execute("CREATE INDEX IF NOT EXISTS expense_date ON expense (date, material)")
+        source.connection.commit()
+
+    return source
+
+# ======================== 5. BALANCE SHEET STORE ========================
+
+BALANCE_DIRECTORY = os.path.join("data", ".balance")
+
+# "1T 2024", "2T2024", "1ºT 24" and "2024Q1", "2024-T1"
+QUARTER_PATTERNS = [
+    (re.compile(r"^([1-4])\s*[ºª°o]?\s*T\s*(\d{4}|\d{2})$", re.IGNORECASE), lambda match: (match.group(2), match.group(1))),
+    (re.compile(r"^(\d{4})\s*[-/ ]?\s*[QT]\s*([1-4])$", re.IGNORECASE), lambda match: (match.group(1), match.group(2)))
+]
+
+BALANCE_COLUMNS = ["year", "quarter", "period", "line", "heading", "value"]
+
+def quarter_key(label):
+    # (year, quarter) of a period header, which sorts in calendar order; None when the column is not a quarter
+    text = str(label).strip()
+
+    for pattern, parts in QUARTER_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            year, quarter = (int(part) for part in parts(match))
+            return (year + 2000 if year < 100 else year, quarter)
+
+    return None
+
+def quarter_label(year, quarter):
+    return f"{quarter}T {year}"
+
+def balance_long(balance_accounts):
+    # One row per (heading, period); line keeps the sheet order of the headings
+    keys = {column: quarter_key(column) for column in balance_accounts.columns if column != "heading"}
+    periods = [column for column, key in keys.items() if key is not None]
+
+    long = balance_accounts.reset_index(drop = True).rename_axis("line").reset_index()
+    long = long.melt(id_vars = ["line", "heading"], value_vars = periods, var_name = "column", value_name = "value")
+
+    long["year"] = long["column"].map(lambda column: keys[column][0])
+    long["quarter"] = long["column"].map(lambda column: keys[column][1])
+    long["period"] = [quarter_label(year, quarter) for year, quarter in zip(long["year"], long["quarter"])]
+    long["value"] = pd.to_numeric(long["value"], errors = "coerce").astype(float)
+
+    # The same quarter written two ways keeps its rightmost column
+    long = long.drop_duplicates(["year", "quarter", "heading"], keep = "last")
+
+    return long.sort_values(["year", "quarter", "line"], ignore_index = True)[BALANCE_COLUMNS]
+
+def _quarter_hash(frame):
+    # Content of one quarter including the line of every heading, since matrix() orders the headings by it: moving
+    # rows in the sheet rewrites the quarters, so the stored order never goes stale
+    rows = pd.util.hash_pandas_object(frame[BALANCE_COLUMNS].reset_index(drop = True), index = False)
+    return hashlib.sha256(rows.values.tobytes()).hexdigest()
+
+class BalanceStore:
+    # One parquet file per quarter plus a manifest with the content hash of each: a sync writes only the quarters
+    # that are new or restated, drops the ones gone from the source, and a range query reads only its quarters
+    def __init__(self, directory = BALANCE_DIRECTORY):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key[0]}T{key[1]}.parquet")
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    def _replace(self, path, write):
+        # Written under a unique temporary name and swapped in, so concurrent syncs never share or expose a partial file
+        descriptor, temporary_path = tempfile.mkstemp(dir = self.directory, suffix = ".tmp")
+        os.close(descriptor)
+
+        try:
+            write(temporary_path)
+            os.replace(temporary_path, path)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def manifest(self):
+        try:
+            with open(self._manifest_path(), encoding = "utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def periods(self):
+        if not os.path.isdir(self.directory):
+            return []
+
+        keys = [quarter_key(name[:-len(".parquet")]) for name in os.listdir(self.directory) if name.endswith(".parquet")]
+        return sorted(key for key in keys if key is not None)
+
+    def sync(self, balance_sheet):
+        # Mirrors the quarters of balance_sheet; returns the labels of the quarters written and of those removed
+        os.makedirs(self.directory, exist_ok = True)
+        stored = self.manifest()
+        manifest = {}
+        written = []
+
+        for key, frame in balance_sheet.groupby(["year", "quarter"]):
+            label = quarter_label(*key)
+            manifest[label] = _quarter_hash(frame)
+
+            if stored.get(label) == manifest[label] and os.path.exists(self._path(key)):
+                continue
+
+            self._replace(self._path(key), lambda path: frame[BALANCE_COLUMNS].to_parquet(path, index = False))
+            written.append(label)
+
+        removed = [quarter_label(*key) for key in self.periods() if quarter_label(*key) not in manifest]
+        for label in removed:
+            os.remove(self._path(quarter_key(label)))
+
+        # The manifest goes last, so a sync cut short is simply redone the next time
+        def write_manifest(path):
+            with open(path, "w", encoding = "utf-8") as f:
+                json.dump(manifest, f)
+
+        if manifest != stored:
+            self._replace(self._manifest_path(), write_manifest)
+
+        return written, removed
+
+    def _bound(self, label):
+        if label is None:
+            return None
+
+        key = label if isinstance(label, tuple) else quarter_key(label)
+        if key is None:
+            raise ValueError(f"Período inválido: {label}")
+        return key
+
+    def query(self, start = None, end = None):
+        # Both bounds are inclusive quarter labels (or (year, quarter) keys); None leaves that side open
+        first, last = self._bound(start), self._bound(end)
+        keys = [key for key in self.periods() if (first is None or key >= first) and (last is None or key <= last)]
+
+        if not keys:
+            return pd.DataFrame(columns = BALANCE_COLUMNS)
+
+        return pd.concat([pd.read_parquet(self._path(key)) for key in keys], ignore_index = True)
+
+    def matrix(self, start = None, end = None):
+        # Heading × period, with the headings in sheet order and the quarters in calendar order
+        balance_sheet = self.query(start, end)
+
+        matrix = balance_sheet.pivot(index = "heading", columns = ["year", "quarter"], values = "value").sort_index(axis = 1)
+        matrix = matrix.reindex(balance_sheet.groupby("heading")["line"].min().sort_values().index)
+        matrix.columns = pd.Index([quarter_label(*key) for key in matrix.columns], name = "period")
+
+        return matrix
+
+# python Backend.py <planilha.xlsx> <destino.sqlite|destino.duckdb>
+if __name__ == "__main__":
+    export_workbook(sys.argv[1], sys.argv[2])
@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+import Build
+import Models as md
+
+# ======================== 1. STAGES ========================
+
+WORKBOOK_PATH = "data/Cafeteria Fictícia - Planilhas Unificadas.xlsx"
+
+# Sheets that grow with the business; the balance sheet and the staff list keep their size
+SCALED_SHEETS = ["Receita", "Despesa"]
+
+# Stages run in order, so each one is timed over its own work and not over its dependencies
+STAGES = {
+    "read_workbook": ["database_revenue", "database_expense", "database_balance_accounts", "database_employees"],
+    "aggregates": ["sales_summary", "daily_sales", "latest_prices"],
+    "elasticities": ["elasticities"],
+    "gam_gridsearch": ["price_optimization", "optimal_elasticities"],
+    "bootstrap_intervals": ["optimal_price_intervals"],
+    "joint_pricing": ["cross_price_elasticities", "joint_optimal_prices"],
+    "stl_decomposition": ["decomposition_data"],
+    "demand_forecast": ["demand_forecast"],
+    "inventory_panel": ["complete_inventory_data", "filtered_inventory_data"],
+    "financials": ["cash_flow", "projected_cash_flow", "balance_store", "financial_ratios", "liquidity_ratios", "comparison_table"],
+    "cash_flow_simulation": ["cash_flow_growth", "simulated_cash_flow"],
+    "figures": [f"figure{number}" for number in range(1, 16)]
+}
+
+def _measure(run):
+    tracemalloc.reset_peak()
+    start_bytes = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+
+    run()
+
+    seconds = time.perf_counter() - start
+    peak_bytes = tracemalloc.get_traced_memory()[1] - start_bytes
+
+    return {"seconds": round(seconds, 4), "peak_bytes": int(peak_bytes)}
+
+# ======================== 2. SYNTHETIC WORKBOOKS ========================
+
+def scale_workbook(path, scale, destination):
+    # Every transaction is repeated, so the same days and items carry scale times the volume
+    sheets = pd.read_excel(path, sheet_name = None)
+
+    with pd.ExcelWriter(destination, engine = "openpyxl") as writer:
+        for sheet_name, frame in sheets.items():
+            if sheet_name in SCALED_SHEETS:
+                frame = pd.concat([frame] * scale, ignore_index = True)
+            frame.to_excel(writer, sheet_name = sheet_name, index = False)
+
+    return destination
+
+# ======================== 3. BENCHMARK RUN ========================
+
+def benchmark_workbook(con, path, cache_directory, workers = 1):
+    settings = (con.data_path, con.cache_directory, con.balance_directory, md.MODEL_DIRECTORY, md.WORKERS)
+
+    con.data_path = path
+    con.cache_directory = cache_directory
+    con.balance_directory = os.path.join(cache_directory, "balance")
+    con.reset()
+
+    # The fitted models are stored beside the workbook cache, so the GAM stages are timed cold as well
+    md.MODEL_DIRECTORY = os.path.join(cache_directory, "models")
+
+    # tracemalloc only sees the calling process, so the fits run in it unless more workers are asked for,
+    # in which case the peaks of the GAM, bootstrap and STL stages leave out the worker processes
+    md.WORKERS = workers
+
+    try:
+        stages = {}
+        for stage, names in STAGES.items():
+            stages[stage] = _measure(lambda: [getattr(con, name) for name in names])
+
+        with tempfile.TemporaryDirectory() as directory:
+            stages["notebook_export"] = _measure(lambda: Build.export_notebook(module_path = os.path.join(directory, "Conector.py"), force = True))
+
+        rows = {table: len(getattr(con, table)) for table in STAGES["read_workbook"]}
+    finally:
+        con.data_path, con.cache_directory, con.balance_directory, md.MODEL_DIRECTORY, md.WORKERS = settings
+        con.reset()
+
+    return {"workbook": os.path.basename(path), "workers": workers, "rows": rows, "stages": stages}
+
+def run_benchmark(scales = (1,), workbook_path = WORKBOOK_PATH, workers = 1):
+    tracemalloc.start()
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": pd.Timestamp.now().isoformat(timespec = "seconds"),
+        "import": _measure(lambda: __import__("Conector")),
+        "runs": {}
+    }
+
+    con = sys.modules["Conector"]
+
+    # A fresh cache directory per run keeps every workbook read cold
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in scales:
+            path = workbook_path if scale == 1 else scale_workbook(workbook_path, scale, os.path.join(directory, f"scale_{scale}.xlsx"))
+            run = benchmark_workbook(con, path, os.path.join(directory, f"cache_{scale}"), workers)
+            run["scale"] = scale
+            report["runs"][f"x{scale}"] = run
+
+    tracemalloc.stop()
+
+    return report
+
+# ======================== 4. BASELINE COMPARISON ========================
+
+def _regressions(run_name, stages, baseline_stages, threshold, minimum_seconds):
+    regressions = []
+
+    for stage, measure in stages.items():
+        reference = baseline_stages.get(stage)
+        if reference is None:
+            continue
+
+        # Stages faster than minimum_seconds in the baseline are too noisy to gate on
+        if reference["seconds"] >= minimum_seconds and measure["seconds"] > reference["seconds"] * (1 + threshold):
+            regressions.append({"run": run_name, "stage": stage, "metric": "seconds",
+                                "baseline": reference["seconds"], "current": measure["seconds"]})
+
+        if reference["peak_bytes"] > 0 and measure["peak_bytes"] > reference["peak_bytes"] * (1 + threshold):
+            regressions.append({"run": run_name, "stage": stage, "metric": "peak_bytes",
+                                "baseline": reference["peak_bytes"], "current": measure["peak_bytes"]})
+
+    return regressions
+
+def compare_reports(report, baseline, threshold = 0.25, minimum_seconds = 0.05):
+    regressions = _regressions("import", {"import": report["import"]}, {"import": baseline["import"]}, threshold, minimum_seconds)
+
+    for run_name, run in report["runs"].items():
+        if run_name in baseline["runs"]:
+            regressions += _regressions(run_name, run["stages"], baseline["runs"][run_name]["stages"], threshold, minimum_seconds)
+
+    return regressions
+
+# ======================== 5. COMMAND LINE ========================
+
+# python Benchmark.py --scales 1 5 10 --output relatorio.json --baseline referencia.json
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Tempo e pico de memória por etapa do Conector")
+    parser.add_argument("--scales", type = int, nargs = "+", default = [1])
+    parser.add_argument("--workbook", default = WORKBOOK_PATH)
+    parser.add_argument("--output", default = "benchmark.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--threshold", type = float, default = 0.25)
+    parser.add_argument("--save-baseline", action = "store_true")
+    parser.add_argument("--workers", type = int, default = 1)
+    arguments = parser.parse_args()
+
+    report = run_benchmark(arguments.scales, arguments.workbook, arguments.workers)
+
+    with open(arguments.output, "w", encoding = "utf-8") as f:
+        json.dump(report, f, indent = 1, ensure_ascii = False)
+
+    if arguments.baseline and arguments.save_baseline:
+        with open(arguments.baseline, "w", encoding = "utf-8") as f:
+            json.dump(report, f, indent = 1, ensure_ascii = False)
+
+    elif arguments.baseline:
+        with open(arguments.baseline, encoding = "utf-8") as f:
+            regressions = compare_reports(report, json.load(f), arguments.threshold)
+
+        for regression in regressions:
+            print(f"Regressão em {regression['run']}/{regression['stage']} ({regression['metric']}): "
+                  f"{regression['baseline']} -> {regression['current']}")
+
+        if regressions:
+            sys.exit(1)
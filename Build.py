@@ -0,0 +1,56 @@
+import hashlib
+import os
+import re
+import sys
+
+# ======================== 1. NOTEBOOK EXPORT ========================
+
+NOTEBOOK_PATH = "Script.ipynb"
+MODULE_PATH = "Conector.py"
+
+HEADER = "# Gerado a partir de {notebook} com Build.py — sha256 {digest}\n\n"
+HEADER_PATTERN = re.compile(r"# Gerado a partir de .+ com Build\.py — sha256 ([0-9a-f]{64})")
+
+def notebook_digest(notebook_path = NOTEBOOK_PATH):
+    with open(notebook_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def exported_digest(module_path = MODULE_PATH):
+    if not os.path.exists(module_path):
+        return None
+
+    with open(module_path, encoding = "utf-8") as f:
+        match = HEADER_PATTERN.match(f.readline())
+
+    return match.group(1) if match else None
+
+def export_notebook(notebook_path = NOTEBOOK_PATH, module_path = MODULE_PATH, force = False):
+    # The module is only rewritten when the notebook changed since the last export
+    digest = notebook_digest(notebook_path)
+
+    if not force and exported_digest(module_path) == digest:
+        return False
+
+    import nbformat
+
+    with open(notebook_path, "r", encoding = "utf-8") as f:
+        nb = nbformat.read(f, as_version = 4)
+
+    code = HEADER.format(notebook = os.path.basename(notebook_path), digest = digest)
+    for cell in nb.cells:
+        if cell.cell_type == "code":
+            code += cell.source + "\n\n"
+
+    # Replaced in one step, so a worker importing the module never reads it half written
+    with open(module_path + ".tmp", "w", encoding = "utf-8") as f:
+        f.write(code)
+    os.replace(module_path + ".tmp", module_path)
+
+    return True
+
+# python Build.py [--force]
+if __name__ == "__main__":
+    if export_notebook(force = "--force" in sys.argv[1:]):
+        print(f"{MODULE_PATH} atualizado a partir de {NOTEBOOK_PATH}.")
+    else:
+        print(f"{MODULE_PATH} já está atualizado.")
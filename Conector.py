@@ -1,1084 +1,1502 @@
+# Gerado a partir de Script.ipynb com Build.py — sha256 94277082e75787a698af076c2603dc260cb2b275d344d3795e0afb7664c97fb6
+
 import warnings
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from pygam import *
-import statsmodels.formula.api as smf
-from statsmodels.tsa.seasonal import STL
 from plotly.subplots import make_subplots
-import nbformat
-import requests
+import functools
 import io
+import os
+import threading
 from openpyxl import load_workbook
 from openpyxl.styles import Font, Alignment, NamedStyle, Border, Side
+import Backend as bk
+import Incremental as inc
+import Ingestion as ing
+import Models as md
+import Rates as rt
 
 warnings.simplefilter(action = "ignore")
 
-database_revenue = pd.read_excel("data/Cafeteria Fictícia - Planilhas Unificadas.xlsx", sheet_name = "Receita")
+# Figures and tables are computed on first access and memoized, so each page only pays for what it renders
+artifacts = {}
+_results = {}
+_locks = {}
 
-column_map = {
-	"Data": "date",
-    "Preço": "price",
-    "Nome do Café": "item"
-}
+def artifact(function):
+    name = function.__name__.removeprefix("get_")
+    _locks[name] = threading.RLock()
 
-valid_columns = []
-for column_name in database_revenue.columns:
-    if column_name in column_map.keys():
-        valid_columns.append(column_name)
+    @functools.wraps(function)
+    def accessor():
+        with _locks[name]:
+            if name not in _results:
+                _results[name] = function()
+            return _results[name]
 
-database_revenue = database_revenue[valid_columns]
-database_revenue.rename(columns = column_map, inplace = True)
+    artifacts[name] = accessor
+    return accessor
 
-# database_revenue.head(10)
+def reset():
+    _results.clear()
+def __getattr__(name):
+    if name in artifacts:
+        return artifacts[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-database_expense = pd.read_excel("data/Cafeteria Fictícia - Planilhas Unificadas.xlsx", sheet_name = "Despesa")
 
-column_map = {
-	"Data": "date",
-    "Insumo": "material",
-    "Quantidade Adquirida": "quantity_purchased",
-    "Custo Unitário": "unit_cost",
-    "Subtotal": "subtotal"
-}
+workbook_path = "data/Cafeteria Fictícia - Planilhas Unificadas.xlsx"
 
-valid_columns = []
-for column_name in database_expense.columns:
-    if column_name in column_map.keys():
-        valid_columns.append(column_name)
+# A SQLite or DuckDB file exported with Backend.py can replace the workbook, and a CSV or Parquet export of the
+# sales can replace its revenue sheet
+data_path = os.environ.get("CONECTOR_DATA_SOURCE", workbook_path)
+cache_directory = ing.CACHE_DIRECTORY
+balance_directory = bk.BALANCE_DIRECTORY
 
-database_expense = database_expense[valid_columns]
-database_expense.rename(columns = column_map, inplace = True)
+# With CONECTOR_STATE_DIRECTORY set, the sales and daily aggregates come from the state kept by Incremental.py,
+# and every run folds in only the rows added to the source since the last one
+state_directory = os.environ.get("CONECTOR_STATE_DIRECTORY")
 
-# database_expense.head(10)
+def data_fingerprint():
+    # A sales export is read together with the workbook, so both files make up the fingerprint
+    if os.path.splitext(data_path)[1].lower() in bk.EXPORT_EXTENSIONS:
+        return ing.fingerprint_file(data_path) + ing.fingerprint_file(workbook_path)
+    return ing.fingerprint_file(data_path)
 
-database_balance_accounts = pd.read_excel("data/Cafeteria Fictícia - Planilhas Unificadas.xlsx", sheet_name = "Balanço Patrimonial")
+@artifact
+def get_data_source():
+    return bk.open_source(data_path, cache_directory = cache_directory, workbook_path = workbook_path)
 
-column_map = {
-   "Rubrica": "heading",
-   "1T 2024": "1T 2024",
-   "2T 2024": "2T 2024",
-   "3T 2024": "3T 2024",
-   "4T 2024": "4T 2024",
-   "1T 2025": "1T 2025",
-   "2T 2025": "2T 2025",
-   "3T 2025": "3T 2025",
-   "4T 2025": "4T 2025",
-}
+@artifact
+def get_incremental_aggregates():
+    # Only the source rows past the offsets already in the state are read and folded in
+    directory = state_directory or inc.STATE_DIRECTORY
+    offsets = inc.ingested_rows(directory)
 
-valid_columns = []
-for column_name in database_balance_accounts.columns:
-    if column_name in column_map.keys():
-        valid_columns.append(column_name)
+    revenue = get_data_source().rows_since("revenue", offsets["revenue"])[["date", "price", "item"]]
+    expense = get_data_source().rows_since("expense", offsets["expense"])[["date", "material", "quantity_purchased", "subtotal"]]
 
-database_balance_accounts = database_balance_accounts[valid_columns]
-database_balance_accounts.rename(columns = column_map, inplace = True)
+    return inc.update_aggregates(revenue, expense, directory, offsets["revenue"], offsets["expense"])
 
-# database_balance_accounts.head(10)
+def load_state_aggregate(name):
+    get_incremental_aggregates()
+    return inc.load_aggregate(name, state_directory or inc.STATE_DIRECTORY)
 
-database_employees = pd.read_excel("data/Cafeteria Fictícia - Planilhas Unificadas.xlsx", sheet_name = "Quadro de Funcionários")
+translated_weekdays = {0: "Segunda-feira", 1: "Terça-feira", 2: "Quarta-feira", 3: "Quinta-feira", 4: "Sexta-feira", 5: "Sábado", 6: "Domingo"}
 
-column_map = {
-	"Data": "date",
-    "Funcionário": "employee",
-    "Cargo": "position",
-    "Salário": "wage"
-}
+@artifact
+def get_database_revenue():
+    database_revenue = get_data_source().revenue()
+    database_revenue["weekday"] = database_revenue["date"].dt.dayofweek.map(translated_weekdays).astype("category")
+
+    return database_revenue
+
+# get_database_revenue().head(10)
+
+@artifact
+def get_database_expense():
+    database_expense = get_data_source().expense()
+
+    return database_expense
+
+# get_database_expense().head(10)
+
+@artifact
+def get_database_balance_accounts():
+    database_balance_accounts = get_data_source().balance_accounts()
+
+    return database_balance_accounts
+
+@artifact
+def get_balance_store():
+    balance_store = bk.BalanceStore(balance_directory)
+
+    # Long (heading, period, value) history, one file per quarter; only new or restated quarters are written
+    balance_store.sync(get_data_source().balance_sheet())
+
+    return balance_store
 
-valid_columns = []
-for column_name in database_employees.columns:
-    if column_name in column_map.keys():
-        valid_columns.append(column_name)
+# get_database_balance_accounts().head(10)
+# get_balance_store().query("1T 2025", "4T 2025")
 
-database_employees = database_employees[valid_columns]
-database_employees.rename(columns = column_map, inplace = True)
+@artifact
+def get_database_employees():
+    database_employees = get_data_source().employees()
+
+    return database_employees
+
+# get_database_employees().head(10)
+
+@artifact
+def get_memory_report():
+    get_database_revenue(), get_database_expense(), get_database_balance_accounts(), get_database_employees()
+
+    memory_report = get_data_source().memory_report()
+
+    return memory_report
+
+# get_memory_report()
+
+@artifact
+def get_sales_summary():
+    if state_directory:
+        return load_state_aggregate("sales_summary").astype({"item": "category"})
+
+    sales_summary = get_data_source().sales_summary()
+
+    return sales_summary
+
+@artifact
+def get_daily_sales():
+    if state_directory:
+        return load_state_aggregate("daily_revenue").astype({"item": "category"})
+
+    daily_sales = get_data_source().daily_sales()
+
+    return daily_sales
+
+@artifact
+def get_figure1():
+    sales_summary = get_sales_summary()
+
+    figure1 = px.scatter(
+        sales_summary, x = "quantity_sold", y = "price", color = "item", trendline = "ols",
+        labels = {"price": "Preço (R$)", "quantity_sold": "Quantidade Vendida", "item": "Item"},
+        title = "Análise Exploratória — Demandas Inversas", width = 1000, height = 500
+    )
 
-# database_employees.head(10)
+    figure1.update_layout(
+        title_font_size = 18, font = dict(size = 14, family = "Arial", color = "black"),
+        plot_bgcolor = "white", paper_bgcolor = "white",
+        legend = dict(title = "", borderwidth = 0, font_size = 12, bgcolor = "rgba(0,0,0,0)"),
+        xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
+        yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14)
+    )
 
-sales_summary = database_revenue.groupby(["item", "price"]).size().reset_index(name = "quantity_sold")
+    return figure1
 
-figure1 = px.scatter(
-    sales_summary, x = "quantity_sold", y = "price", color = "item", trendline = "ols",
-    labels = {"price": "Preço (R$)", "quantity_sold": "Quantidade Vendida", "item": "Item"},
-    title = "Análise Exploratória — Demandas Inversas", width = 1000, height = 500
-)
+# get_figure1().show()
 
-figure1.update_layout(
-    title_font_size = 18, font = dict(size = 14, family = "Arial", color = "black"),
-    plot_bgcolor = "white", paper_bgcolor = "white",
-    legend = dict(title = "", borderwidth = 0, font_size = 12, bgcolor = "rgba(0,0,0,0)"),
-    xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
-    yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14)
-)
+@artifact
+def get_figure2():
+    database_revenue = get_database_revenue()
 
-# figure1.show()
+    figure2 = px.violin(
+        database_revenue, x = "item",  y = "price", color = "item", box = False, points = "all",
+        labels = {"price": "Preço (R$)", "item": "Item"},
+        title = "Análise Exploratória — Distribuições de Preços", width = 1000, height = 500
+    )
 
-figure2 = px.violin(
-    database_revenue, x = "item",  y = "price", color = "item", box = False, points = "all",
-    labels = {"price": "Preço (R$)", "item": "Item"},
-    title = "Análise Exploratória — Distribuições de Preços", width = 1000, height = 500
-)
+    figure2.update_layout(
+        title_font_size = 18, font = dict(size = 14, family = "Arial", color = "black"),
+        plot_bgcolor = "white", paper_bgcolor = "white",
+        showlegend = False,
+        xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
+        yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14)
+    )
 
-figure2.update_layout(
-    title_font_size = 18, font = dict(size = 14, family = "Arial", color = "black"),
-    plot_bgcolor = "white", paper_bgcolor = "white",
-    showlegend = False,
-    xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
-    yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14)
-)
+    return figure2
 
-# figure2.show()
+# get_figure2().show()
 
-elasticities = []
+@artifact
+def get_latest_prices():
+    latest_prices = get_data_source().latest_prices()
 
-latest_prices = database_revenue.sort_values("date").groupby("item").tail(1)
-latest_prices = latest_prices.set_index("item")["price"]
+    return latest_prices
 
-for item in sales_summary["item"].unique():
-    item_data = sales_summary[sales_summary["item"] == item]
+@artifact
+def get_elasticities():
+    sales_summary = get_sales_summary()
+    latest_prices = get_latest_prices()
 
-    item_data["quantity_sold"] = np.log(item_data["quantity_sold"])
-    item_data["price"] = np.log(item_data["price"])
+    # log(quantity_sold) ~ log(price) for every item in a single pass
+    log_log = md.grouped_linear_regression(sales_summary["item"], np.log(sales_summary["price"]), np.log(sales_summary["quantity_sold"]))
 
-    log_log = smf.ols("quantity_sold ~ price", data = item_data).fit()
-    beta_0, beta_1 = log_log.params
+    beta_0, beta_1 = log_log["intercept"].values, log_log["slope"].values
 
-    P0 = latest_prices[item]
+    P0 = latest_prices.reindex(log_log["group"]).values
     Q0 = beta_0 + beta_1 * P0
 
     current_elasticity = beta_1 * (P0 / Q0)
 
-    elasticities.append({
-        "item": item,
+    elasticities = pd.DataFrame({
+        "item": log_log["group"],
         "current_price": P0,
         "predicted_quantity_sold": Q0,
         "current_elasticity": np.abs(current_elasticity)
     })
 
-elasticities = pd.DataFrame(elasticities)
-
-figure3 = px.bar(
-    elasticities,
-    x = "item", y = "current_elasticity", color = "item",
-    labels = {"item": "Item", "current_elasticity": "Nível"},
-    title = "Análise Exploratória — Elasticidades-preço da Demanda Atuais", width = 1000, height = 500
-)
-
-for index, row in elasticities.iterrows():
-    figure3.add_annotation(
-        x = row["item"], y = row["current_elasticity"],
-        text = f"<b>{row["current_elasticity"]:.2f}</b>".replace(".", ","),
-        showarrow = False, font = dict(color = "white", size = 12),
-        align = "center", bordercolor = "black",
-        borderwidth = 1, bgcolor = "black", opacity = 0.8
+    return elasticities
+
+@artifact
+def get_figure3():
+    elasticities = get_elasticities()
+
+    figure3 = px.bar(
+        elasticities,
+        x = "item", y = "current_elasticity", color = "item",
+        labels = {"item": "Item", "current_elasticity": "Nível"},
+        title = "Análise Exploratória — Elasticidades-preço da Demanda Atuais", width = 1000, height = 500
     )
 
-figure3.update_layout(
-    title_font_size = 18,
-    font = dict(size = 14, family = "Arial", color = "black"),
-    plot_bgcolor = "white",
-    paper_bgcolor = "white",
-    legend = dict(title = "", borderwidth = 0, font_size = 12, bgcolor = "rgba(0,0,0,0)"),
-    xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
-    yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
-    separators = ",."
-)
+    for index, row in elasticities.iterrows():
+        figure3.add_annotation(
+            x = row["item"], y = row["current_elasticity"],
+            text = f"<b>{row["current_elasticity"]:.2f}</b>".replace(".", ","),
+            showarrow = False, font = dict(color = "white", size = 12),
+            align = "center", bordercolor = "black",
+            borderwidth = 1, bgcolor = "black", opacity = 0.8
+        )
+
+    figure3.update_layout(
+        title_font_size = 18,
+        font = dict(size = 14, family = "Arial", color = "black"),
+        plot_bgcolor = "white",
+        paper_bgcolor = "white",
+        legend = dict(title = "", borderwidth = 0, font_size = 12, bgcolor = "rgba(0,0,0,0)"),
+        xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
+        yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
+        separators = ",."
+    )
 
-# figure3.show()
+    return figure3
 
-accumulated_revenue = (database_revenue.groupby(["date", "item"])["price"]
-                 .sum().groupby(level = 1 ).cumsum().reset_index(name = "accumulated_revenue"))
+# get_figure3().show()
 
-accumulated_revenue["accumulated_revenue"] /= 1000
+@artifact
+def get_accumulated_revenue():
+    if state_directory:
+        return load_state_aggregate("accumulated_revenue")
 
-figure4 = px.line(accumulated_revenue, x = "date", y = "accumulated_revenue", color = "item",
-               labels = {"date": "Data", "accumulated_revenue": "Receita acumulada (mil R$)", "item": "Item"},
-               title = "Análise Exploratória — Receitas Acumuladas", width = 1000, height = 500)
+    daily_sales = get_daily_sales()
 
-figure4.update_layout(
-    title_font_size = 18, font = dict(size = 14, family = "Arial", color = "black"),
-    plot_bgcolor = "white", paper_bgcolor = "white",
-    legend = dict(title = "", font_size = 12, bgcolor = "rgba(0,0,0,0)"),
-    xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14, tickformat = "%d/%m/%Y"),
-    yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14)
-)
+    accumulated_revenue = daily_sales[["date", "item"]].copy()
+    accumulated_revenue["accumulated_revenue"] = daily_sales.groupby("item", observed = True)["daily_revenue"].cumsum() / 1000
 
-# figure4.show()
+    return accumulated_revenue
 
-daily_revenue = (database_revenue.groupby(["date", "item"])["price"]
-                 .sum().reset_index(name = "daily_revenue"))
+@artifact
+def get_figure4():
+    accumulated_revenue = get_accumulated_revenue()
 
-figure5 = px.line(
-    daily_revenue, x = "date", y = "daily_revenue", color = "item",
-    labels = {"date": "Data", "daily_revenue": "Receita diária (R$)", "item": "Item"},
-    title = "Análise Exploratória — Receitas Diárias", width = 1000, height = 500
-)
+    figure4 = px.line(accumulated_revenue, x = "date", y = "accumulated_revenue", color = "item",
+                   labels = {"date": "Data", "accumulated_revenue": "Receita acumulada (mil R$)", "item": "Item"},
+                   title = "Análise Exploratória — Receitas Acumuladas", width = 1000, height = 500)
 
-figure5.update_layout(
-    title_font_size = 18, font = dict(size = 14, family = "Arial", color = "black"),
-    plot_bgcolor = "white", paper_bgcolor = "white",
-    legend = dict(title = "", font_size = 12, bgcolor = "rgba(0,0,0,0)"),
-    xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14, tickformat = "%d/%m/%Y"),
-    yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14)
-)
+    figure4.update_layout(
+        title_font_size = 18, font = dict(size = 14, family = "Arial", color = "black"),
+        plot_bgcolor = "white", paper_bgcolor = "white",
+        legend = dict(title = "", font_size = 12, bgcolor = "rgba(0,0,0,0)"),
+        xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14, tickformat = "%d/%m/%Y"),
+        yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14)
+    )
 
-# figure5.show()
+    return figure4
 
-database_revenue["date"] = pd.to_datetime(database_revenue["date"])
+# get_figure4().show()
 
-translated_weekdays = {0: "Segunda-feira", 1: "Terça-feira", 2: "Quarta-feira", 3: "Quinta-feira", 4: "Sexta-feira", 5: "Sábado", 6: "Domingo"}
-database_revenue["weekday"] = database_revenue["date"].dt.dayofweek.map(translated_weekdays)
-
-weekdays_revenue = (database_revenue.groupby(["date", "weekday"])["price"]
-                   .mean().reset_index(name = "weekdays_revenue"))
-
-weekdays_revenue["weekday"] = pd.Categorical(weekdays_revenue["weekday"], ordered = True)
-
-figure6 = px.line(
-    weekdays_revenue, x = "date", y = "weekdays_revenue", color = "weekday",
-    labels = {"date": "Data", "weekdays_revenue": "Receita média (R$)", "weekday": "Dia da semana"},
-    title = "Análise Exploratória — Receitas Médias por Dia da Semana", width = 1000, height = 500
-)
-
-figure6.update_layout(
-    title_font_size = 18,
-    font = dict(size = 14, family = "Arial", color = "black"),
-    plot_bgcolor = "white",
-    paper_bgcolor = "white",
-    legend = dict(title = "", font_size = 12, bgcolor = "rgba(0,0,0,0)"),
-    xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14, tickformat = "%d/%m/%Y"),
-    yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14)
-)
-
-# figure6.show()
-
-daily_revenue = (database_revenue.groupby(["date", "item"])["price"]
-                 .sum().reset_index(name="daily_revenue"))
-
-daily_revenue["date"] = pd.to_datetime(daily_revenue["date"])
-daily_revenue = daily_revenue.set_index("date")
-
-weekly_revenue = (daily_revenue.groupby("item")
-                  .resample("W")["daily_revenue"]
-                  .mean()
-                  .reset_index())
-
-weekly_revenue["total_week"] = weekly_revenue.groupby("date")["daily_revenue"].transform("sum")
-weekly_revenue["percentage_revenue"] = weekly_revenue["daily_revenue"] / weekly_revenue["total_week"] * 100
-
-figure7 = px.area(
-    weekly_revenue, 
-    x = "date", y = "percentage_revenue", color = "item",
-    labels = {"date": "Data", "percentage_revenue": "Participação", "item": "Item"},
-    title = "Análise Exploratória — Composição Dinâmica da Receita", width = 1000, height = 500
-)
-
-figure7.update_layout(
-    title_font_size = 18,
-    font = dict(size = 14, family = "Arial", color = "black"),
-    plot_bgcolor = "white",
-    paper_bgcolor = "white",
-    legend = dict(title = "", font_size = 12, bgcolor = "rgba(0,0,0,0)"),
-    xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14, tickformat = "%d/%m/%Y"),
-    yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14, ticksuffix = "%")
-)
-
-# figure7.show()
-
-database_employees["date"] = pd.to_datetime(database_employees["date"], format = "%d/%m/%Y")
-current_year = database_employees["date"].dt.year.max()
-current_year = database_employees[database_employees["date"].dt.year == current_year]
-
-employee_summary = current_year.groupby("position").agg(
-    employee_count = ("employee", "nunique"),
-    average_wage = ("wage", "mean")
-).reset_index()
-
-figure8 = px.bar(
-    employee_summary,
-    x = "position", y = "employee_count", color = "position",
-    labels = {"position": "Cargo", "employee_count": "Número de Funcionários"},
-    title = "Análise Exploratória — Funcionários por Cargo e Salário Médio", width = 1000, height = 500
-)
-
-for index, row in employee_summary.iterrows():
-    figure8.add_annotation(
-        x = row["position"], y = row["employee_count"],
-        text = f"<b>R$ {row['average_wage']:,.2f}</b>".replace(",", "X").replace(".", ",").replace("X", "."),
-        showarrow = False, font = dict(color = "white", size = 12),
-        align = "center", bordercolor = "black",
-        borderwidth = 1, bgcolor = "black", opacity = 0.8
+@artifact
+def get_daily_revenue():
+    daily_sales = get_daily_sales()
+
+    daily_revenue = daily_sales[["date", "item", "daily_revenue"]]
+
+    return daily_revenue
+
+@artifact
+def get_figure5():
+    daily_revenue = get_daily_revenue()
+
+    figure5 = px.line(
+        daily_revenue, x = "date", y = "daily_revenue", color = "item",
+        labels = {"date": "Data", "daily_revenue": "Receita diária (R$)", "item": "Item"},
+        title = "Análise Exploratória — Receitas Diárias", width = 1000, height = 500
     )
 
-figure8.update_layout(
-    title_font_size = 18,
-    font = dict(size = 14, family = "Arial", color = "black"),
-    plot_bgcolor = "white",
-    paper_bgcolor = "white",
-    legend = dict(title = "", borderwidth = 0, font_size = 12, bgcolor = "rgba(0,0,0,0)"),
-    xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
-    yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
-    separators = ",."
-)
+    figure5.update_layout(
+        title_font_size = 18, font = dict(size = 14, family = "Arial", color = "black"),
+        plot_bgcolor = "white", paper_bgcolor = "white",
+        legend = dict(title = "", font_size = 12, bgcolor = "rgba(0,0,0,0)"),
+        xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14, tickformat = "%d/%m/%Y"),
+        yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14)
+    )
 
-# figure8.show()
+    return figure5
 
-optimal_prices = []
-gam_results = {}
+# get_figure5().show()
 
-for item in sales_summary["item"].unique():
-    item_data = sales_summary[sales_summary["item"] == item]
+@artifact
+def get_weekdays_revenue():
+    database_revenue = get_database_revenue()
 
-    price_values = item_data[["price"]].values
-    quantity_sold_values = item_data["quantity_sold"].values
+    weekdays_revenue = (database_revenue.groupby(["date", "weekday"], observed = True)["price"]
+                       .mean().reset_index(name = "weekdays_revenue"))
 
-    gam = PoissonGAM(s(0, n_splines = 5, spline_order = 3, constraints = "monotonic_dec")).gridsearch(price_values, quantity_sold_values)
-    price_range = np.linspace(price_values.min(), price_values.max(), 100)
+    weekdays_revenue["weekday"] = pd.Categorical(weekdays_revenue["weekday"], ordered = True)
 
-    demand_estimated = gam.predict(price_range)
-    revenue_estimated = price_range * demand_estimated / 1000
+    return weekdays_revenue
 
-    optimal_index = np.argmax(revenue_estimated)
-    optimal_price = price_range[optimal_index]
-    optimal_quantity_sold = demand_estimated[optimal_index]
+@artifact
+def get_figure6():
+    weekdays_revenue = get_weekdays_revenue()
 
-    optimal_prices.append({
-        "item": item,
-        "optimal_price": round(optimal_price, 2),
-        "expected_quantity_sold": round(optimal_quantity_sold, 2),
-        "expected_revenue": round(revenue_estimated[optimal_index], 2)
-    })
+    figure6 = px.line(
+        weekdays_revenue, x = "date", y = "weekdays_revenue", color = "weekday",
+        labels = {"date": "Data", "weekdays_revenue": "Receita média (R$)", "weekday": "Dia da semana"},
+        title = "Análise Exploratória — Receitas Médias por Dia da Semana", width = 1000, height = 500
+    )
+
+    figure6.update_layout(
+        title_font_size = 18,
+        font = dict(size = 14, family = "Arial", color = "black"),
+        plot_bgcolor = "white",
+        paper_bgcolor = "white",
+        legend = dict(title = "", font_size = 12, bgcolor = "rgba(0,0,0,0)"),
+        xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14, tickformat = "%d/%m/%Y"),
+        yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14)
+    )
+
+    return figure6
+
+# get_figure6().show()
+
+@artifact
+def get_weekly_revenue():
+    if state_directory:
+        return load_state_aggregate("weekly_revenue")
+
+    daily_revenue = get_daily_revenue().set_index("date")
+
+    weekly_revenue = (daily_revenue.groupby("item", observed = True)
+                      .resample("W")["daily_revenue"]
+                      .mean()
+                      .reset_index())
+
+    weekly_revenue["total_week"] = weekly_revenue.groupby("date")["daily_revenue"].transform("sum")
+    weekly_revenue["percentage_revenue"] = weekly_revenue["daily_revenue"] / weekly_revenue["total_week"] * 100
+
+    return weekly_revenue
+
+@artifact
+def get_figure7():
+    weekly_revenue = get_weekly_revenue()
+
+    figure7 = px.area(
+        weekly_revenue, 
+        x = "date", y = "percentage_revenue", color = "item",
+        labels = {"date": "Data", "percentage_revenue": "Participação", "item": "Item"},
+        title = "Análise Exploratória — Composição Dinâmica da Receita", width = 1000, height = 500
+    )
+
+    figure7.update_layout(
+        title_font_size = 18,
+        font = dict(size = 14, family = "Arial", color = "black"),
+        plot_bgcolor = "white",
+        paper_bgcolor = "white",
+        legend = dict(title = "", font_size = 12, bgcolor = "rgba(0,0,0,0)"),
+        xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14, tickformat = "%d/%m/%Y"),
+        yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14, ticksuffix = "%")
+    )
+
+    return figure7
+
+# get_figure7().show()
 
-    gam_results[item] = {
-        "price_range": price_range,
-        "demand_estimated": demand_estimated,
-        "revenue_estimated": revenue_estimated,
-        "optimal_price": optimal_price,
-        "optimal_quantity_sold": optimal_quantity_sold
-    }
+@artifact
+def get_employee_summary():
+    database_employees = get_database_employees()
 
-figure9 = go.Figure()
+    current_year = database_employees["date"].dt.year.max()
+    current_year = database_employees[database_employees["date"].dt.year == current_year]
+
+    employee_summary = current_year.groupby("position", observed = True).agg(
+        employee_count = ("employee", "nunique"),
+        average_wage = ("wage", "mean")
+    ).reset_index()
+
+    return employee_summary
+
+@artifact
+def get_figure8():
+    employee_summary = get_employee_summary()
+
+    figure8 = px.bar(
+        employee_summary,
+        x = "position", y = "employee_count", color = "position",
+        labels = {"position": "Cargo", "employee_count": "Número de Funcionários"},
+        title = "Análise Exploratória — Funcionários por Cargo e Salário Médio", width = 1000, height = 500
+    )
+
+    for index, row in employee_summary.iterrows():
+        figure8.add_annotation(
+            x = row["position"], y = row["employee_count"],
+            text = f"<b>R$ {row['average_wage']:,.2f}</b>".replace(",", "X").replace(".", ",").replace("X", "."),
+            showarrow = False, font = dict(color = "white", size = 12),
+            align = "center", bordercolor = "black",
+            borderwidth = 1, bgcolor = "black", opacity = 0.8
+        )
+
+    figure8.update_layout(
+        title_font_size = 18,
+        font = dict(size = 14, family = "Arial", color = "black"),
+        plot_bgcolor = "white",
+        paper_bgcolor = "white",
+        legend = dict(title = "", borderwidth = 0, font_size = 12, bgcolor = "rgba(0,0,0,0)"),
+        xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
+        yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
+        separators = ",."
+    )
+
+    return figure8
+
+# get_figure8().show()
+
+@artifact
+def get_price_optimization():
+    sales_summary = get_sales_summary()
+
+    optimal_prices = []
+    gam_results = {}
+
+    items, fit_arguments = md.item_arrays(sales_summary)
+
+    # Unchanged items are loaded from the model store; the rest are fitted over CONECTOR_WORKERS processes
+    demand_curves = md.fit_demand_curves(items, fit_arguments)
+
+    # Exact revenue maximizer of every fitted curve within its observed price range
+    curves = md.DemandCurves.from_gams([gam for _, _, gam in demand_curves])
+    optima = md.optimize_revenue(curves,
+                                 [price_values.min() for price_values, _ in fit_arguments],
+                                 [price_values.max() for price_values, _ in fit_arguments])
+
+    for item, (price_range, demand_estimated, gam), optimum in zip(items, demand_curves, optima.itertuples()):
+        revenue_estimated = price_range * demand_estimated / 1000
+
+        optimal_price = optimum.optimal_price
+        optimal_quantity_sold = optimum.optimal_quantity_sold
+
+        optimal_prices.append({
+            "item": item,
+            "optimal_price": round(optimal_price, 2),
+            "expected_quantity_sold": round(optimal_quantity_sold, 2),
+            "expected_revenue": round(optimum.optimal_revenue, 2)
+        })
+
+        gam_results[item] = {
+            "price_range": price_range,
+            "demand_estimated": demand_estimated,
+            "revenue_estimated": revenue_estimated,
+            "optimal_price": optimal_price,
+            "optimal_quantity_sold": optimal_quantity_sold,
+            "optimal_elasticity": optimum.optimal_elasticity,
+            "lam": gam.lam
+        }
+
+    return optimal_prices, gam_results, curves
+
+@artifact
+def get_optimal_prices():
+    optimal_prices = get_price_optimization()[0]
+
+    return optimal_prices
+
+@artifact
+def get_gam_results():
+    gam_results = get_price_optimization()[1]
+
+    return gam_results
+
+@artifact
+def get_demand_curves():
+    demand_curves = get_price_optimization()[2]
+
+    return demand_curves
+
+@artifact
+def get_optimal_price_intervals():
+    sales_summary = get_sales_summary()
+    gam_results = get_gam_results()
+
+    # Percentile intervals over resampled sales; CONECTOR_BOOTSTRAP_REPLICATES sets the count
+    items, fit_arguments = md.item_arrays(sales_summary)
+    optimal_price_intervals = md.bootstrap_intervals(items, fit_arguments, {item: gam_results[item]["lam"] for item in items})
+
+    return optimal_price_intervals
 
 colors = ["#636efa", "#ef553b", "#00cc96", "#ab63fa", "#ffa15a", 
           "#19d3f3", "#ff6692", "#b6e880", "#bcbd22", "#17becf"]
 
-for index, item in enumerate(sales_summary["item"].unique()):
-    item_data = sales_summary[sales_summary["item"] == item]
-    result = gam_results[item]
-    color = colors[index % len(colors)]
-    visible = (item == sales_summary["item"].unique()[0])
-
-    figure9.add_trace(go.Scatter(
-        x = item_data["price"], y = item_data["quantity_sold"], 
-        mode = "markers", name = "Observado",
-        marker = dict(size = 8, color = color, opacity = 0.6),
-        visible = visible, legendgroup = "observed", showlegend = True
-    ))
+@artifact
+def get_figure9():
+    sales_summary = get_sales_summary()
+    gam_results = get_gam_results()
+
+    figure9 = go.Figure()
+
+    for index, item in enumerate(sales_summary["item"].unique()):
+        item_data = sales_summary[sales_summary["item"] == item]
+        result = gam_results[item]
+        color = colors[index % len(colors)]
+        visible = (item == sales_summary["item"].unique()[0])
+
+        figure9.add_trace(go.Scatter(
+            x = item_data["price"], y = item_data["quantity_sold"], 
+            mode = "markers", name = "Observado",
+            marker = dict(size = 8, color = color, opacity = 0.6),
+            visible = visible, legendgroup = "observed", showlegend = True
+        ))
+
+        figure9.add_trace(go.Scatter(
+            x = result["price_range"], y = result["demand_estimated"],
+            mode = "lines", name = "Demanda estimada",
+            line = dict(color = color, width = 2),
+            visible = visible, legendgroup = "demand", showlegend = True
+        ))
+
+        figure9.add_trace(go.Scatter(
+            x = result["price_range"], y = result["revenue_estimated"],
+            mode = "lines", name = "Receita",
+            line = dict(color = color, dash = "dot", width = 2),
+            yaxis = "y2", visible = visible, 
+            legendgroup = "revenue", showlegend = True
+        ))
+
+        figure9.add_trace(go.Scatter(
+            x = [result["optimal_price"]], y = [result["optimal_quantity_sold"]],
+            mode = "markers+text", text = [f"Ótimo: R$ {result["optimal_price"]:.2f}"],
+            textposition = "top center", marker = dict(color = color, size = 10),
+            name = "Ótimo", visible = visible, 
+            legendgroup = "optimal", showlegend = True
+        ))
+
+    buttons = []
+
+    for item in sales_summary["item"].unique():
+        buttons.append({
+            "label": item, "method": "update",
+            "args": [{"visible": [item == coffee for coffee in sales_summary["item"].unique() for _ in range(4)],
+                      "title": f"Forecasting e Relacionados — Generalized Additive Model (GAM)"}]
+        })
+
+    figure9.update_layout(
+        title = f"Forecasting e Relacionados — Generalized Additive Model (GAM)",
+        title_font_size = 18, font = dict(size = 14, family = "Arial", color = "black"),
+        width = 1000, height = 500, plot_bgcolor = "white", paper_bgcolor = "white",
+        xaxis = dict(title = "Preço (R$)", showgrid = True, gridcolor = "lightgrey", 
+                     zeroline = False, title_font_size = 14),
+        yaxis = dict(title = "Quantidade Vendida", showgrid = True, gridcolor = "lightgrey", 
+                     zeroline = False, title_font_size = 14),
+        yaxis2 = dict(title = "Receita (mil R$)", overlaying = "y", side = "right",
+                      showgrid = False, zeroline = False, title_font_size = 14),
+        legend = dict(title = "", borderwidth = 0, font_size = 12, 
+                      bgcolor = "rgba(0,0,0,0)", orientation = "v", x = 1.08, y = 1),
+        updatemenus = [dict(
+            buttons = buttons, direction = "down", showactive = True,
+            x = 1.0, xanchor = "right", y = 1.15, yanchor = "top"
+        )]
+    )
 
-    figure9.add_trace(go.Scatter(
-        x = result["price_range"], y = result["demand_estimated"],
-        mode = "lines", name = "Demanda estimada",
-        line = dict(color = color, width = 2),
-        visible = visible, legendgroup = "demand", showlegend = True
-    ))
+    return figure9
 
-    figure9.add_trace(go.Scatter(
-        x = result["price_range"], y = result["revenue_estimated"],
-        mode = "lines", name = "Receita",
-        line = dict(color = color, dash = "dot", width = 2),
-        yaxis = "y2", visible = visible, 
-        legendgroup = "revenue", showlegend = True
-    ))
+# get_figure9().show()
 
-    figure9.add_trace(go.Scatter(
-        x = [result["optimal_price"]], y = [result["optimal_quantity_sold"]],
-        mode = "markers+text", text = [f"Ótimo: R$ {result["optimal_price"]:.2f}"],
-        textposition = "top center", marker = dict(color = color, size = 10),
-        name = "Ótimo", visible = visible, 
-        legendgroup = "optimal", showlegend = True
-    ))
+@artifact
+def get_optimal_elasticities():
+    sales_summary = get_sales_summary()
+    gam_results = get_gam_results()
 
-buttons = []
+    optimal_elasticities = []
 
-for item in sales_summary["item"].unique():
-    buttons.append({
-        "label": item, "method": "update",
-        "args": [{"visible": [item == coffee for coffee in sales_summary["item"].unique() for _ in range(4)],
-                  "title": f"Forecasting e Relacionados — Generalized Additive Model (GAM)"}]
-    })
+    # At an interior optimum the elasticity is -1 by construction; it only differs where the optimum sits on a price bound
+    for item in sales_summary["item"].unique():
+        result = gam_results[item]
 
-figure9.update_layout(
-    title = f"Forecasting e Relacionados — Generalized Additive Model (GAM)",
-    title_font_size = 18, font = dict(size = 14, family = "Arial", color = "black"),
-    width = 1000, height = 500, plot_bgcolor = "white", paper_bgcolor = "white",
-    xaxis = dict(title = "Preço (R$)", showgrid = True, gridcolor = "lightgrey", 
-                 zeroline = False, title_font_size = 14),
-    yaxis = dict(title = "Quantidade Vendida", showgrid = True, gridcolor = "lightgrey", 
-                 zeroline = False, title_font_size = 14),
-    yaxis2 = dict(title = "Receita (mil R$)", overlaying = "y", side = "right",
-                  showgrid = False, zeroline = False, title_font_size = 14),
-    legend = dict(title = "", borderwidth = 0, font_size = 12, 
-                  bgcolor = "rgba(0,0,0,0)", orientation = "v", x = 1.08, y = 1),
-    updatemenus = [dict(
-        buttons = buttons, direction = "down", showactive = True,
-        x = 1.0, xanchor = "right", y = 1.15, yanchor = "top"
-    )]
-)
-
-# figure9.show()
-
-optimal_elasticities = []
-
-for item in sales_summary["item"].unique():
-    result = gam_results[item]
-    price_range = result["price_range"]
-    demand_estimated = result["demand_estimated"]
-    optimal_index = np.argmax(result["revenue_estimated"])
-
-    optimal_P = price_range[optimal_index]
-    optimal_Q = demand_estimated[optimal_index]
-
-    if optimal_index > 0 and optimal_index < len(price_range) - 1:
-        dP = price_range[optimal_index + 1] - price_range[optimal_index - 1]
-        dQ = demand_estimated[optimal_index + 1] - demand_estimated[optimal_index - 1]
-        dQ_dP = dQ / dP
-    elif optimal_index == 0:
-        dP = price_range[1] - price_range[0]
-        dQ = demand_estimated[1] - demand_estimated[0]
-        dQ_dP = dQ / dP
-    else:
-        dP = price_range[-1] - price_range[-2]
-        dQ = demand_estimated[-1] - demand_estimated[-2]
-        dQ_dP = dQ / dP
-
-    optimal_elasticity = dQ_dP * (optimal_P / optimal_Q)
-
-    optimal_elasticities.append({
-        "item": item,
-        "optimal_price": optimal_P,
-        "predicted_quantity_sold": optimal_Q,
-        "optimal_elasticity": np.abs(optimal_elasticity)
-    })
+        optimal_elasticities.append({
+            "item": item,
+            "optimal_price": result["optimal_price"],
+            "predicted_quantity_sold": result["optimal_quantity_sold"],
+            "optimal_elasticity": np.abs(result["optimal_elasticity"])
+        })
+
+    optimal_elasticities = pd.DataFrame(optimal_elasticities)
+
+    return optimal_elasticities
+
+@artifact
+def get_figure10():
+    optimal_elasticities = get_optimal_elasticities()
+
+    figure10 = px.bar(
+        optimal_elasticities,
+        x = "item", y = "optimal_elasticity", color = "item",
+        labels = {"item": "Item", "optimal_elasticity": "Nível"},
+        title = "Forecasting e Relacionados — Elasticidades-preço da Demanda Ótimas", width = 1000, height = 500
+    )
 
-optimal_elasticities = pd.DataFrame(optimal_elasticities)
-
-figure10 = px.bar(
-    optimal_elasticities,
-    x = "item", y = "optimal_elasticity", color = "item",
-    labels = {"item": "Item", "optimal_elasticity": "Nível"},
-    title = "Forecasting e Relacionados — Elasticidades-preço da Demanda Ótimas", width = 1000, height = 500
-)
-
-for index, row in optimal_elasticities.iterrows():
-    figure10.add_annotation(
-        x = row["item"], y = row["optimal_elasticity"],
-        text = f"<b>{row["optimal_elasticity"]:.2f}</b>".replace(".", ","),
-        showarrow = False, font = dict(color = "white", size = 12),
-        align = "center", bordercolor = "black",
-        borderwidth = 1, bgcolor = "black", opacity = 0.8
+    for index, row in optimal_elasticities.iterrows():
+        figure10.add_annotation(
+            x = row["item"], y = row["optimal_elasticity"],
+            text = f"<b>{row["optimal_elasticity"]:.2f}</b>".replace(".", ","),
+            showarrow = False, font = dict(color = "white", size = 12),
+            align = "center", bordercolor = "black",
+            borderwidth = 1, bgcolor = "black", opacity = 0.8
+        )
+
+    figure10.update_layout(
+        title_font_size = 18,
+        font = dict(size = 14, family = "Arial", color = "black"),
+        plot_bgcolor = "white",
+        paper_bgcolor = "white",
+        legend = dict(title = "", borderwidth = 0, font_size = 12, bgcolor = "rgba(0,0,0,0)"),
+        xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
+        yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
+        separators = ",."
     )
 
-figure10.update_layout(
-    title_font_size = 18,
-    font = dict(size = 14, family = "Arial", color = "black"),
-    plot_bgcolor = "white",
-    paper_bgcolor = "white",
-    legend = dict(title = "", borderwidth = 0, font_size = 12, bgcolor = "rgba(0,0,0,0)"),
-    xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
-    yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14),
-    separators = ",."
-)
+    return figure10
+
+# get_figure10().show()
+
+@artifact
+def get_cross_price_elasticities():
+    daily_sales = get_daily_sales()
+
+    # Every item's daily demand against the prices of the whole menu; CONECTOR_CROSS_PRICE_RIDGE sets the shrinkage
+    intercepts, elasticities, daily_prices = md.cross_price_elasticities(daily_sales)
+
+    return intercepts, elasticities, daily_prices
+
+@artifact
+def get_joint_optimal_prices():
+    optimal_prices = get_optimal_prices()
+    demand_curves = get_demand_curves()
+    intercepts, elasticities, daily_prices = get_cross_price_elasticities()
+    latest_prices = get_latest_prices()
+
+    items = [optimal_price["item"] for optimal_price in optimal_prices]
+    elasticities = elasticities.reindex(index = items, columns = items).fillna(0.0)
+
+    # The curves were fitted with the rest of the menu at its usual prices, so the cross terms are measured from there
+    reference_prices = np.exp(np.log(daily_prices[items]).mean())
+
+    # The menu is priced as a whole, so raising one item accounts for the demand it moves to or from the others
+    joint_optimal_prices = md.optimize_menu(demand_curves, elasticities, reference_prices, [
+        [optimal_price["optimal_price"] for optimal_price in optimal_prices],
+        latest_prices.reindex(items).fillna(reference_prices)
+    ])
+
+    joint_optimal_prices = joint_optimal_prices.rename_axis("item").reset_index()
+
+    return joint_optimal_prices
+
+
+@artifact
+def get_items_list():
+    sales_summary = get_sales_summary()
+
+    items_list = list(sales_summary["item"].unique())
+
+    return items_list
+
+@artifact
+def get_decomposition_data():
+    daily_revenue = get_daily_revenue()
+    items_list = get_items_list()
+
+    decomposition_frames = []
+    series_list = []
+
+    for index, item in enumerate(items_list):
+        series = (daily_revenue.loc[daily_revenue["item"] == item, ["date", "daily_revenue"]]
+                                      .set_index("date")
+                                      .sort_index()
+                                      .asfreq("D"))
+
+        series["daily_revenue"] = series["daily_revenue"].fillna(0.0)
+        series_list.append(series)
+
+    # Robust STL per item over CONECTOR_WORKERS processes; CONECTOR_STL_WINDOW re-decomposes only the newest days
+    components = md.decompose_items(items_list,
+                                    [series.index[0] for series in series_list],
+                                    [series["daily_revenue"].values.astype(float) for series in series_list])
+
+    for item, series, item_components in zip(items_list, series_list, components):
+        decomposition_frame = pd.DataFrame({
+            "date": series.index,
+            "item": item,
+            "trend": item_components[:, 0],
+            "seasonal": item_components[:, 1],
+            "residual": item_components[:, 2]
+        })
+
+        decomposition_frames.append(decomposition_frame)
+
+    decomposition_data = pd.concat(decomposition_frames, ignore_index = True)
 
-# figure10.show()
+    return decomposition_data
 
-daily_revenue = (database_revenue.groupby(["date", "item"])["price"]
-                 .sum().reset_index(name = "daily_revenue"))
+@artifact
+def get_figure11():
+    items_list = get_items_list()
+    decomposition_data = get_decomposition_data()
 
-daily_revenue["date"] = pd.to_datetime(daily_revenue["date"])
+    figure11 = make_subplots(
+        rows = 3, cols = 1, shared_xaxes = True, vertical_spacing = 0.08,
+        subplot_titles = ("Tendência", "Sazonalidade", "Resíduo")
+    )
+
+    trace_visibility = []
+
+    for index, item in enumerate(items_list):
+        color = colors[index % len(colors)]
+        slice = decomposition_data[decomposition_data["item"] == item]
+
+        is_visible = (index == 0)
+
+        figure11.add_trace(
+            go.Scatter(
+                x = slice["date"], y = slice["trend"],
+                mode = "lines", name = "Tendência",
+                line = dict(width = 2, color = color),
+                visible = is_visible,
+                showlegend = True
+            ),
+            row = 1, col = 1
+        )
+        trace_visibility.append(is_visible)
+
+        figure11.add_trace(
+            go.Scatter(
+                x = slice["date"], y = slice["seasonal"],
+                mode = "lines", name = "Sazonalidade",
+                line = dict(width = 2.75, color = color),
+                visible = is_visible,
+                showlegend = True
+            ),
+            row = 2, col = 1
+        )
+        trace_visibility.append(is_visible)
+
+        figure11.add_trace(
+            go.Scatter(
+                x = slice["date"], y = slice["residual"],
+                mode = "lines", name = "Resíduo",
+                line = dict(width = 2, color = color, dash = "dot"),
+                visible = is_visible,
+                showlegend = True
+            ),
+            row = 3, col = 1
+        )
+        trace_visibility.append(is_visible)
+
+    buttons = []
+    traces_per_item = 3
+    total_traces = traces_per_item * len(items_list)
+
+    for index, item in enumerate(items_list):
+        visibility_mask = [False] * total_traces
+        start = index * traces_per_item
+        for k in range(traces_per_item):
+            visibility_mask[start + k] = True
+
+        buttons.append(dict(
+            label = item,
+            method = "update",
+            args = [
+                {"visible": visibility_mask},
+                {"title": f"Decomposição de Receita — {item}"}
+            ]
+        ))
+
+    figure11.update_layout(
+        title = f"Forecasting e Relacionados — Tendência, Sazonalidade e Resíduo",
+        title_font_size = 18,
+        font = dict(size = 14, family = "Arial", color = "black"),
+        width = 1000, height = 700,
+        plot_bgcolor = "white", paper_bgcolor = "white",
+        legend = dict(title = "", borderwidth = 0, font_size = 12, bgcolor = "rgba(0,0,0,0)"),
+        updatemenus = [dict(
+            buttons = buttons, direction = "down", showactive = True,
+            x = 1.0, xanchor = "right", y = 1.15, yanchor = "top"
+        )]
+    )
 
-items_list = list(sales_summary["item"].unique())
+    figure11.update_xaxes(
+        showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14,
+        tickformat = "%d/%m/%Y", row = 3, col = 1, title_text = "Data"
+    )
+    figure11.update_xaxes(
+        showgrid = True, gridcolor = "lightgrey", zeroline = False, tickformat = "%d/%m/%Y", row = 1, col = 1
+    )
+    figure11.update_xaxes(
+        showgrid = True, gridcolor = "lightgrey", zeroline = False, tickformat = "%d/%m/%Y", row = 2, col = 1
+    )
 
-decomposition_frames = []
+    figure11.update_yaxes(title_text = "Nível", showgrid = True, gridcolor = "lightgrey",
+                         zeroline = False, title_font_size = 14, row = 1, col = 1)
+    figure11.update_yaxes(title_text = "Nível", showgrid = True, gridcolor = "lightgrey",
+                         zeroline = False, title_font_size = 14, row = 2, col = 1)
+    figure11.update_yaxes(title_text = "Nível", showgrid = True, gridcolor = "lightgrey",
+                         zeroline = False, title_font_size = 14, row = 3, col = 1)
 
-for index, item in enumerate(items_list):
-    series = (daily_revenue.loc[daily_revenue["item"] == item, ["date", "daily_revenue"]]
-                                  .set_index("date")
-                                  .sort_index()
-                                  .asfreq("D"))
+    return figure11
 
-    series["daily_revenue"] = series["daily_revenue"].fillna(0.0)
+# get_figure11().show()
 
-    stl = STL(series["daily_revenue"], period = 7, robust = True)
-    stl_result = stl.fit()
+@artifact
+def get_demand_forecast():
+    daily_sales = get_daily_sales()
 
-    decomposition_frame = pd.DataFrame({
-        "date": series.index,
-        "item": item,
-        "trend": stl_result.trend,
-        "seasonal": stl_result.seasonal,
-        "residual": stl_result.resid
-    }).reset_index(drop = True)
+    # Daily quantity and revenue for the next CONECTOR_FORECAST_HORIZON days, for every item in one batch
+    demand_forecast = md.forecast_daily(daily_sales, ["quantity_sold", "daily_revenue"])
 
-    decomposition_frames.append(decomposition_frame)
+    return demand_forecast
 
-decomposition_data = pd.concat(decomposition_frames, ignore_index = True)
+@artifact
+def get_figure15():
+    items_list = get_items_list()
+    daily_sales = get_daily_sales()
+    demand_forecast = get_demand_forecast()
 
-figure11 = make_subplots(
-    rows = 3, cols = 1, shared_xaxes = True, vertical_spacing = 0.08,
-    subplot_titles = ("Tendência", "Sazonalidade", "Resíduo")
-)
+    figure15 = go.Figure()
 
-trace_visibility = []
+    recent_sales = daily_sales[daily_sales["date"] > daily_sales["date"].max() - pd.Timedelta(days = 56)]
+    traces_per_item = 4
 
-for index, item in enumerate(items_list):
-    color = colors[index % len(colors)]
-    slice = decomposition_data[decomposition_data["item"] == item]
+    for index, item in enumerate(items_list):
+        color = colors[index % len(colors)]
+        history = recent_sales[recent_sales["item"] == item]
+        forecast = demand_forecast[demand_forecast["item"] == item]
 
-    is_visible = (index == 0)
+        is_visible = (index == 0)
 
-    figure11.add_trace(
-        go.Scatter(
-            x = slice["date"], y = slice["trend"],
-            mode = "lines", name = "Tendência",
+        figure15.add_trace(go.Scatter(
+            x = history["date"], y = history["quantity_sold"],
+            mode = "lines", name = "Observado",
             line = dict(width = 2, color = color),
-            visible = is_visible,
-            showlegend = True
-        ),
-        row = 1, col = 1
+            visible = is_visible
+        ))
+
+        figure15.add_trace(go.Scatter(
+            x = forecast["date"], y = forecast["quantity_sold_upper"],
+            mode = "lines", line = dict(width = 0),
+            showlegend = False, hoverinfo = "skip",
+            visible = is_visible
+        ))
+
+        figure15.add_trace(go.Scatter(
+            x = forecast["date"], y = forecast["quantity_sold_lower"],
+            mode = "lines", line = dict(width = 0), name = "Intervalo de 95%",
+            fill = "tonexty", fillcolor = "rgba(128, 128, 128, 0.25)",
+            visible = is_visible
+        ))
+
+        figure15.add_trace(go.Scatter(
+            x = forecast["date"], y = forecast["quantity_sold"],
+            mode = "lines", name = "Previsão",
+            line = dict(width = 2, color = color, dash = "dash"),
+            visible = is_visible
+        ))
+
+    buttons = []
+    total_traces = traces_per_item * len(items_list)
+
+    for index, item in enumerate(items_list):
+        visibility_mask = [False] * total_traces
+        start = index * traces_per_item
+        for k in range(traces_per_item):
+            visibility_mask[start + k] = True
+
+        buttons.append(dict(
+            label = item,
+            method = "update",
+            args = [
+                {"visible": visibility_mask},
+                {"title": f"Previsão de Vendas Diárias — {item}"}
+            ]
+        ))
+
+    figure15.update_layout(
+        title = "Forecasting e Relacionados — Previsão de Vendas Diárias",
+        title_font_size = 18,
+        font = dict(size = 14, family = "Arial", color = "black"),
+        width = 1000, height = 500,
+        plot_bgcolor = "white", paper_bgcolor = "white",
+        legend = dict(title = "", borderwidth = 0, font_size = 12, bgcolor = "rgba(0,0,0,0)"),
+        xaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14, tickformat = "%d/%m/%Y", title_text = "Data"),
+        yaxis = dict(showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14, title_text = "Quantidade Vendida"),
+        updatemenus = [dict(
+            buttons = buttons, direction = "down", showactive = True,
+            x = 1.0, xanchor = "right", y = 1.15, yanchor = "top"
+        )]
     )
-    trace_visibility.append(is_visible)
-
-    figure11.add_trace(
-        go.Scatter(
-            x = slice["date"], y = slice["seasonal"],
-            mode = "lines", name = "Sazonalidade",
-            line = dict(width = 2.75, color = color),
-            visible = is_visible,
-            showlegend = True
+
+    return figure15
+
+# get_figure15().show()
+
+
+@artifact
+def get_comparison_table():
+    optimal_prices = get_optimal_prices()
+    latest_prices = get_latest_prices()
+    joint_optimal_prices = get_joint_optimal_prices()
+
+    comparison_table = pd.DataFrame(optimal_prices)
+
+    comparison_table["current_price"] = comparison_table["item"].map(latest_prices)
+    comparison_table["percent_difference"] = (comparison_table["optimal_price"] - comparison_table["current_price"]) / comparison_table["current_price"] * 100
+    comparison_table["joint_optimal_price"] = comparison_table["item"].map(joint_optimal_prices.set_index("item")["joint_optimal_price"])
+    comparison_table["joint_percent_difference"] = (comparison_table["joint_optimal_price"] - comparison_table["current_price"]) / comparison_table["current_price"] * 100
+    comparison_table["estimated_revenue"] = comparison_table["optimal_price"] * comparison_table["expected_quantity_sold"]
+
+    comparison_table = comparison_table[[
+        "item",
+        "current_price",
+        "optimal_price",
+        "percent_difference",
+        "joint_optimal_price",
+        "joint_percent_difference",
+        "expected_quantity_sold",
+        "estimated_revenue"
+    ]]
+
+    comparison_table.columns = [
+        "Item",
+        "Preço Atual (R$)",
+        "Preço Ótimo (R$)",
+        "Diferença (%)",
+        "Preço Ótimo Conjunto (R$)",
+        "Diferença Conjunta (%)",
+        "Quantidade Vendida Estimada",
+        "Receita Estimada (R$)"
+    ]
+
+    for column in comparison_table.columns:
+        if pd.api.types.is_numeric_dtype(comparison_table[column]):
+            comparison_table[column] = comparison_table[column].apply(lambda x: f"{x:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+
+    # A joint price stuck at the edge of the observed prices only says the data ran out, so it is flagged as such
+    at_bound = comparison_table["Item"].map(joint_optimal_prices.set_index("item")["joint_at_bound"]).fillna(False).astype(bool)
+    comparison_table.loc[at_bound, "Preço Ótimo Conjunto (R$)"] += " (limite)"
+
+    comparison_table.to_excel("Entregável - Tabela de Comparação.xlsx", index = False)
+
+    return comparison_table
+
+# revision = pd.read_excel("Entregável - Tabela de Comparação.xlsx")
+# revision.head(5).style.hide(axis = "index")
+
+@artifact
+def get_cash_flow():
+    if state_directory:
+        return inc.build_cash_flow(load_state_aggregate("monthly_totals"))
+
+    monthly_revenue = get_data_source().monthly_revenue()
+    monthly_expense = get_data_source().monthly_expense()
+
+    date_range = pd.date_range(start = monthly_revenue["date"].min(), end = monthly_revenue["date"].max(), freq = "M")
+    calendar = pd.DataFrame({"date": date_range})
+
+    cash_flow = calendar.merge(monthly_revenue, on = "date", how = "left")
+    cash_flow = cash_flow.merge(monthly_expense, on = "date", how = "left")
+    cash_flow.fillna(0, inplace = True)
+
+    cash_flow["net_income"] = cash_flow["monthly_revenue"] - cash_flow["monthly_expense"]
+    cash_flow["net_margin_percentage"] = (cash_flow["net_income"] / cash_flow["monthly_revenue"]) * 100
+    cash_flow["net_margin_percentage"].replace([np.inf, -np.inf], 0, inplace = True)
+
+    cash_flow["monthly_revenue"] = cash_flow["monthly_revenue"] / 1000
+    cash_flow["monthly_expense"] = cash_flow["monthly_expense"] / 1000
+
+    return cash_flow
+
+@artifact
+def get_figure12():
+    cash_flow = get_cash_flow()
+
+    figure12 = go.Figure()
+
+    figure12.add_trace(go.Bar(
+        x = cash_flow["date"],
+        y = cash_flow["monthly_revenue"],
+        name = "Entradas",
+        marker_color = "#00cc96",
+    ))
+
+    figure12.add_trace(go.Bar(
+        x = cash_flow["date"],
+        y = -cash_flow["monthly_expense"],
+        name = "Saídas",
+        marker_color = "#ef553b",
+    ))
+
+    figure12.add_trace(go.Scatter(
+        x = cash_flow["date"],
+        y = cash_flow["net_margin_percentage"],
+        name = "Margem Líquida",
+        line = dict(color = "darkgray", width = 3, dash = "dot"),
+        yaxis = "y2"
+    ))
+
+    for index, row in cash_flow.iterrows():
+        figure12.add_annotation(
+            x = row["date"], y = row["monthly_revenue"],
+            text = f"<b>{row['monthly_revenue']:,.2f}</b>".replace(".", ","),
+            showarrow = False, font = dict(color = "white", size = 12),
+            align = "center", bordercolor = "black",
+            borderwidth = 1, bgcolor = "black", opacity = 0.8
+        )
+
+    for index, row in cash_flow.iterrows():
+        figure12.add_annotation(
+            x = row["date"], y = -row["monthly_expense"],
+            text = f"<b>{row['monthly_expense']:,.2f}</b>".replace(".", ","),
+            showarrow = False, font = dict(color = "white", size = 12),
+            align = "center", bordercolor = "black",
+            borderwidth = 1, bgcolor = "black", opacity = 0.8
+        )
+
+    figure12.update_layout(
+        title = "Fluxo de Caixa e Estoque — Movimentações Mensais",
+        xaxis_title = "Data",
+        yaxis_title = "Movimentação (R$ mil)",
+        yaxis2 = dict(
+            title = "Margem Líquida (%)",
+            overlaying = "y",
+            side = "right",
+            range = [cash_flow["net_margin_percentage"].min() - 10, cash_flow["net_margin_percentage"].max() + 10],
+            title_font_size = 14
         ),
-        row = 2, col = 1
-    )
-    trace_visibility.append(is_visible)
-
-    figure11.add_trace(
-        go.Scatter(
-            x = slice["date"], y = slice["residual"],
-            mode = "lines", name = "Resíduo",
-            line = dict(width = 2, color = color, dash = "dot"),
-            visible = is_visible,
-            showlegend = True
+        title_font_size = 18,
+        font = dict(size = 14, family = "Arial", color = "black"),
+        plot_bgcolor = "white",
+        paper_bgcolor = "white",
+        legend = dict(title = "", font_size = 12, bgcolor = "rgba(0,0,0,0)",
+                      x = 1.1, y = 1, xanchor = "left", yanchor = "top"),
+        xaxis = dict(
+            showgrid = True, 
+            gridcolor = "lightgrey", 
+            zeroline = False, 
+            title_font_size = 14,
+            tickformat = "%m/%Y",
+            dtick = "M1"
         ),
-        row = 3, col = 1
+        yaxis = dict(
+            showgrid = True, 
+            gridcolor = "lightgrey", 
+            zeroline = False, 
+            title_font_size = 14
+        ),
+        barmode = "relative",
+        width = 1000, height = 500
     )
-    trace_visibility.append(is_visible)
-
-buttons = []
-traces_per_item = 3
-total_traces = traces_per_item * len(items_list)
-
-for index, item in enumerate(items_list):
-    visibility_mask = [False] * total_traces
-    start = index * traces_per_item
-    for k in range(traces_per_item):
-        visibility_mask[start + k] = True
-
-    buttons.append(dict(
-        label = item,
-        method = "update",
-        args = [
-            {"visible": visibility_mask},
-            {"title": f"Decomposição de Receita — {item}"}
-        ]
+
+    return figure12
+
+# get_figure12().show()
+
+@artifact
+def get_annual_cash_flow():
+    cash_flow = get_cash_flow()
+
+    annual_cash_flow = cash_flow.copy()
+    annual_cash_flow.set_index('date', inplace=True)
+    annual_cash_flow['year'] = annual_cash_flow.index.year
+    annual_cash_flow = annual_cash_flow.groupby('year').agg({
+        'monthly_expense': 'sum',
+        'monthly_revenue': 'sum'
+    }).reset_index()
+    annual_cash_flow.rename(columns={'monthly_expense': 'annual_expense', 'monthly_revenue': 'annual_revenue'}, inplace=True)
+
+    return annual_cash_flow
+
+@artifact
+def get_projected_cash_flow():
+    simulated_cash_flow = get_simulated_cash_flow()
+
+    # The projection is the median path of the simulation, whose growth is estimated from the history instead of a
+    # fixed 10% a year; the margin is taken between the two medians so the table adds up
+    projected_cash_flow = simulated_cash_flow.loc[["Receitas (P50)", "Despesas (P50)"]].rename(index = {"Receitas (P50)": "Receitas", "Despesas (P50)": "Despesas"})
+    projected_cash_flow.loc["Margem"] = projected_cash_flow.loc["Receitas"] - projected_cash_flow.loc["Despesas"]
+    projected_cash_flow.index.name = None
+
+    return projected_cash_flow
+
+@artifact
+def get_cash_flow_growth():
+    cash_flow = get_cash_flow()
+
+    # The first and last months of the records are partial for at least one of the series, so only the months between them are used
+    growth_mean, growth_covariance = md.estimate_growth(cash_flow[["monthly_revenue", "monthly_expense"]].iloc[1:-1])
+
+    return growth_mean, growth_covariance
+
+def simulate_projected_cash_flow(revenue_growth = None, expense_growth = None, volatility = 1.0, years = 5, paths = None, seed = 0, percentiles = (5, 50, 95)):
+    cash_flow = get_cash_flow()
+    annual_cash_flow = get_annual_cash_flow()
+    growth_mean, growth_covariance = get_cash_flow_growth()
+
+    # A growth left as None keeps the historical estimate; volatility scales the historical dispersion
+    assumed_growth = np.array([revenue_growth, expense_growth], dtype = float)
+    growth_mean = np.where(np.isnan(assumed_growth), growth_mean, assumed_growth)
+
+    last_year_cashflow = annual_cash_flow['year'].max()
+
+    # The last calendar year is usually partial, so the paths start from the run rate of the last twelve complete months
+    complete_months = cash_flow[["monthly_revenue", "monthly_expense"]].iloc[1:-1].tail(12)
+    last_values = complete_months.mean().values * 12
+
+    # CONECTOR_SIMULATION_PATHS paths by default, all drawn at once
+    simulated = md.simulate_growth_paths(last_values, growth_mean, growth_covariance * volatility ** 2, years, paths, seed)
+    bands = md.cash_flow_bands(simulated[..., 0], simulated[..., 1], percentiles)
+
+    history = pd.DataFrame({
+        'Receitas': annual_cash_flow['annual_revenue'].values,
+        'Despesas': annual_cash_flow['annual_expense'].values
+    }, index = annual_cash_flow['year'].values)
+    history['Margem'] = history['Receitas'] - history['Despesas']
+
+    years_index = list(history.index) + list(range(last_year_cashflow + 1, last_year_cashflow + years + 1))
+
+    simulated_cash_flow = pd.DataFrame([
+        np.concatenate([history[rubric].values, bands[rubric_index, percentile_index]])
+        for rubric_index, rubric in enumerate(history.columns)
+        for percentile_index in range(len(percentiles))
+    ], index = [f"{rubric} (P{percentile})" for rubric in history.columns for percentile in percentiles], columns = years_index)
+    simulated_cash_flow.columns.name = 'Ano'
+
+    return simulated_cash_flow
+
+@artifact
+def get_simulated_cash_flow():
+    simulated_cash_flow = simulate_projected_cash_flow()
+
+    return simulated_cash_flow
+
+# print(get_projected_cash_flow())
+
+# Every ratio is a combination of balance sheet headings over another; an empty denominator gives an amount in R$
+ratio_definitions = {
+    "Liquidez Corrente": ({"Ativo Circulante": 1}, {"Passivo Circulante": 1}),
+    "Liquidez Seca": ({"Ativo Circulante": 1, "Estoque": -1}, {"Passivo Circulante": 1}),
+    "Liquidez Imediata": ({"Caixa e Equivalentes de Caixa": 1}, {"Passivo Circulante": 1}),
+    "Liquidez Geral": ({"Ativo Circulante": 1}, {"Passivo Circulante": 1, "Passivo Não Circulante": 1}),
+    "Capital de Giro Líquido": ({"Ativo Circulante": 1, "Passivo Circulante": -1}, {}),
+    "Endividamento Geral": ({"Passivo Total": 1}, {"Ativo Total": 1}),
+    "Composição do Endividamento": ({"Passivo Circulante": 1}, {"Passivo Total": 1}),
+    "Alavancagem (Passivo / PL)": ({"Passivo Total": 1}, {"Patrimônio Líquido": 1}),
+    "Dívida Líquida / PL": ({"Dívidas de Curto Prazo": 1, "Dívidas de Longo Prazo": 1, "Caixa e Equivalentes de Caixa": -1}, {"Patrimônio Líquido": 1}),
+    "Imobilização do PL": ({"Imobilizado": 1}, {"Patrimônio Líquido": 1}),
+    "Giro do Ativo (trimestral)": ({"Receita do Trimestre": 1}, {"Ativo Total": 1})
+}
+
+# Quarters covered by the ratio and liquidity views, as "1T 2025"-style labels; unset keeps the whole stored history
+balance_start = os.environ.get("CONECTOR_BALANCE_START")
+balance_end = os.environ.get("CONECTOR_BALANCE_END")
+
+@artifact
+def get_quarterly_revenue():
+    daily_sales = get_daily_sales()
+
+    # Built from the daily totals, so an SQL source never ships its transactions to pandas
+    quarters = daily_sales["date"].dt.to_period("Q")
+    quarterly_revenue = daily_sales.groupby(quarters)["daily_revenue"].sum().astype(float)
+
+    # Only quarters fully covered by the sales records, so a partial quarter never reads as a slow one
+    covered = (quarterly_revenue.index.start_time >= daily_sales["date"].min()) & (quarterly_revenue.index.end_time.normalize() <= daily_sales["date"].max())
+    quarterly_revenue = quarterly_revenue[covered]
+    quarterly_revenue.index = [f"{quarter.quarter}T {quarter.year}" for quarter in quarterly_revenue.index]
+
+    return quarterly_revenue
+
+@artifact
+def get_financial_ratios():
+    balance_store = get_balance_store()
+    quarterly_revenue = get_quarterly_revenue()
+
+    accounts = balance_store.matrix(balance_start, balance_end)
+    accounts.loc["Receita do Trimestre"] = quarterly_revenue.reindex(accounts.columns)
+
+    financial_ratios = md.financial_ratios(accounts, ratio_definitions)
+
+    return financial_ratios
+
+@artifact
+def get_liquidity_ratios():
+    financial_ratios = get_financial_ratios()
+
+    liquidity = ["Liquidez Corrente", "Liquidez Seca", "Liquidez Imediata"]
+
+    liquidity_ratios = financial_ratios[financial_ratios["ratio"].isin(liquidity)].pivot(index = "period", columns = "ratio", values = "value")
+    liquidity_ratios = liquidity_ratios.reindex(index = financial_ratios["period"].unique(), columns = liquidity)
+    liquidity_ratios = liquidity_ratios.rename_axis(index = "Trimestre", columns = None).reset_index()
+
+    return liquidity_ratios
+
+@artifact
+def get_figure13():
+    liquidity_ratios = get_liquidity_ratios()
+
+    figure13 = go.Figure()
+
+    figure13.add_trace(go.Scatter(
+        x = liquidity_ratios["Trimestre"], y = liquidity_ratios["Liquidez Corrente"],
+        mode = "lines+markers", name = "Liquidez Corrente",
+        line = dict(width = 2, color = "#636efa"), marker = dict(size = 8)
+    ))
+
+    figure13.add_trace(go.Scatter(
+        x = liquidity_ratios["Trimestre"], y = liquidity_ratios["Liquidez Seca"],
+        mode = "lines+markers", name = "Liquidez Seca",
+        line = dict(width = 2, color = "#ef553b"), marker = dict(size = 8)
+    ))
+
+    figure13.add_trace(go.Scatter(
+        x = liquidity_ratios["Trimestre"], y = liquidity_ratios["Liquidez Imediata"],
+        mode = "lines+markers", name = "Liquidez Imediata",
+        line = dict(width = 2, color = "#00cc96"), marker = dict(size = 8)
     ))
 
-figure11.update_layout(
-    title = f"Forecasting e Relacionados — Tendência, Sazonalidade e Resíduo",
-    title_font_size = 18,
-    font = dict(size = 14, family = "Arial", color = "black"),
-    width = 1000, height = 700,
-    plot_bgcolor = "white", paper_bgcolor = "white",
-    legend = dict(title = "", borderwidth = 0, font_size = 12, bgcolor = "rgba(0,0,0,0)"),
-    updatemenus = [dict(
-        buttons = buttons, direction = "down", showactive = True,
-        x = 1.0, xanchor = "right", y = 1.15, yanchor = "top"
-    )]
-)
-
-figure11.update_xaxes(
-    showgrid = True, gridcolor = "lightgrey", zeroline = False, title_font_size = 14,
-    tickformat = "%d/%m/%Y", row = 3, col = 1, title_text = "Data"
-)
-figure11.update_xaxes(
-    showgrid = True, gridcolor = "lightgrey", zeroline = False, tickformat = "%d/%m/%Y", row = 1, col = 1
-)
-figure11.update_xaxes(
-    showgrid = True, gridcolor = "lightgrey", zeroline = False, tickformat = "%d/%m/%Y", row = 2, col = 1
-)
-
-figure11.update_yaxes(title_text = "Nível", showgrid = True, gridcolor = "lightgrey",
-                     zeroline = False, title_font_size = 14, row = 1, col = 1)
-figure11.update_yaxes(title_text = "Nível", showgrid = True, gridcolor = "lightgrey",
-                     zeroline = False, title_font_size = 14, row = 2, col = 1)
-figure11.update_yaxes(title_text = "Nível", showgrid = True, gridcolor = "lightgrey",
-                     zeroline = False, title_font_size = 14, row = 3, col = 1)
-
-# figure11.show()
-
-comparison_table = pd.DataFrame(optimal_prices)
-
-comparison_table["current_price"] = comparison_table["item"].map(latest_prices)
-comparison_table["percent_difference"] = (comparison_table["optimal_price"] - comparison_table["current_price"]) / comparison_table["current_price"] * 100
-comparison_table["estimated_revenue"] = comparison_table["optimal_price"] * comparison_table["expected_quantity_sold"]
-
-comparison_table = comparison_table[[
-    "item",
-    "current_price",
-    "optimal_price",
-    "percent_difference",
-    "expected_quantity_sold",
-    "estimated_revenue"
-]]
-
-comparison_table.columns = [
-    "Item",
-    "Preço Atual (R$)",
-    "Preço Ótimo (R$)",
-    "Diferença (%)",
-    "Quantidade Vendida Estimada",
-    "Receita Estimada (R$)"
-]
-
-for column in comparison_table.columns:
-    if comparison_table[column].dtype in ["float64", "int64"]:
-        comparison_table[column] = comparison_table[column].apply(lambda x: f"{x:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
-
-comparison_table.to_excel("Entregável - Tabela de Comparação.xlsx", index = False)
-
-revision = pd.read_excel("Entregável - Tabela de Comparação.xlsx")
-revision.head(5).style.hide(axis = "index")
-
-database_revenue["date"] = pd.to_datetime(database_revenue["date"])
-database_expense["date"] = pd.to_datetime(database_expense["date"])
-
-monthly_revenue = database_revenue.groupby(pd.Grouper(key = "date", freq = "M"))["price"].sum().reset_index()
-monthly_revenue.rename(columns = {"price": "monthly_revenue"}, inplace = True)
-
-monthly_expense = database_expense.groupby(pd.Grouper(key = "date", freq = "M"))["subtotal"].sum().reset_index()
-monthly_expense.rename(columns = {"subtotal": "monthly_expense"}, inplace = True)
-
-date_range = pd.date_range(start = monthly_revenue["date"].min(), end = monthly_revenue["date"].max(), freq = "M")
-calendar = pd.DataFrame({"date": date_range})
-
-cash_flow = calendar.merge(monthly_revenue, on = "date", how = "left")
-cash_flow = cash_flow.merge(monthly_expense, on = "date", how = "left")
-cash_flow.fillna(0, inplace = True)
-
-cash_flow["net_income"] = cash_flow["monthly_revenue"] - cash_flow["monthly_expense"]
-cash_flow["net_margin_percentage"] = (cash_flow["net_income"] / cash_flow["monthly_revenue"]) * 100
-cash_flow["net_margin_percentage"].replace([np.inf, -np.inf], 0, inplace = True)
-
-cash_flow["monthly_revenue"] = cash_flow["monthly_revenue"] / 1000
-cash_flow["monthly_expense"] = cash_flow["monthly_expense"] / 1000
-
-figure12 = go.Figure()
-
-figure12.add_trace(go.Bar(
-    x = cash_flow["date"],
-    y = cash_flow["monthly_revenue"],
-    name = "Entradas",
-    marker_color = "#00cc96",
-))
-
-figure12.add_trace(go.Bar(
-    x = cash_flow["date"],
-    y = -cash_flow["monthly_expense"],
-    name = "Saídas",
-    marker_color = "#ef553b",
-))
-
-figure12.add_trace(go.Scatter(
-    x = cash_flow["date"],
-    y = cash_flow["net_margin_percentage"],
-    name = "Margem Líquida",
-    line = dict(color = "darkgray", width = 3, dash = "dot"),
-    yaxis = "y2"
-))
-
-for index, row in cash_flow.iterrows():
-    figure12.add_annotation(
-        x = row["date"], y = row["monthly_revenue"],
-        text = f"<b>{row['monthly_revenue']:,.2f}</b>".replace(".", ","),
-        showarrow = False, font = dict(color = "white", size = 12),
-        align = "center", bordercolor = "black",
-        borderwidth = 1, bgcolor = "black", opacity = 0.8
+    figure13.update_layout(
+        title = "Fluxo de Caixa e Estoque — Indicadores de Liquidez",
+        title_font_size = 18,
+        font = dict(size = 14, family = "Arial", color = "black"),
+        plot_bgcolor = "white",
+        paper_bgcolor = "white",
+        legend = dict(title = "", font_size = 12, bgcolor = "rgba(0,0,0,0)"),
+        xaxis = dict(
+            title = "Período",
+            showgrid = True,
+            gridcolor = "lightgrey",
+            zeroline = False,
+            title_font_size = 14
+        ),
+        yaxis = dict(
+            title = "Índice de Liquidez",
+            showgrid = True,
+            gridcolor = "lightgrey",
+            zeroline = False,
+            title_font_size = 14
+        ),
+        width = 1000, height = 500,
+        margin = dict(t = 80, b = 120)
+    )
+
+    formulas_text = (
+        "Liquidez Corrente = Ativo Circulante ÷ Passivo Circulante<br>"
+        "Liquidez Seca = (Ativo Circulante − Estoque) ÷ Passivo Circulante<br>"
+        "Liquidez Imediata = Caixa e Equivalentes ÷ Passivo Circulante"
+    )
+
+    figure13.add_annotation(
+        text = formulas_text,
+        xref = "paper", yref = "paper",
+        x = 0, y = -0.35,
+        showarrow = False,
+        font = dict(size = 12, color = "gray", family = "Arial"),
+        align = "left"
+    )
+
+    return figure13
+
+# get_figure13().show()
+
+@artifact
+def get_complete_inventory_data():
+    if state_directory:
+        return load_state_aggregate("inventory")
+
+    daily_sales = get_daily_sales()
+
+    daily_sales_quantity = daily_sales[["date", "item", "quantity_sold"]]
+
+    daily_purchases = get_data_source().daily_purchases()
+
+    start_date = min(daily_sales_quantity["date"].min(), daily_purchases["date"].min())
+    end_date = max(daily_sales_quantity["date"].max(), daily_purchases["date"].max())
+    complete_date_range = pd.date_range(start = start_date, end = end_date, freq = "D")
+
+    sales_items = daily_sales_quantity["item"].unique()
+    purchase_materials = daily_purchases["material"].unique()
+    all_items = list(set(sales_items) | set(purchase_materials))
+
+    complete_panel = pd.MultiIndex.from_product(
+        [complete_date_range, all_items], 
+        names = ["date", "item"]
+    ).to_frame(index = False)
+
+    complete_inventory_data = pd.merge(
+        complete_panel, 
+        daily_sales_quantity, 
+        on = ["date", "item"], 
+        how = "left"
+    )
+
+    daily_purchases = daily_purchases.rename(columns = {"material": "item"})
+    complete_inventory_data = pd.merge(
+        complete_inventory_data, 
+        daily_purchases[["date", "item", "quantity_purchased"]], 
+        on = ["date", "item"], 
+        how = "left"
+    )
+
+    complete_inventory_data["quantity_sold"] = complete_inventory_data["quantity_sold"].fillna(0)
+    complete_inventory_data["quantity_purchased"] = complete_inventory_data["quantity_purchased"].fillna(0)
+
+    complete_inventory_data["daily_net_change"] = (
+        complete_inventory_data["quantity_purchased"] - complete_inventory_data["quantity_sold"]
     )
 
-for index, row in cash_flow.iterrows():
-    figure12.add_annotation(
-        x = row["date"], y = -row["monthly_expense"],
-        text = f"<b>{row['monthly_expense']:,.2f}</b>".replace(".", ","),
-        showarrow = False, font = dict(color = "white", size = 12),
-        align = "center", bordercolor = "black",
-        borderwidth = 1, bgcolor = "black", opacity = 0.8
+    complete_inventory_data = complete_inventory_data.sort_values(["item", "date"])
+    complete_inventory_data["cumulative_inventory_balance"] = (
+        complete_inventory_data.groupby("item")["daily_net_change"].cumsum()
     )
 
-figure12.update_layout(
-    title = "Fluxo de Caixa e Estoque — Movimentações Mensais",
-    xaxis_title = "Data",
-    yaxis_title = "Movimentação (R$ mil)",
-    yaxis2 = dict(
-        title = "Margem Líquida (%)",
-        overlaying = "y",
-        side = "right",
-        range = [cash_flow["net_margin_percentage"].min() - 10, cash_flow["net_margin_percentage"].max() + 10],
-        title_font_size = 14
-    ),
-    title_font_size = 18,
-    font = dict(size = 14, family = "Arial", color = "black"),
-    plot_bgcolor = "white",
-    paper_bgcolor = "white",
-    legend = dict(title = "", font_size = 12, bgcolor = "rgba(0,0,0,0)",
-                  x = 1.1, y = 1, xanchor = "left", yanchor = "top"),
-    xaxis = dict(
-        showgrid = True, 
-        gridcolor = "lightgrey", 
-        zeroline = False, 
-        title_font_size = 14,
-        tickformat = "%m/%Y",
-        dtick = "M1"
-    ),
-    yaxis = dict(
-        showgrid = True, 
-        gridcolor = "lightgrey", 
-        zeroline = False, 
-        title_font_size = 14
-    ),
-    barmode = "relative",
-    width = 1000, height = 500
-)
-
-# figure12.show()
-
-annual_cash_flow = cash_flow.copy()
-annual_cash_flow.set_index('date', inplace=True)
-annual_cash_flow['year'] = annual_cash_flow.index.year
-annual_cash_flow = annual_cash_flow.groupby('year').agg({
-    'monthly_expense': 'sum',
-    'monthly_revenue': 'sum'
-}).reset_index()
-annual_cash_flow.rename(columns={'monthly_expense': 'annual_expense', 'monthly_revenue': 'annual_revenue'}, inplace=True)
-
-last_year_cashflow = annual_cash_flow['year'].max()
-projection_range = range(last_year_cashflow + 1, last_year_cashflow + 6)
-
-last_revenue = annual_cash_flow[annual_cash_flow['year'] == last_year_cashflow]['annual_revenue'].values[0]
-revenue_projection = []
-
-# Revenue Projection
-actual_revenue = last_revenue
-for year in projection_range:
-    actual_revenue *= 1.10 # Adjustable
-    revenue_projection.append({
-        'year': year,
-        'Receitas': actual_revenue
-})
-    
-revenue_projection = pd.DataFrame(revenue_projection)
-
-projected_cash_flow_revenue = annual_cash_flow[['year', 'annual_revenue']].copy()
-projected_cash_flow_revenue.rename(columns={'annual_revenue': 'Receitas'}, inplace=True)
-projected_cash_flow_revenue = pd.concat([
-    projected_cash_flow_revenue,
-    revenue_projection
-], ignore_index=True)
-
-
-# Expense and Margin Projection
-last_expense = annual_cash_flow[annual_cash_flow['year'] == last_year_cashflow]['annual_expense'].values[0]
-
-expense_projection = []
-actual_expense = last_expense
-for year in projection_range:
-    actual_expense *= 1.10 # Adjustable
-    expense_projection.append({
-        'year': year,
-        'Despesas': actual_expense
-})
-
-expense_projection = pd.DataFrame(expense_projection)
-
-projected_cash_flow_expense = annual_cash_flow[['year', 'annual_expense']].copy()
-projected_cash_flow_expense.rename(columns={'annual_expense': 'Despesas'}, inplace=True)
-projected_cash_flow_expense = pd.concat([
-    projected_cash_flow_expense,
-    expense_projection
-], ignore_index=True)
-
-# Projected cash flow
-projected_cash_flow = pd.merge(projected_cash_flow_revenue, projected_cash_flow_expense, on='year', how='inner')
-
-# Projected Margin
-projected_cash_flow['Margem'] = projected_cash_flow['Receitas'] - projected_cash_flow['Despesas']
-
-projected_cash_flow.rename(columns={'year': 'Ano'}, inplace=True)
-projected_cash_flow = projected_cash_flow.set_index('Ano')
-projected_cash_flow = projected_cash_flow.T
-projected_cash_flow.index.name = None
-
-#print(projected_cash_flow)
-
-database_balance_accounts.set_index("heading", inplace = True)
-database_balance_accounts = database_balance_accounts.apply(pd.to_numeric, errors = "coerce")
-
-quarters = database_balance_accounts.columns.tolist()
-
-current_liquidity = []
-quick_liquidity = []
-immediate_liquidity = []
-
-for quarter in quarters:
-    current_assets = database_balance_accounts.loc["Ativo Circulante", quarter]
-    inventory = database_balance_accounts.loc["Estoque", quarter]
-    cash_equivalents = database_balance_accounts.loc["Caixa e Equivalentes de Caixa", quarter]
-    current_liabilities = database_balance_accounts.loc["Passivo Circulante", quarter]
-
-    liquidity_current = current_assets / current_liabilities
-    liquidity_quick = (current_assets - inventory) / current_liabilities
-    liquidity_immediate = cash_equivalents / current_liabilities
-
-    current_liquidity.append(liquidity_current)
-    quick_liquidity.append(liquidity_quick)
-    immediate_liquidity.append(liquidity_immediate)
-
-liquidity_ratios = pd.DataFrame({
-    "Trimestre": quarters,
-    "Liquidez Corrente": current_liquidity,
-    "Liquidez Seca": quick_liquidity,
-    "Liquidez Imediata": immediate_liquidity
-})
-
-figure13 = go.Figure()
-
-figure13.add_trace(go.Scatter(
-    x = liquidity_ratios["Trimestre"], y = liquidity_ratios["Liquidez Corrente"],
-    mode = "lines+markers", name = "Liquidez Corrente",
-    line = dict(width = 2, color = "#636efa"), marker = dict(size = 8)
-))
-
-figure13.add_trace(go.Scatter(
-    x = liquidity_ratios["Trimestre"], y = liquidity_ratios["Liquidez Seca"],
-    mode = "lines+markers", name = "Liquidez Seca",
-    line = dict(width = 2, color = "#ef553b"), marker = dict(size = 8)
-))
-
-figure13.add_trace(go.Scatter(
-    x = liquidity_ratios["Trimestre"], y = liquidity_ratios["Liquidez Imediata"],
-    mode = "lines+markers", name = "Liquidez Imediata",
-    line = dict(width = 2, color = "#00cc96"), marker = dict(size = 8)
-))
-
-figure13.update_layout(
-    title = "Fluxo de Caixa e Estoque — Indicadores de Liquidez",
-    title_font_size = 18,
-    font = dict(size = 14, family = "Arial", color = "black"),
-    plot_bgcolor = "white",
-    paper_bgcolor = "white",
-    legend = dict(title = "", font_size = 12, bgcolor = "rgba(0,0,0,0)"),
-    xaxis = dict(
-        title = "Período",
-        showgrid = True,
-        gridcolor = "lightgrey",
-        zeroline = False,
-        title_font_size = 14
-    ),
-    yaxis = dict(
-        title = "Índice de Liquidez",
-        showgrid = True,
-        gridcolor = "lightgrey",
-        zeroline = False,
-        title_font_size = 14
-    ),
-    width = 1000, height = 500,
-    margin = dict(t = 80, b = 120)
-)
-
-formulas_text = (
-    "Liquidez Corrente = Ativo Circulante ÷ Passivo Circulante<br>"
-    "Liquidez Seca = (Ativo Circulante − Estoque) ÷ Passivo Circulante<br>"
-    "Liquidez Imediata = Caixa e Equivalentes ÷ Passivo Circulante"
-)
-
-figure13.add_annotation(
-    text = formulas_text,
-    xref = "paper", yref = "paper",
-    x = 0, y = -0.35,
-    showarrow = False,
-    font = dict(size = 12, color = "gray", family = "Arial"),
-    align = "left"
-)
-
-# figure13.show()
-
-daily_sales_quantity = database_revenue.groupby(["date", "item"]).size().reset_index(name = "quantity_sold")
-daily_sales_quantity["date"] = pd.to_datetime(daily_sales_quantity["date"])
-
-database_expense["date"] = pd.to_datetime(database_expense["date"])
-daily_purchases = database_expense.groupby(["date", "material"]).agg({
-    "quantity_purchased": "sum",
-    "subtotal": "sum"
-}).reset_index()
-
-start_date = min(daily_sales_quantity["date"].min(), daily_purchases["date"].min())
-end_date = max(daily_sales_quantity["date"].max(), daily_purchases["date"].max())
-complete_date_range = pd.date_range(start = start_date, end = end_date, freq = "D")
-
-sales_items = daily_sales_quantity["item"].unique()
-purchase_materials = daily_purchases["material"].unique()
-all_items = list(set(sales_items) | set(purchase_materials))
-
-complete_panel = pd.MultiIndex.from_product(
-    [complete_date_range, all_items], 
-    names = ["date", "item"]
-).to_frame(index = False)
-
-complete_inventory_data = pd.merge(
-    complete_panel, 
-    daily_sales_quantity, 
-    on = ["date", "item"], 
-    how = "left"
-)
-
-daily_purchases = daily_purchases.rename(columns = {"material": "item"})
-complete_inventory_data = pd.merge(
-    complete_inventory_data, 
-    daily_purchases[["date", "item", "quantity_purchased"]], 
-    on = ["date", "item"], 
-    how = "left"
-)
-
-complete_inventory_data["quantity_sold"] = complete_inventory_data["quantity_sold"].fillna(0)
-complete_inventory_data["quantity_purchased"] = complete_inventory_data["quantity_purchased"].fillna(0)
-
-complete_inventory_data["daily_net_change"] = (
-    complete_inventory_data["quantity_purchased"] - complete_inventory_data["quantity_sold"]
-)
-
-complete_inventory_data = complete_inventory_data.sort_values(["item", "date"])
-complete_inventory_data["cumulative_inventory_balance"] = (
-    complete_inventory_data.groupby("item")["daily_net_change"].cumsum()
-)
-
-inventory_activity_summary = complete_inventory_data.groupby("item").agg({
-    "quantity_sold": "sum",
-    "quantity_purchased": "sum"
-}).reset_index()
-
-active_items = inventory_activity_summary[
-    (inventory_activity_summary["quantity_sold"] > 0) | 
-    (inventory_activity_summary["quantity_purchased"] > 0)
-]["item"].unique()
-
-filtered_inventory_data = complete_inventory_data[
-    complete_inventory_data["item"].isin(active_items)
-]
-
-figure14 = px.line(
-    filtered_inventory_data, 
-    x = "date", 
-    y = "cumulative_inventory_balance", 
-    color = "item",
-    labels = {
-        "date": "Data", 
-        "cumulative_inventory_balance": "Saldo Acumulado (Unidades)", 
-        "item": "Item"
-    },
-    title = "Fluxo de Caixa e Estoque — Evolução Diária do Estoque por Item", 
-    width = 1000, 
-    height = 500
-)
-
-figure14.update_layout(
-    title_font_size = 18, 
-    font = dict(size = 14, family = "Arial", color = "black"),
-    plot_bgcolor = "white", 
-    paper_bgcolor = "white",
-    legend = dict(
-        title = "", 
-        font_size = 12, 
-        bgcolor = "rgba(0,0,0,0)"
-    ),
-    xaxis = dict(
-        showgrid = True, 
-        gridcolor = "lightgrey", 
-        zeroline = False, 
-        title_font_size = 14, 
-        tickformat = "%d/%m/%Y"
-    ),
-    yaxis = dict(
-        showgrid = True, 
-        gridcolor = "lightgrey", 
-        zeroline = False, 
-        title_font_size = 14
+    return complete_inventory_data
+
+@artifact
+def get_filtered_inventory_data():
+    complete_inventory_data = get_complete_inventory_data()
+
+    inventory_activity_summary = complete_inventory_data.groupby("item").agg({
+        "quantity_sold": "sum",
+        "quantity_purchased": "sum"
+    }).reset_index()
+
+    active_items = inventory_activity_summary[
+        (inventory_activity_summary["quantity_sold"] > 0) | 
+        (inventory_activity_summary["quantity_purchased"] > 0)
+    ]["item"].unique()
+
+    filtered_inventory_data = complete_inventory_data[
+        complete_inventory_data["item"].isin(active_items)
+    ]
+
+    return filtered_inventory_data
+
+@artifact
+def get_figure14():
+    filtered_inventory_data = get_filtered_inventory_data()
+
+    figure14 = px.line(
+        filtered_inventory_data, 
+        x = "date", 
+        y = "cumulative_inventory_balance", 
+        color = "item",
+        labels = {
+            "date": "Data", 
+            "cumulative_inventory_balance": "Saldo Acumulado (Unidades)", 
+            "item": "Item"
+        },
+        title = "Fluxo de Caixa e Estoque — Evolução Diária do Estoque por Item", 
+        width = 1000, 
+        height = 500
+    )
+
+    figure14.update_layout(
+        title_font_size = 18, 
+        font = dict(size = 14, family = "Arial", color = "black"),
+        plot_bgcolor = "white", 
+        paper_bgcolor = "white",
+        legend = dict(
+            title = "", 
+            font_size = 12, 
+            bgcolor = "rgba(0,0,0,0)"
+        ),
+        xaxis = dict(
+            showgrid = True, 
+            gridcolor = "lightgrey", 
+            zeroline = False, 
+            title_font_size = 14, 
+            tickformat = "%d/%m/%Y"
+        ),
+        yaxis = dict(
+            showgrid = True, 
+            gridcolor = "lightgrey", 
+            zeroline = False, 
+            title_font_size = 14
+        )
     )
-)
 
-# figure14.show()
+    return figure14
+
+# get_figure14().show()
+
+def is_single_cash_flow(cash_flow):
+    return not isinstance(cash_flow, pd.DataFrame) and np.ndim(cash_flow[0]) == 0
 
 def obtain_npv(attractive_rate, cash_flow):
-    return sum(dough / (1 + attractive_rate) ** time for time, dough in enumerate(cash_flow))
+    # Arrays of rates and portfolios of cash flows (one per row, ragged or not) are priced in one pass
+    if is_single_cash_flow(cash_flow):
+        return md.batch_npv(np.asarray(attractive_rate)[..., None], cash_flow)[..., 0][()]
 
-def measure_irr(cash_flow, guess = 0.1, tolerance = 1e-5):
-    adjustment_rate, step = guess, 0.01
+    return md.batch_npv(attractive_rate, cash_flow)
 
-    for _ in range(1000):
-        temporary_npv = obtain_npv(adjustment_rate, cash_flow)
-        if abs(temporary_npv) < tolerance:
-            return adjustment_rate
-        adjustment_rate += step if temporary_npv > 0 else - step
-        step *= 0.9
+def measure_irr(cash_flow, guess = 0.1, tolerance = 1e-10):
+    irr = md.batch_irr(cash_flow, guess, tolerance = tolerance)
 
-    raise ValueError("Mude o palpite!")
+    if not is_single_cash_flow(cash_flow):
+        return irr
+    if np.isnan(irr[0]):
+        raise ValueError("O fluxo de caixa não tem TIR entre -99% e 1000%!")
+
+    return irr[0]
 
 def discover_mirr(cash_flow, financing_rate, reinvestment_rate):
-    present_value = sum(dough / (1 + financing_rate) ** time for time, dough in enumerate(cash_flow) if dough < 0)
-    future_value = sum(dough * (1 + reinvestment_rate) ** (len(cash_flow) - time - 1) for time, dough in enumerate(cash_flow) if dough > 0)
-    
-    return (abs(future_value / present_value)) ** (1 / (len(cash_flow) - 1)) - 1
+    if is_single_cash_flow(cash_flow):
+        return md.batch_mirr(cash_flow, np.asarray(financing_rate)[..., None], np.asarray(reinvestment_rate)[..., None])[..., 0][()]
+
+    return md.batch_mirr(cash_flow, financing_rate, reinvestment_rate)
+
+def appraise_projects(cash_flows, attractive_rate, financing_rate, reinvestment_rate):
+    # cash_flows maps each project to its cash flow, or is a DataFrame with one project per row
+    names = list(cash_flows.index if isinstance(cash_flows, pd.DataFrame) else cash_flows.keys())
+    flows = cash_flows if isinstance(cash_flows, pd.DataFrame) else list(cash_flows.values())
+
+    return pd.DataFrame({
+        "project": names,
+        "npv": md.batch_npv(attractive_rate, flows),
+        "irr": md.batch_irr(flows),
+        "mirr": md.batch_mirr(flows, financing_rate, reinvestment_rate)
+    })
+
+# Shared by every appraisal: pooled session, retries and the local cache in data/.rates (CONECTOR_BCB_*)
+rate_client = rt.RateClient()
 
 def get_selic_rate():
-    url = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.432/dados/ultimos/1?formato=json"
-    response = requests.get(url)
-    
-    if response.status_code == 200:
-        data = response.json()
-        data = float(data[0]["valor"]) / 100
-        return data
-    else:
-        raise Exception("Falha ao acessar a taxa Selic!")
+    return rate_client.selic_rate()
 
 def get_ipca_12_months():
-    url = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.433/dados/ultimos/12?formato=json"
-    response = requests.get(url)
-
-    if response.status_code == 200:
-        data = response.json()
-        monthly = [float(nibble["valor"]) / 100 for nibble in data]
-        compound = 1
-        for bump in monthly:
-            compound *= (1 + bump)
-        return compound - 1
-    else:
-        raise Exception("Falha ao acessar o Índice Nacional de Preços ao Consumidor Amplo (IPCA)!")
+    return rate_client.ipca_12_months()
+
+# Local history of both series in data/.rates/history, for back-dated appraisals without network access
+rate_store = rt.RateStore(rate_client)
+
+def sync_rate_history():
+    return rate_store.sync()
+
+def get_rates(as_of = None):
+    # With as_of (one date or an array of them) the rates in force on those dates come from the local history
+    if as_of is None:
+        return rate_client.rates()
+
+    return rate_store.rates_as_of(as_of)
 
 # cash_flow = [-1250, 425, 425, 425, 425, -2500, 850, 850, 850, 850]
-# attractive_rate = get_selic_rate()
-# financing_rate = get_selic_rate() * 1.75
-# reinvestment_rate = get_ipca_12_months() + 0.05
+# rates = get_rates()  # ou, com o histórico sincronizado por sync_rate_history(): get_rates(as_of = "2024-06-30")
+# attractive_rate = rates["selic"]
+# financing_rate = rates["selic"] * 1.75
+# reinvestment_rate = rates["ipca_12_months"] + 0.05
 
 # print(f"Valor Presente Líquido (VPL): R$ {round(obtain_npv(attractive_rate, cash_flow), 2)}")
 # print(f"Taxa Interna de Retorno (TIR): {round(measure_irr(cash_flow) * 100, 2)}%")
 # print(f"Taxa Interna de Retorno Modificada (TIRM): {round(discover_mirr(cash_flow, financing_rate, reinvestment_rate) * 100, 2)}%")
+# print(appraise_projects({"Loja Centro": cash_flow, "Loja Norte": [-3000, 900, 1100, 1300, 1500]}, attractive_rate, financing_rate, reinvestment_rate))
 
 def buffer_csv(df):
 	csv_buffer = io.StringIO()
@@ -1142,14 +1560,3 @@ def buffer_excel_formatted(df: pd.DataFrame) -> bytes:
 
 	return excel_buffer.getvalue()
 
-with open("Script.ipynb", "r", encoding = "utf-8") as f:
-    nb = nbformat.read(f, as_version = 4)
-
-code = ""
-for cell in nb.cells:
-    if cell.cell_type == "code":
-        code += cell.source + "\n\n"
-
-with open("Conector.py", "w", encoding = "utf-8") as f:
-    f.write(code)
-
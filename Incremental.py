@@ -0,0 +1,384 @@
+import argparse
+import json
+import os
+import tempfile
+import pandas as pd
+
+# ======================== 1. PERSISTED STATE ========================
+
+STATE_DIRECTORY = os.path.join("data", ".state")
+
+COLUMNS = {
+    "sales_summary": ["item", "price", "quantity_sold"],
+    "daily_revenue": ["date", "item", "daily_revenue", "quantity_sold"],
+    "accumulated_revenue": ["date", "item", "accumulated_revenue"],
+    "weekly_revenue": ["item", "date", "daily_revenue"],
+    "monthly_totals": ["date", "monthly_revenue", "monthly_expense"],
+    "inventory": ["date", "item", "quantity_sold", "quantity_purchased", "daily_net_change", "cumulative_inventory_balance"]
+}
+
+# The daily aggregates are kept one parquet file per month, sorted by these keys; a refresh reads and rewrites
+# only the months from the first new date onwards, which for a daily export is just the open one
+PARTITIONED = {
+    "daily_revenue": ["date", "item"],
+    "accumulated_revenue": ["date", "item"],
+    "weekly_revenue": ["item", "date"],
+    "inventory": ["item", "date"]
+}
+
+# Running totals whose value at the end of every month is kept in the manifest, so a refresh restarts them
+# without reading the months before the one it touches
+CLOSING = {
+    "accumulated_revenue": "accumulated_revenue",
+    "inventory": "cumulative_inventory_balance"
+}
+
+def _replace(path, write):
+    # Written under a unique temporary name and swapped in, so a reader never finds half a file
+    descriptor, temporary_path = tempfile.mkstemp(dir = os.path.dirname(path), suffix = ".tmp")
+    os.close(descriptor)
+
+    try:
+        write(temporary_path)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+def _write_frame(frame, path):
+    _replace(path, lambda temporary_path: frame.to_parquet(temporary_path, index = False))
+
+def _empty(name):
+    return pd.DataFrame({column: pd.Series(dtype = "datetime64[ns]" if column == "date" else object if column == "item" else float)
+                         for column in COLUMNS[name]})
+
+def _concat(frames, name):
+    frames = [frame for frame in frames if not frame.empty]
+    return pd.concat(frames, ignore_index = True) if frames else _empty(name)
+
+def _month(date):
+    return date.strftime("%Y-%m")
+
+def _partition_path(directory, name, month):
+    return os.path.join(directory, name, f"{month}.parquet")
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, "manifest.json"), encoding = "utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    # A state saved before the row offsets and the monthly closings is rebuilt from the full history
+    return manifest if "marks" in manifest else None
+
+def _new_manifest():
+    return {
+        "marks": {"revenue": None, "expense": None},
+        "months": {name: [] for name in PARTITIONED},
+        "closing": {name: {} for name in CLOSING},
+        "items": [],
+        "first_date": None,
+        "last_date": None
+    }
+
+def _read_partitions(directory, name, months):
+    return _concat([pd.read_parquet(_partition_path(directory, name, month)) for month in months], name)
+
+def _read_small(directory, name):
+    path = os.path.join(directory, f"{name}.parquet")
+    return pd.read_parquet(path) if os.path.exists(path) else _empty(name)
+
+def _write_partitions(directory, name, frame, first_month, manifest):
+    os.makedirs(os.path.join(directory, name), exist_ok = True)
+
+    months = frame["date"].dt.strftime("%Y-%m")
+    frame, months = frame[months >= first_month], months[months >= first_month]
+    written = []
+
+    for month, partition in frame.groupby(months):
+        _write_frame(partition.sort_values(PARTITIONED[name], ignore_index = True), _partition_path(directory, name, month))
+        written.append(month)
+
+    stored = manifest["months"][name]
+    for month in stored:
+        if month >= first_month and month not in written and os.path.exists(_partition_path(directory, name, month)):
+            os.remove(_partition_path(directory, name, month))
+
+    manifest["months"][name] = sorted([month for month in stored if month < first_month] + written)
+
+def _write_manifest(directory, manifest):
+    # The manifest is written last, so an interrupted refresh leaves the previous marks in place
+    def write(path):
+        with open(path, "w", encoding = "utf-8") as f:
+            json.dump(manifest, f, indent = 1)
+
+    _replace(os.path.join(directory, "manifest.json"), write)
+
+def ingested_rows(directory = STATE_DIRECTORY):
+    # How many rows of each source table are already in the state, i.e. the offset to read the source from
+    manifest = _read_manifest(directory) or _new_manifest()
+    return {table: 0 if mark is None else mark["rows"] for table, mark in manifest["marks"].items()}
+
+def load_aggregate(name, directory = STATE_DIRECTORY):
+    manifest = _read_manifest(directory) or _new_manifest()
+
+    if name not in PARTITIONED:
+        return _read_small(directory, name)
+
+    frame = _read_partitions(directory, name, manifest["months"][name])
+
+    # Only the weeks with sales are stored; the gaps and the shares of each week are laid out when read,
+    # because a new item changes every share of the weeks it sells in
+    if name == "weekly_revenue":
+        frame = (frame.set_index("date").groupby("item")["daily_revenue"]
+                 .resample("W").asfreq().reset_index())
+
+        frame["total_week"] = frame.groupby("date")["daily_revenue"].transform("sum")
+        frame["percentage_revenue"] = frame["daily_revenue"] / frame["total_week"] * 100
+
+    return frame.sort_values(PARTITIONED[name], ignore_index = True)
+
+def load_aggregates(directory = STATE_DIRECTORY):
+    aggregates = {name: load_aggregate(name, directory) for name in COLUMNS}
+    aggregates["manifest"] = _read_manifest(directory) or _new_manifest()
+
+    return aggregates
+
+# ======================== 2. ROW OFFSETS ========================
+
+def _new_rows(rows, mark, first_row, column):
+    # The mark counts the source rows already ingested; the source only grows by appending, so the rows past
+    # that offset are exactly the new ones, however a day was split between exports
+    ingested = 0 if mark is None else mark["rows"]
+
+    if first_row > ingested:
+        raise ValueError(f"As linhas {ingested} a {first_row - 1} da fonte ainda não foram incorporadas!")
+    if first_row + len(rows) < ingested:
+        raise ValueError(f"A fonte tem {first_row + len(rows)} linhas, menos que as {ingested} já incorporadas!")
+
+    rows = rows.iloc[ingested - first_row:].copy()
+    rows["date"] = pd.to_datetime(rows["date"])
+    rows[column] = rows[column].astype(str)
+
+    return rows.reset_index(drop = True)
+
+def _advance_mark(mark, rows):
+    if rows.empty:
+        return mark
+
+    ingested = 0 if mark is None else mark["rows"]
+    last_date = rows["date"].max() if mark is None else max(rows["date"].max(), pd.Timestamp(mark["date"]))
+
+    return {"rows": ingested + len(rows), "date": last_date.isoformat()}
+
+# ======================== 3. AGGREGATE MERGES ========================
+
+def _opening(closing, month):
+    # Each item's running total at the end of the last month before the given one
+    months = [stored_month for stored_month in closing if stored_month < month]
+    return closing[max(months)] if months else {}
+
+def _closing(frame, column, opening, first_month):
+    # Items without rows in a month carry their previous value, so any month can be restarted from here
+    frame = frame[frame["date"].dt.strftime("%Y-%m") >= first_month].sort_values("date", kind = "stable")
+    last_values = frame.groupby([frame["date"].dt.strftime("%Y-%m"), "item"])[column].last()
+
+    current = dict(opening)
+    closing = {}
+
+    for month in sorted(last_values.index.get_level_values(0).unique()):
+        current.update({item: float(value) for item, value in last_values.loc[month].items()})
+        closing[month] = dict(current)
+
+    return closing
+
+def _merge_sales_summary(stored, revenue):
+    counts = revenue.groupby(["item", "price"]).size()
+
+    if not stored.empty:
+        counts = stored.set_index(["item", "price"])["quantity_sold"].add(counts, fill_value = 0)
+
+    return counts.astype("int64").sort_index().reset_index(name = "quantity_sold")
+
+def _merge_daily_revenue(window, revenue):
+    daily = revenue.assign(price = revenue["price"].astype(float)).groupby(["date", "item"])["price"]
+    daily = pd.DataFrame({"daily_revenue": daily.sum(), "quantity_sold": daily.size()})
+
+    if not window.empty:
+        daily = window.set_index(["date", "item"])[["daily_revenue", "quantity_sold"]].add(daily, fill_value = 0)
+
+    return daily.astype({"daily_revenue": float, "quantity_sold": "int64"}).sort_index().reset_index()
+
+def _merge_accumulated_revenue(window, opening, daily_revenue, start):
+    # Running sums restart from each item's value just before the first new date: the earlier days of the
+    # window, or else the closing of the month before it
+    head = window[window["date"] < start]
+    carry = {**opening, **head.sort_values("date", kind = "stable").groupby("item")["accumulated_revenue"].last().to_dict()}
+
+    tail = daily_revenue[daily_revenue["date"] >= start].sort_values(["date", "item"]).copy()
+    tail["accumulated_revenue"] = (tail.groupby("item")["daily_revenue"].cumsum() / 1000
+                                   + tail["item"].map(carry).astype(float).fillna(0.0))
+
+    accumulated = _concat([head, tail[COLUMNS["accumulated_revenue"]]], "accumulated_revenue")
+    return accumulated.sort_values(["date", "item"], ignore_index = True)
+
+def _merge_weekly_revenue(window, daily_revenue, start):
+    # Only the weeks from the one containing the first new date onwards are averaged again
+    week_start = start - pd.Timedelta(days = start.dayofweek)
+    recent = daily_revenue[daily_revenue["date"] >= week_start].set_index("date")
+
+    weekly = window[window["date"] < week_start]
+    if not recent.empty:
+        means = recent.groupby("item")["daily_revenue"].resample("W").mean().dropna().reset_index()
+        weekly = _concat([weekly, means[COLUMNS["weekly_revenue"]]], "weekly_revenue")
+
+    return weekly.sort_values(["item", "date"], ignore_index = True)
+
+def _merge_monthly_totals(stored, revenue, expense):
+    monthly_revenue = revenue.groupby(revenue["date"] + pd.offsets.MonthEnd(0))["price"].sum()
+    monthly_expense = expense.groupby(expense["date"] + pd.offsets.MonthEnd(0))["subtotal"].sum()
+
+    totals = pd.DataFrame({"monthly_revenue": monthly_revenue, "monthly_expense": monthly_expense}).astype(float).fillna(0.0)
+    totals.index.name = "date"
+
+    if not stored.empty:
+        totals = stored.set_index("date").add(totals, fill_value = 0)
+
+    return totals.sort_index().reset_index()
+
+def _merge_inventory(window, opening, revenue, expense, start, end, items):
+    daily_sales_quantity = revenue.groupby(["date", "item"]).size().rename("quantity_sold")
+    daily_purchases = expense.groupby(["date", "material"])["quantity_purchased"].sum()
+    daily_purchases.index.names = ["date", "item"]
+
+    head = window[window["date"] < start]
+    current = window[window["date"] >= start].set_index(["date", "item"])
+
+    panel = pd.MultiIndex.from_product([pd.date_range(start = start, end = end, freq = "D"), items], names = ["date", "item"])
+
+    tail = pd.DataFrame({
+        "quantity_sold": current["quantity_sold"].add(daily_sales_quantity, fill_value = 0).reindex(panel).fillna(0).astype(float),
+        "quantity_purchased": current["quantity_purchased"].add(daily_purchases, fill_value = 0).reindex(panel).fillna(0).astype(float)
+    }).reset_index()
+
+    tail["daily_net_change"] = tail["quantity_purchased"] - tail["quantity_sold"]
+    tail = tail.sort_values(["item", "date"])
+
+    carry = {**opening, **head.sort_values("date", kind = "stable").groupby("item")["cumulative_inventory_balance"].last().to_dict()}
+    tail["cumulative_inventory_balance"] = (tail.groupby("item")["daily_net_change"].cumsum()
+                                            + tail["item"].map(carry).astype(float).fillna(0.0))
+
+    inventory = _concat([head, tail[COLUMNS["inventory"]]], "inventory")
+    return inventory.sort_values(["item", "date"], ignore_index = True)
+
+# ======================== 4. INCREMENTAL REFRESH ========================
+
+def update_aggregates(revenue_rows, expense_rows, directory = STATE_DIRECTORY, revenue_offset = 0, expense_offset = 0):
+    # The rows are the source tables from the given offsets onwards: the whole history, or just what was
+    # appended since the offsets returned by ingested_rows; rows already ingested are skipped
+    manifest = _read_manifest(directory) or _new_manifest()
+    marks = manifest["marks"]
+
+    revenue = _new_rows(revenue_rows, marks["revenue"], revenue_offset, "item")
+    expense = _new_rows(expense_rows, marks["expense"], expense_offset, "material")
+
+    if revenue.empty and expense.empty:
+        return manifest
+
+    os.makedirs(directory, exist_ok = True)
+    dates = pd.concat([revenue["date"], expense["date"]])
+    start, end = dates.min(), dates.max()
+    week_start = start - pd.Timedelta(days = start.dayofweek)
+    stored_months = manifest["months"]
+
+    # Revenue: the days from the start of the first new week, for the weekly means, and the running sums from
+    # the first new month
+    daily_window = _read_partitions(directory, "daily_revenue", [month for month in stored_months["daily_revenue"] if month >= _month(week_start)])
+    daily_revenue = _merge_daily_revenue(daily_window, revenue)
+
+    accumulated_window = _read_partitions(directory, "accumulated_revenue", [month for month in stored_months["accumulated_revenue"] if month >= _month(start)])
+    accumulated_revenue = _merge_accumulated_revenue(accumulated_window, _opening(manifest["closing"]["accumulated_revenue"], _month(start)), daily_revenue, start)
+
+    weekly_window = _read_partitions(directory, "weekly_revenue", [month for month in stored_months["weekly_revenue"] if month >= _month(start)])
+    weekly_revenue = _merge_weekly_revenue(weekly_window, daily_revenue, start)
+
+    # Inventory: a daily panel of every item, so the days between the stored end and the new rows are filled too,
+    # and an item seen for the first time gets a zero history back to the first date
+    items = sorted(set(manifest["items"]) | set(revenue["item"]) | set(expense["material"]))
+    inventory_start = start
+
+    if manifest["last_date"] is not None:
+        first_date, last_date = pd.Timestamp(manifest["first_date"]), pd.Timestamp(manifest["last_date"])
+        inventory_start = min(start, last_date + pd.Timedelta(days = 1))
+        end = max(end, last_date)
+
+        if len(items) > len(manifest["items"]):
+            inventory_start = min(inventory_start, first_date)
+
+    inventory_window = _read_partitions(directory, "inventory", [month for month in stored_months["inventory"] if month >= _month(inventory_start)])
+    inventory = _merge_inventory(inventory_window, _opening(manifest["closing"]["inventory"], _month(inventory_start)),
+                                 revenue, expense, inventory_start, end, items)
+
+    _write_frame(_merge_sales_summary(_read_small(directory, "sales_summary"), revenue), os.path.join(directory, "sales_summary.parquet"))
+    _write_frame(_merge_monthly_totals(_read_small(directory, "monthly_totals"), revenue, expense), os.path.join(directory, "monthly_totals.parquet"))
+
+    touched = {"daily_revenue": (daily_revenue, _month(start)), "accumulated_revenue": (accumulated_revenue, _month(start)),
+               "weekly_revenue": (weekly_revenue, _month(start)), "inventory": (inventory, _month(inventory_start))}
+
+    for name, (frame, first_month) in touched.items():
+        _write_partitions(directory, name, frame, first_month, manifest)
+
+        if name in CLOSING:
+            closing = manifest["closing"][name]
+            opening = _opening(closing, first_month)
+            manifest["closing"][name] = dict({month: values for month, values in closing.items() if month < first_month},
+                                             **_closing(frame, CLOSING[name], opening, first_month))
+
+    manifest["marks"] = {"revenue": _advance_mark(marks["revenue"], revenue), "expense": _advance_mark(marks["expense"], expense)}
+    manifest["items"] = items
+    manifest["first_date"] = (start if manifest["first_date"] is None else min(start, pd.Timestamp(manifest["first_date"]))).isoformat()
+    manifest["last_date"] = end.isoformat()
+
+    _write_manifest(directory, manifest)
+    return manifest
+
+def build_cash_flow(monthly_totals):
+    revenue_months = monthly_totals[monthly_totals["monthly_revenue"] != 0]["date"]
+    calendar = pd.DataFrame({"date": pd.date_range(start = revenue_months.min(), end = revenue_months.max(), freq = "M")})
+
+    cash_flow = calendar.merge(monthly_totals, on = "date", how = "left").fillna(0)
+
+    cash_flow["net_income"] = cash_flow["monthly_revenue"] - cash_flow["monthly_expense"]
+    cash_flow["net_margin_percentage"] = (cash_flow["net_income"] / cash_flow["monthly_revenue"]) * 100
+    cash_flow["net_margin_percentage"] = cash_flow["net_margin_percentage"].replace([float("inf"), float("-inf")], 0)
+
+    cash_flow["monthly_revenue"] = cash_flow["monthly_revenue"] / 1000
+    cash_flow["monthly_expense"] = cash_flow["monthly_expense"] / 1000
+
+    return cash_flow
+
+# ======================== 5. COMMAND LINE ========================
+
+# python Incremental.py <receitas.csv|parquet> <despesas.csv|parquet> [--revenue-offset N] [--expense-offset N]
+# The offsets are the source rows each file starts at: 0 for a full export, or the "rows" of the marks printed
+# by the previous run for an export of only the rows appended since
+if __name__ == "__main__":
+    import Ingestion as ing
+
+    parser = argparse.ArgumentParser(description = "Atualiza os agregados diários com as linhas novas das exportações")
+    parser.add_argument("revenue")
+    parser.add_argument("expense")
+    parser.add_argument("--revenue-offset", type = int, default = 0)
+    parser.add_argument("--expense-offset", type = int, default = 0)
+    parser.add_argument("--directory", default = STATE_DIRECTORY)
+    arguments = parser.parse_args()
+
+    revenue_map = {"Data": "date", "Preço": "price", "Nome do Café": "item"}
+    expense_map = {"Data": "date", "Insumo": "material", "Quantidade Adquirida": "quantity_purchased", "Subtotal": "subtotal"}
+
+    revenue_rows = pd.concat(ing.iterate_chunks(arguments.revenue, revenue_map), ignore_index = True)
+    expense_rows = pd.concat(ing.iterate_chunks(arguments.expense, expense_map), ignore_index = True)
+
+    manifest = update_aggregates(revenue_rows, expense_rows, arguments.directory, arguments.revenue_offset, arguments.expense_offset)
+    print(json.dumps(manifest["marks"], indent = 1))
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import pandas as pd
+from openpyxl import load_workbook
+
+# ======================== 1. WORKBOOK FINGERPRINT ========================
+
+CACHE_DIRECTORY = os.path.join("data", ".cache")
+
+# Cache entries of other workbooks are only dropped once they have gone this long without being written
+CACHE_MAX_AGE_DAYS = float(os.environ.get("CONECTOR_CACHE_MAX_AGE_DAYS", 30))
+
+_fingerprints = {}
+
+def fingerprint_file(path, block_size = 1 << 20):
+    # Hashing is memoized on (size, mtime) so the four sheets share a single read of the file
+    status = os.stat(path)
+    signature = (os.path.abspath(path), status.st_size, status.st_mtime_ns)
+
+    if signature not in _fingerprints:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        _fingerprints[signature] = digest.hexdigest()
+
+    return _fingerprints[signature]
+
+# ======================== 2. COLUMNAR CACHE ========================
+
+def _cache_path(path, sheet_name, column_map, cache_directory):
+    mapping = json.dumps(column_map, sort_keys = True, ensure_ascii = False)
+    mapping_hash = hashlib.sha256(f"{sheet_name}\n{mapping}".encode("utf-8")).hexdigest()[:16]
+    workbook_hash = fingerprint_file(path)[:32]
+
+    return os.path.join(cache_directory, workbook_hash, f"{mapping_hash}.parquet")
+
+def _entry_source(entry_directory):
+    try:
+        with open(os.path.join(entry_directory, "source.txt"), encoding = "utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _prune_stale(cache_directory, current):
+    # Entries written for previous versions of the same workbook are never read again; those of other workbooks
+    # sharing the directory are kept until they age out, so two workbooks do not evict each other on every load
+    source = _entry_source(os.path.join(cache_directory, current))
+    oldest = time.time() - CACHE_MAX_AGE_DAYS * 24 * 60 * 60
+
+    for entry in os.listdir(cache_directory):
+        entry_directory = os.path.join(cache_directory, entry)
+        if entry == current or not os.path.isdir(entry_directory):
+            continue
+
+        if _entry_source(entry_directory) == source or os.path.getmtime(entry_directory) < oldest:
+            shutil.rmtree(entry_directory, ignore_errors = True)
+
+def _store(frame, cache_path, source_path):
+    directory = os.path.dirname(cache_path)
+    os.makedirs(directory, exist_ok = True)
+
+    if _entry_source(directory) is None:
+        with open(os.path.join(directory, "source.txt"), "w", encoding = "utf-8") as f:
+            f.write(os.path.abspath(source_path))
+
+    # Written to a temporary file first so concurrent workers never read a partial parquet
+    descriptor, temporary_path = tempfile.mkstemp(dir = directory, suffix = ".tmp")
+    os.close(descriptor)
+
+    try:
+        frame.to_parquet(temporary_path, index = False)
+        os.replace(temporary_path, cache_path)
+    except (ImportError, ValueError, TypeError, OSError):
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        return
+
+    _prune_stale(os.path.dirname(directory), os.path.basename(directory))
+
+# A "*" entry keeps every other named column under its own header, for sheets that gain a column per period
+OTHER_COLUMNS = "*"
+
+def _mapped_name(column_name, column_map):
+    if column_name in column_map:
+        return column_map[column_name]
+    if OTHER_COLUMNS in column_map and column_name is not None and str(column_name).strip():
+        return str(column_name).strip()
+    return None
+
+def apply_column_map(frame, column_map):
+    valid_columns = [column_name for column_name in frame.columns if _mapped_name(column_name, column_map) is not None]
+    return frame[valid_columns].rename(columns = {column_name: _mapped_name(column_name, column_map) for column_name in valid_columns})
+
+def _stream_sheet(worksheet, column_map):
+    header = next(worksheet.iter_rows(max_row = 1, values_only = True), ())
+    positions = [index for index, column_name in enumerate(header) if _mapped_name(column_name, column_map) is not None]
+
+    if not positions:
+        return pd.DataFrame()
+
+    # Cells outside the span of mapped columns are never parsed
+    first, last = positions[0], positions[-1]
+    offsets = [index - first for index in positions]
+    columns = [[] for _ in positions]
+
+    for row in worksheet.iter_rows(min_row = 2, min_col = first + 1, max_col = last + 1, values_only = True):
+        values = [row[offset] if offset < len(row) else None for offset in offsets]
+        if all(value is None for value in values):
+            continue
+        for column, value in zip(columns, values):
+            column.append(value)
+
+    return pd.DataFrame({_mapped_name(header[index], column_map): column for index, column in zip(positions, columns)})
+
+def read_workbook(path, column_maps, cache_directory = CACHE_DIRECTORY):
+    frames = {}
+    missing = []
+
+    for sheet_name, column_map in column_maps.items():
+        cache_path = _cache_path(path, sheet_name, column_map, cache_directory)
+        if os.path.exists(cache_path):
+            try:
+                frames[sheet_name] = pd.read_parquet(cache_path)
+                continue
+            except (ImportError, ValueError, OSError):
+                pass
+        missing.append(sheet_name)
+
+    if missing:
+        # One streaming pass over the workbook serves every sheet that missed the cache
+        workbook = load_workbook(path, read_only = True, data_only = True)
+        try:
+            for sheet_name in missing:
+                frame = _stream_sheet(workbook[sheet_name], column_maps[sheet_name])
+                _store(frame, _cache_path(path, sheet_name, column_maps[sheet_name], cache_directory), path)
+                frames[sheet_name] = frame
+        finally:
+            workbook.close()
+
+    return {sheet_name: frames[sheet_name] for sheet_name in column_maps}
+
+def read_sheet(path, sheet_name, column_map, cache_directory = CACHE_DIRECTORY):
+    return read_workbook(path, {sheet_name: column_map}, cache_directory)[sheet_name]
+
+# ======================== 3. COMPACT TYPES ========================
+
+def compact_types(frame, categories = (), floats = (), dates = (), date_format = None):
+    compact = frame.copy()
+
+    for column in dates:
+        compact[column] = pd.to_datetime(compact[column], format = date_format)
+    for column in categories:
+        compact[column] = compact[column].astype("category")
+    for column in floats:
+        compact[column] = compact[column].astype("float32")
+
+    return compact
+
+def frame_bytes(frame):
+    return int(frame.memory_usage(deep = True).sum())
+
+def memory_report(before, after):
+    # Both sides are byte counts taken when the table was typed, so the raw frames need not be kept around
+    report = pd.DataFrame({
+        "table": list(after.keys()),
+        "before_bytes": [before[name] for name in after],
+        "after_bytes": [after[name] for name in after]
+    })
+
+    report["reduction_percentage"] = (1 - report["after_bytes"] / report["before_bytes"]) * 100
+
+    return report
+
+# ======================== 4. CHUNKED POS EXPORTS ========================
+
+def iterate_chunks(path, column_map, chunk_size = 500_000, **read_options):
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        columns = [column_name for column_name in parquet_file.schema_arrow.names if _mapped_name(column_name, column_map) is not None]
+
+        for batch in parquet_file.iter_batches(batch_size = chunk_size, columns = columns):
+            yield apply_column_map(batch.to_pandas(), column_map)
+
+    elif extension in (".csv", ".txt"):
+        reader = pd.read_csv(path, usecols = lambda column_name: _mapped_name(column_name, column_map) is not None, chunksize = chunk_size, **read_options)
+
+        for chunk in reader:
+            yield apply_column_map(chunk, column_map)
+
+    else:
+        raise ValueError(f"Formato de exportação não suportado: {extension}")
+
+def _accumulate(total, part):
+    return part if total is None else total.add(part, fill_value = 0)
+
+def stream_revenue_aggregates(path, column_map, chunk_size = 500_000, date_format = None, **read_options):
+    # Memory is bounded by the number of distinct (item, price) and (date, item) keys, not by the number of sales
+    sales_summary = None
+    daily_revenue = None
+    daily_quantity = None
+    latest_prices = None
+
+    for chunk in iterate_chunks(path, column_map, chunk_size, **read_options):
+        chunk["date"] = pd.to_datetime(chunk["date"], format = date_format)
+
+        sales_summary = _accumulate(sales_summary, chunk.groupby(["item", "price"]).size())
+
+        daily = chunk.groupby(["date", "item"])["price"]
+        daily_revenue = _accumulate(daily_revenue, daily.sum())
+        daily_quantity = _accumulate(daily_quantity, daily.size())
+
+        latest = chunk.sort_values("date", kind = "stable").groupby("item").tail(1)[["date", "item", "price"]]
+        latest_prices = latest if latest_prices is None else pd.concat([latest_prices, latest])
+        latest_prices = latest_prices.sort_values("date", kind = "stable").groupby("item").tail(1)
+
+    if sales_summary is None:
+        raise ValueError(f"Nenhuma venda encontrada em {path}!")
+
+    sales_summary = sales_summary.astype("int64").sort_index().reset_index(name = "quantity_sold")
+
+    daily_sales = pd.DataFrame({
+        "daily_revenue": daily_revenue,
+        "quantity_sold": daily_quantity.astype("int64")
+    }).sort_index().reset_index()
+
+    monthly_revenue = daily_sales.groupby(pd.Grouper(key = "date", freq = "M"))["daily_revenue"].sum().reset_index()
+    monthly_revenue.rename(columns = {"daily_revenue": "monthly_revenue"}, inplace = True)
+
+    return {
+        "sales_summary": sales_summary,
+        "daily_sales": daily_sales,
+        "monthly_revenue": monthly_revenue,
+        "latest_prices": latest_prices.set_index("item")["price"]
+    }
@@ -16,6 +16,11 @@ def load_css(file_name):
     except FileNotFoundError:
         pass
 
+@st.cache_data(max_entries = 16, show_spinner = False)
+def load_image_base64(file_name):
+    with open(file_name, "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
 # ======================== 2. SESSION STATE INITIALIZATION ========================
 
 # Controls the user's login state
@@ -37,8 +42,7 @@ def login_page():
 
     # Background loading
     
-    with open("media/background_login_page.jpg", "rb") as f:
-            image_base64 = base64.b64encode(f.read()).decode()
+    image_base64 = load_image_base64("media/background_login_page.jpg")
     
     page_background = f"""
         <style>
@@ -66,8 +70,7 @@ def login_page():
 
     # Logo loading
     try:
-        with open("media/Cabeçalho Escuro - Streamlit.png", "rb") as f:
-            image_base64 = base64.b64encode(f.read()).decode()
+        image_base64 = load_image_base64("media/Cabeçalho Escuro - Streamlit.png")
         
         st.markdown(
             f"""
@@ -0,0 +1,733 @@
+import hashlib
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from pygam import PoissonGAM, s
+from scipy.interpolate import BSpline
+from scipy.optimize import minimize
+from scipy.stats import norm
+from statsmodels.tsa.seasonal import STL
+
+# ======================== 1. WORKER POOL ========================
+
+# CONECTOR_WORKERS=1 keeps every fit in the calling process
+WORKERS = int(os.environ.get("CONECTOR_WORKERS", os.cpu_count() or 1))
+
+def parallel_map(function, arguments, workers = None):
+    # Results come back in the order of the arguments, whatever order the workers finish in
+    workers = WORKERS if workers is None else workers
+
+    if workers <= 1 or len(arguments) <= 1:
+        return [function(*argument) for argument in arguments]
+
+    with ProcessPoolExecutor(max_workers = min(workers, len(arguments))) as executor:
+        return list(executor.map(function, *zip(*arguments)))
+
+# ======================== 2. MODEL STORE ========================
+
+MODEL_DIRECTORY = os.path.join("data", ".models")
+
+def fingerprint_arrays(*arrays):
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype}{array.shape}".encode("utf-8"))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+def _model_path(item, directory, prefix = ""):
+    # Resolved at call time, so MODEL_DIRECTORY can be pointed elsewhere after import
+    directory = MODEL_DIRECTORY if directory is None else directory
+    return os.path.join(directory, prefix + hashlib.sha256(str(item).encode("utf-8")).hexdigest()[:16] + ".pkl")
+
+def load_model(item, directory = None, prefix = ""):
+    try:
+        with open(_model_path(item, directory, prefix), "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+
+def _write_model(item, record, directory, prefix = ""):
+    path = _model_path(item, directory, prefix)
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(record, f)
+    os.replace(path + ".tmp", path)
+
+def save_model(item, fingerprint, gam, directory = None):
+    _write_model(item, {"item": item, "fingerprint": fingerprint, "lam": float(np.ravel(gam.lam)[0]), "gam": gam}, directory)
+
+# ======================== 3. GAM DEMAND CURVES ========================
+
+def fit_gam(price_values, quantity_sold_values, previous_lam = None):
+    gam = PoissonGAM(s(0, n_splines = 5, spline_order = 3, constraints = "monotonic_dec"))
+
+    if previous_lam is None:
+        return gam.gridsearch(price_values, quantity_sold_values)
+
+    # A decade either side of the last selected smoothing instead of the default 11 points over six decades
+    lam_grid = np.logspace(np.log10(previous_lam) - 1, np.log10(previous_lam) + 1, 5)
+    return gam.gridsearch(price_values, quantity_sold_values, lam = lam_grid)
+
+def item_arrays(sales_summary):
+    items = sales_summary["item"].unique()
+    fit_arguments = []
+
+    for item in items:
+        item_data = sales_summary[sales_summary["item"] == item]
+
+        price_values = item_data[["price"]].values.astype(float)
+        quantity_sold_values = item_data["quantity_sold"].values
+
+        fit_arguments.append((price_values, quantity_sold_values))
+
+    return items, fit_arguments
+
+def fit_demand_curves(items, fit_arguments, points = 100, directory = None, workers = None):
+    # Items whose (price, quantity) data did not change reuse the stored model without refitting
+    gams = {}
+    pending = []
+
+    for item, (price_values, quantity_sold_values) in zip(items, fit_arguments):
+        fingerprint = fingerprint_arrays(price_values, quantity_sold_values)
+        stored = load_model(item, directory)
+
+        if stored is not None and stored["fingerprint"] == fingerprint:
+            gams[item] = stored["gam"]
+        else:
+            pending.append((item, fingerprint, (price_values, quantity_sold_values, stored["lam"] if stored else None)))
+
+    fitted = parallel_map(fit_gam, [arguments for _, _, arguments in pending], workers)
+
+    for (item, fingerprint, _), gam in zip(pending, fitted):
+        save_model(item, fingerprint, gam, directory)
+        gams[item] = gam
+
+    demand_curves = []
+    for item, (price_values, _) in zip(items, fit_arguments):
+        price_range = np.linspace(price_values.min(), price_values.max(), points)
+        demand_curves.append((price_range, gams[item].predict(price_range), gams[item]))
+
+    return demand_curves
+
+# ======================== 4. REVENUE OPTIMUM ========================
+
+def _spline_basis(term, derivative = 0):
+    # The knots pygam builds for an s() term over prices rescaled to [0, 1], one basis function per coefficient
+    boundary_knots = np.linspace(0, 1, 1 + term.n_splines - term.spline_order)
+    augmentation = np.arange(1, term.spline_order + 1) * (boundary_knots[1] - boundary_knots[0])
+    knots = np.r_[-augmentation[::-1], boundary_knots, 1 + augmentation]
+
+    basis = BSpline(knots, np.eye(term.n_splines), term.spline_order)
+    return basis.derivative(derivative) if derivative else basis
+
+class DemandCurves:
+    # log demand of every item as basis · coefficients + intercept, evaluated for all items at once;
+    # all items share the same term, so only the coefficients and the price rescaling differ
+    def __init__(self, term, coefficients, edge_knots):
+        self.coefficients = np.asarray(coefficients, dtype = float)
+        self.offset = np.asarray(edge_knots, dtype = float)[:, 0]
+        self.scale = np.asarray(edge_knots, dtype = float)[:, 1] - self.offset
+        self.scale[self.scale == 0] = 1
+        self.bases = [_spline_basis(term, derivative) for derivative in range(3)]
+
+    @classmethod
+    def from_gams(cls, gams):
+        term = gams[0].terms[0]
+        return cls(term, [gam.coef_ for gam in gams], [gam.terms[0].edge_knots_ for gam in gams])
+
+    def log_demand(self, prices, derivative = 0):
+        # prices has one row per item; the chain rule brings one 1 / scale per derivative
+        n_coefficients = self.coefficients.shape[1] - 1
+        rescaled = (prices - self.offset[:, None]) / self.scale[:, None]
+
+        basis = self.bases[derivative](rescaled.ravel()).reshape(*prices.shape, n_coefficients)
+        values = np.einsum("imc,ic->im", basis, self.coefficients[:, :n_coefficients]) / self.scale[:, None] ** derivative
+
+        return values + self.coefficients[:, -1:] if derivative == 0 else values
+
+    def revenue_slope(self, prices):
+        # d(price · demand)/dprice = demand · (1 + price · dlog(demand)/dprice), so its sign is that of 1 + elasticity
+        return 1 + prices * self.log_demand(prices, 1)
+
+    def revenue_curvature(self, prices):
+        return self.log_demand(prices, 1) + prices * self.log_demand(prices, 2)
+
+def optimize_revenue(curves, lower, upper, scan_points = 16, tolerance = 1e-10, max_iterations = 50):
+    # Bracketed Newton on the revenue slope, for every item and every bracket of a coarse scan in one vectorized pass
+    lower = np.asarray(lower, dtype = float)
+    upper = np.asarray(upper, dtype = float)
+
+    scan = lower[:, None] + (upper - lower)[:, None] * np.linspace(0, 1, scan_points)[None, :]
+    slope = curves.revenue_slope(scan)
+
+    # A local maximum lies wherever revenue stops increasing between two scan points
+    bracketed = (slope[:, :-1] > 0) & (slope[:, 1:] <= 0)
+    left, right = scan[:, :-1].copy(), scan[:, 1:].copy()
+    prices = (left + right) / 2
+
+    for _ in range(max_iterations):
+        slope = curves.revenue_slope(prices)
+        increasing = slope > 0
+        left = np.where(increasing, prices, left)
+        right = np.where(increasing, right, prices)
+
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            newton = prices - slope / curves.revenue_curvature(prices)
+
+        # Newton steps that leave the bracket fall back to bisection
+        inside = np.isfinite(newton) & (newton > left) & (newton < right)
+        next_prices = np.where(inside, newton, (left + right) / 2)
+
+        converged = np.all(np.abs(next_prices - prices)[bracketed] < tolerance)
+        prices = next_prices
+        if converged:
+            break
+
+    # Interior maxima compete with both bounds, so a curve still rising at the top price ends there
+    candidates = np.concatenate([np.where(bracketed, prices, lower[:, None]), lower[:, None], upper[:, None]], axis = 1)
+    candidate_revenue = candidates * np.exp(curves.log_demand(candidates))
+
+    best = np.argmax(candidate_revenue, axis = 1)
+    optimal_price = candidates[np.arange(len(candidates)), best][:, None]
+
+    optimal_quantity_sold = np.exp(curves.log_demand(optimal_price))[:, 0]
+    optimal_elasticity = (optimal_price * curves.log_demand(optimal_price, 1))[:, 0]
+
+    return pd.DataFrame({
+        "optimal_price": optimal_price[:, 0],
+        "optimal_quantity_sold": optimal_quantity_sold,
+        "optimal_revenue": optimal_price[:, 0] * optimal_quantity_sold / 1000,
+        "optimal_elasticity": optimal_elasticity
+    })
+
+# ======================== 5. BOOTSTRAP INTERVALS ========================
+
+BOOTSTRAP_REPLICATES = int(os.environ.get("CONECTOR_BOOTSTRAP_REPLICATES", 100))
+
+def refit_poisson_batch(gam, price_values, samples, max_iterations = 100, tolerance = 1e-4):
+    # pygam's penalized IRLS for every replicate at once: all of them share the basis and the smoothing penalty
+    # of the fitted item, so each iteration is one batch of small normal-equation solves. The monotonic constraint
+    # is pygam's large penalty on the increasing steps of each replicate's coefficients, with the same loading
+    basis = gam._modelmat(price_values).toarray()
+    n_splines = gam.terms[0].n_coefs
+    n_coefficients = basis.shape[1]
+
+    penalty = gam._P().toarray() + np.sqrt(np.finfo(float).eps) * np.eye(n_coefficients)
+    difference = np.diff(np.eye(n_splines), axis = 0)
+
+    counts = np.asarray(samples, dtype = float)
+    coefficients = np.tile(gam.coef_, (len(counts), 1))
+
+    for _ in range(max_iterations):
+        linear_predictor = coefficients @ basis.T
+        mean = np.exp(linear_predictor)
+        working_response = linear_predictor + (counts - mean) / mean
+
+        increasing = (np.diff(coefficients[:, :n_splines], axis = 1) > 0).astype(float)
+        constraint = np.zeros((len(counts), n_coefficients, n_coefficients))
+        constraint[:, :n_splines, :n_splines] = (gam._constraint_lam * np.einsum("jk,rj,jl->rkl", difference, increasing, difference)
+                                                 + gam._constraint_l2 * increasing.any(axis = 1)[:, None, None] * np.eye(n_splines))
+
+        normal_matrices = np.einsum("nk,rn,nl->rkl", basis, mean, basis) + penalty + constraint
+        normal_targets = np.einsum("nk,rn->rk", basis, mean * working_response)
+        updated = np.linalg.solve(normal_matrices, normal_targets[..., None])[..., 0]
+
+        change = np.linalg.norm(updated - coefficients, axis = 1) / np.linalg.norm(updated, axis = 1)
+        coefficients = updated
+        if np.all(change < tolerance):
+            break
+
+    return coefficients
+
+def bootstrap_optimum(price_values, quantity_sold_values, lam, replicates, seed):
+    # Resampling the individual sales behind each (price, quantity) row is a multinomial draw over the rows,
+    # so every replicate keeps all the observed prices and all of them are drawn in one call
+    random = np.random.default_rng(seed)
+    total_sold = int(quantity_sold_values.sum())
+    samples = random.multinomial(total_sold, quantity_sold_values / total_sold, size = replicates)
+
+    # One pygam fit at the smoothing already selected for the item gives the basis, the penalty and the starting
+    # point; the replicates are then refitted together instead of one pygam fit each
+    gam = PoissonGAM(s(0, n_splines = 5, spline_order = 3, constraints = "monotonic_dec"), lam = lam).fit(price_values, quantity_sold_values)
+
+    with np.errstate(over = "ignore", invalid = "ignore", divide = "ignore"):
+        coefficients = refit_poisson_batch(gam, price_values, samples)
+
+    fitted = np.flatnonzero(np.isfinite(coefficients).all(axis = 1))
+    optima = np.full((replicates, 3), np.nan)
+
+    if len(fitted):
+        # Every replicate shares the item's prices, so all their optima come from one vectorized search
+        curves = DemandCurves(gam.terms[0], coefficients[fitted], [gam.terms[0].edge_knots_] * len(fitted))
+        optimum = optimize_revenue(curves, [price_values.min()] * len(fitted), [price_values.max()] * len(fitted))
+        optima[fitted] = optimum[["optimal_price", "optimal_quantity_sold", "optimal_revenue"]].values
+
+    return optima
+
+def bootstrap_intervals(items, fit_arguments, lams, replicates = None, confidence = 0.95, seed = 0, directory = None, workers = None):
+    replicates = BOOTSTRAP_REPLICATES if replicates is None else replicates
+    seeds = np.random.SeedSequence(seed).spawn(len(items))
+
+    # Replicates are kept in the item's model store entry, so unchanged items are not resampled on the next refresh
+    optima = {}
+    pending = []
+
+    for item, (price_values, quantity_sold_values), item_seed in zip(items, fit_arguments, seeds):
+        stored = load_model(item, directory)
+        key = (replicates, seed)
+
+        if stored is not None and stored["fingerprint"] == fingerprint_arrays(price_values, quantity_sold_values) and key in stored.get("bootstrap_optima", {}):
+            optima[item] = stored["bootstrap_optima"][key]
+        else:
+            pending.append((item, stored, (price_values, quantity_sold_values, lams[item], replicates, item_seed)))
+
+    resampled = parallel_map(bootstrap_optimum, [arguments for _, _, arguments in pending], workers)
+
+    for (item, stored, _), item_optima in zip(pending, resampled):
+        if stored is not None:
+            stored.setdefault("bootstrap_optima", {})[(replicates, seed)] = item_optima
+            _write_model(item, stored, directory)
+        optima[item] = item_optima
+
+    tail = (1 - confidence) / 2 * 100
+    intervals = []
+
+    for item in items:
+        lower = np.nanpercentile(optima[item], tail, axis = 0)
+        upper = np.nanpercentile(optima[item], 100 - tail, axis = 0)
+
+        intervals.append({
+            "item": item,
+            "optimal_price_lower": lower[0],
+            "optimal_price_upper": upper[0],
+            "expected_quantity_sold_lower": lower[1],
+            "expected_quantity_sold_upper": upper[1],
+            "expected_revenue_lower": lower[2],
+            "expected_revenue_upper": upper[2],
+            "replicates": int(np.isfinite(optima[item][:, 0]).sum())
+        })
+
+    return pd.DataFrame(intervals)
+
+# ======================== 6. BATCHED LOG-LOG REGRESSIONS ========================
+
+def grouped_linear_regression(groups, x, y):
+    # Ordinary least squares of y on x for every group at once, from per-group sums instead of one model per group
+    codes, uniques = pd.factorize(groups, sort = False)
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+
+    observations = np.bincount(codes, minlength = len(uniques)).astype(float)
+    mean_x = np.bincount(codes, weights = x, minlength = len(uniques)) / observations
+    mean_y = np.bincount(codes, weights = y, minlength = len(uniques)) / observations
+
+    # Sums are taken around the group means, which keeps them stable for log prices with little spread
+    centered_x = x - mean_x[codes]
+    centered_y = y - mean_y[codes]
+    sxx = np.bincount(codes, weights = centered_x * centered_x, minlength = len(uniques))
+    sxy = np.bincount(codes, weights = centered_x * centered_y, minlength = len(uniques))
+    syy = np.bincount(codes, weights = centered_y * centered_y, minlength = len(uniques))
+
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        slope = sxy / sxx
+        intercept = mean_y - slope * mean_x
+
+        residual_variance = (syy - slope * sxy) / (observations - 2)
+        slope_standard_error = np.sqrt(residual_variance / sxx)
+        intercept_standard_error = np.sqrt(residual_variance * (1 / observations + mean_x ** 2 / sxx))
+
+    return pd.DataFrame({
+        "group": np.asarray(uniques),
+        "observations": observations.astype(int),
+        "intercept": intercept,
+        "slope": slope,
+        "intercept_standard_error": intercept_standard_error,
+        "slope_standard_error": slope_standard_error
+    })
+
+# ======================== 7. SEASONAL DECOMPOSITION ========================
+
+# Days re-decomposed when new days are appended; 0 decomposes every full history again
+STL_WINDOW = int(os.environ.get("CONECTOR_STL_WINDOW", 0))
+
+def decompose_series(values, period = 7):
+    stl_result = STL(values, period = period, robust = True).fit()
+    return np.column_stack([stl_result.trend, stl_result.seasonal, stl_result.resid])
+
+def decompose_items(items, starts, series_values, period = 7, window = None, directory = None, workers = None):
+    # Returns one (days, 3) array of trend, seasonal and residual per item, in the order of items
+    window = STL_WINDOW if window is None else window
+    components = {}
+    pending = []
+
+    for item, start, values in zip(items, starts, series_values):
+        stored = load_model(item, directory, "stl_") if window else None
+        history = len(stored["values"]) if stored is not None else 0
+
+        reusable = (stored is not None and stored["start"] == start and stored["period"] == period
+                    and len(values) >= history and np.array_equal(values[:history], stored["values"]))
+
+        if reusable and len(values) == history:
+            components[item] = stored["components"]
+        elif reusable and history > 2 * window:
+            # Only the trailing window is replaced; it is fitted with one more window of history before it,
+            # so the spliced values do not sit on the edge of their own fit
+            splice = history - window
+            pending.append((item, start, values, stored["components"][:splice], splice - window))
+        else:
+            pending.append((item, start, values, None, 0))
+
+    fitted = parallel_map(decompose_series, [(values[fit_start:], period) for _, _, values, _, fit_start in pending], workers)
+
+    for (item, start, values, head, fit_start), item_components in zip(pending, fitted):
+        if head is not None:
+            # Robust weights come from the whole fitted span, so the tail never matches a full fit exactly;
+            # the last period of the stored values fades into the new fit instead of jumping at the splice
+            overlap = np.linspace(0, 1, period + 2)[1:-1, None]
+            tail = item_components[len(head) - fit_start - period:]
+            tail[:period] = (1 - overlap) * head[-period:] + overlap * tail[:period]
+            item_components = np.vstack([head[:-period], tail])
+        if window:
+            _write_model(item, {"item": item, "start": start, "period": period, "values": values, "components": item_components}, directory, "stl_")
+        components[item] = item_components
+
+    return [components[item] for item in items]
+
+# ======================== 8. DEMAND FORECASTING ========================
+
+FORECAST_HORIZON = int(os.environ.get("CONECTOR_FORECAST_HORIZON", 28))
+
+def forecast_daily(daily_frame, value_columns, horizon = None, period = 7, history = 182, confidence = 0.95):
+    # Linear trend plus one level per weekday, fitted to the trailing history of every (item, column) series
+    # with a single least squares solve, since all series share the same calendar and so the same design
+    horizon = FORECAST_HORIZON if horizon is None else horizon
+
+    panel = daily_frame.pivot_table(index = "date", columns = "item", values = value_columns, aggfunc = "sum", observed = True)
+    panel = panel.reindex(pd.date_range(panel.index.min(), panel.index.max(), freq = "D")).fillna(0.0).iloc[-history:]
+
+    observed_days = len(panel)
+    steps = np.arange(observed_days + horizon)
+
+    design = np.column_stack([np.ones(len(steps)), steps / observed_days] +
+                             [(steps % period == day).astype(float) for day in range(1, period)])
+    fitted_design, future_design = design[:observed_days], design[observed_days:]
+
+    values = panel.values.astype(float)
+    coefficients, _, _, _ = np.linalg.lstsq(fitted_design, values, rcond = None)
+
+    residual_variance = ((values - fitted_design @ coefficients) ** 2).sum(axis = 0) / (observed_days - design.shape[1])
+    leverage = np.einsum("hp,pq,hq->h", future_design, np.linalg.pinv(fitted_design.T @ fitted_design), future_design)
+
+    forecast = future_design @ coefficients
+    margin = norm.ppf(0.5 + confidence / 2) * np.sqrt(np.outer(1 + leverage, residual_variance))
+
+    future_dates = pd.date_range(panel.index[-1] + pd.Timedelta(days = 1), periods = horizon, freq = "D")
+    series = pd.MultiIndex.from_tuples(panel.columns, names = ["column", "item"])
+
+    # Sales cannot be negative, so the point forecast and both bounds are floored at zero
+    tidy = {}
+    for suffix, array in [("", forecast), ("_lower", forecast - margin), ("_upper", forecast + margin)]:
+        frame = pd.DataFrame(np.clip(array, 0, None), index = future_dates, columns = series)
+        tidy[suffix] = frame.stack("item", future_stack = True)
+
+    forecasts = pd.concat([tidy[suffix].add_suffix(suffix) for suffix in tidy], axis = 1)
+    forecasts = forecasts[[column + suffix for column in value_columns for suffix in tidy]]
+    forecasts.index.names = ["date", "item"]
+    forecasts.columns.name = None
+
+    return forecasts.reset_index()
+
+
+# ======================== 9. JOINT MENU PRICING ========================
+
+CROSS_PRICE_RIDGE = float(os.environ.get("CONECTOR_CROSS_PRICE_RIDGE", 1.0))
+
+def cross_price_elasticities(daily_sales, ridge = None, period = 7):
+    # log(quantity_i) = intercept_i + weekday_i + sum_j elasticity_ij · log(price_j), fitted on the days item i sold;
+    # every item shares the same regressors, so all the weighted fits are one batch of small linear systems
+    ridge = CROSS_PRICE_RIDGE if ridge is None else ridge
+
+    quantity = daily_sales.pivot_table(index = "date", columns = "item", values = "quantity_sold", aggfunc = "sum", observed = True)
+    revenue = daily_sales.pivot_table(index = "date", columns = "item", values = "daily_revenue", aggfunc = "sum", observed = True)
+
+    calendar = pd.date_range(quantity.index.min(), quantity.index.max(), freq = "D")
+    quantity = quantity.reindex(calendar).fillna(0.0)
+
+    # A day without sales keeps the last price charged for the item
+    prices = (revenue.reindex(calendar) / quantity.replace(0, np.nan)).ffill().bfill()
+
+    n_items = quantity.shape[1]
+    weekdays = [(calendar.dayofweek == day).astype(float) for day in range(1, period)]
+    design = np.column_stack([np.ones(len(calendar))] + weekdays + [np.log(prices.values.astype(float))])
+    n_controls = design.shape[1] - n_items
+
+    sold = (quantity.values > 0).astype(float)
+    log_quantity = np.log(np.where(sold > 0, quantity.values, 1.0))
+
+    normal_matrices = np.einsum("tk,ti,tl->ikl", design, sold, design)
+    normal_targets = np.einsum("tk,ti->ik", design, sold * log_quantity)
+
+    # Menu prices tend to move together, so only the cross-price terms are shrunk towards zero, each in
+    # proportion to the spread of its log price (a ridge on standardized regressors)
+    cross_terms = 1.0 - np.eye(n_items)
+    penalty = np.zeros((n_items, design.shape[1]))
+    penalty[:, n_controls:] = ridge * cross_terms * np.outer(sold.sum(axis = 0), design[:, n_controls:].var(axis = 0))
+    normal_matrices[:, np.arange(design.shape[1]), np.arange(design.shape[1])] += penalty
+
+    coefficients = np.linalg.solve(normal_matrices, normal_targets[..., None])[..., 0]
+
+    # The weekday levels are averaged into the intercept, so the demand is the one of a typical day
+    items = list(quantity.columns)
+    intercepts = pd.Series(coefficients[:, 0] + coefficients[:, 1:n_controls].sum(axis = 1) / period, index = items)
+    elasticities = pd.DataFrame(coefficients[:, n_controls:], index = items, columns = items)
+
+    return intercepts, elasticities, prices
+
+def _menu_revenue(prices, curves, cross_elasticities, reference_log_prices):
+    # log demand_i = GAM curve_i(p_i) + sum_j cross_ij · (log p_j - reference_j): every item keeps its own fitted
+    # curve, whose revenue peaks inside the observed prices, and only the cross terms come from the regression
+    item_revenue = prices * np.exp(curves.log_demand(prices[:, None])[:, 0] + cross_elasticities @ (np.log(prices) - reference_log_prices))
+    own_slope = item_revenue * (1 / prices + curves.log_demand(prices[:, None], 1)[:, 0])
+
+    return -item_revenue.sum(), -(own_slope + cross_elasticities.T @ item_revenue / prices)
+
+def optimize_menu(curves, elasticities, reference_prices, starts, tolerance = 1e-4):
+    # All prices are searched together inside the price range each curve was fitted on, from every start given
+    # (typically the item-by-item optimum and the current menu), keeping the best
+    lower = curves.offset
+    upper = curves.offset + curves.scale
+
+    # The own-price terms of the regression are replaced by the curves, so only the cross terms are kept
+    cross_elasticities = np.asarray(elasticities, dtype = float).copy()
+    np.fill_diagonal(cross_elasticities, 0.0)
+    reference_log_prices = np.log(np.asarray(reference_prices, dtype = float))
+
+    results = [minimize(_menu_revenue, np.clip(np.asarray(start, dtype = float), lower, upper), jac = True, method = "L-BFGS-B",
+                        args = (curves, cross_elasticities, reference_log_prices), bounds = list(zip(lower, upper)))
+               for start in starts]
+    prices = min(results, key = lambda result: result.fun).x
+
+    quantity = np.exp(curves.log_demand(prices[:, None])[:, 0] + cross_elasticities @ (np.log(prices) - reference_log_prices))
+
+    # A price pinned to the edge of its range is where the data ran out, not an optimum
+    at_bound = np.isclose(prices, lower, rtol = tolerance) | np.isclose(prices, upper, rtol = tolerance)
+
+    return pd.DataFrame({
+        "joint_optimal_price": prices,
+        "joint_quantity_sold": quantity,
+        "joint_revenue": prices * quantity / 1000,
+        "joint_at_bound": at_bound
+    }, index = getattr(reference_prices, "index", None))
+
+# ======================== 10. CASH-FLOW SIMULATION ========================
+
+SIMULATION_PATHS = int(os.environ.get("CONECTOR_SIMULATION_PATHS", 100000))
+
+# With a year or two of history a trend says little about the next five years, so the estimate is pulled towards
+# a prior annual growth, as if the prior carried GROWTH_PRIOR_MONTHS of evidence, and capped at ± GROWTH_CAP
+GROWTH_PRIOR = float(os.environ.get("CONECTOR_GROWTH_PRIOR", 0.10))
+GROWTH_PRIOR_MONTHS = float(os.environ.get("CONECTOR_GROWTH_PRIOR_MONTHS", 36))
+GROWTH_CAP = float(os.environ.get("CONECTOR_GROWTH_CAP", 0.30))
+
+def estimate_growth(monthly_values, periods = 12, prior = None, prior_months = None, cap = None):
+    # Annual log growth of every monthly series: the mean year-over-year change once there are two years of
+    # months, a log-linear trend before that (months with a zero, usually a partial first or last month, are left
+    # out). Either way it is a rate for the near term: the projection holds it constant for every simulated year
+    prior = GROWTH_PRIOR if prior is None else prior
+    prior_months = GROWTH_PRIOR_MONTHS if prior_months is None else prior_months
+    cap = GROWTH_CAP if cap is None else cap
+
+    values = np.asarray(monthly_values, dtype = float)
+    complete = (values > 0).all(axis = 1)
+    n_series = values.shape[1]
+
+    year_over_year = complete[periods:] & complete[:-periods] if len(values) > periods else np.zeros(0, dtype = bool)
+
+    if year_over_year.sum() >= periods:
+        # Each year-over-year change is one draw of the annual growth, so their dispersion is the one of a year
+        changes = (np.log(values[periods:]) - np.log(values[:-periods]))[year_over_year]
+        log_growth = changes.mean(axis = 0)
+        covariance = np.cov(changes, rowvar = False).reshape(n_series, n_series)
+        evidence = len(changes)
+    elif complete.sum() > 2:
+        # The trend is drawn with the uncertainty of its slope plus the month-to-month noise that survives in a year total
+        steps = np.arange(len(values))[complete]
+        design = np.column_stack([np.ones(len(steps)), steps])
+        log_values = np.log(values[complete])
+        coefficients, _, _, _ = np.linalg.lstsq(design, log_values, rcond = None)
+
+        residuals = log_values - design @ coefficients
+        residual_covariance = residuals.T @ residuals / (len(steps) - design.shape[1])
+        slope_variance = np.linalg.inv(design.T @ design)[1, 1]
+
+        log_growth = coefficients[1] * periods
+        covariance = residual_covariance * (periods ** 2 * slope_variance + 2 / periods)
+        evidence = len(steps)
+    else:
+        # Too few months to estimate anything: the prior alone, with no dispersion
+        log_growth = np.zeros(n_series)
+        covariance = np.zeros((n_series, n_series))
+        evidence = 0
+
+    weight = evidence / (evidence + prior_months) if evidence + prior_months > 0 else 0.0
+    log_growth = weight * log_growth + (1 - weight) * np.log1p(prior)
+    mean = np.expm1(np.clip(log_growth, np.log1p(-cap), np.log1p(cap)))
+
+    return mean, covariance
+
+def _covariance_factor(covariance):
+    # A short or degenerate history can leave the covariance singular or slightly indefinite, where Cholesky fails;
+    # the eigen-decomposition with negative eigenvalues clipped to zero gives a valid factor in every case
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh((covariance + covariance.T) / 2)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+def simulate_growth_paths(start, mean, covariance, years = 5, paths = None, seed = 0):
+    # Every path and year is one draw of correlated log growths, so the whole simulation is a single array
+    # of shape (paths, years, series)
+    paths = SIMULATION_PATHS if paths is None else paths
+    mean = np.asarray(mean, dtype = float)
+
+    covariance = np.nan_to_num(np.asarray(covariance, dtype = float))
+
+    generator = np.random.default_rng(seed)
+    shocks = generator.standard_normal((paths, years, len(mean))) @ _covariance_factor(covariance).T
+    log_growth = shocks + (np.log1p(mean) - np.diag(covariance) / 2)
+
+    return np.asarray(start, dtype = float) * np.exp(np.cumsum(log_growth, axis = 1))
+
+def cash_flow_bands(revenue, expense, percentiles = (5, 50, 95)):
+    # Percentiles are taken per year across paths; the margin band comes from the paths, not from the bands
+    bands = np.percentile(np.stack([revenue, expense, revenue - expense]), percentiles, axis = 1)
+
+    return bands.transpose(1, 0, 2)
+
+# ======================== 11. FINANCE KERNEL ========================
+
+def cash_flow_matrix(cash_flows):
+    # One cash flow per row; ragged portfolios are padded with zeros at the end, which leaves NPV and IRR
+    # unchanged, and the true lengths are kept for MIRR
+    if isinstance(cash_flows, (np.ndarray, pd.DataFrame)):
+        values = np.array(cash_flows, dtype = float, ndmin = 2)
+    elif len(cash_flows) and np.ndim(cash_flows[0]) == 0:
+        values = np.array([cash_flows], dtype = float)
+    else:
+        rows = [np.asarray(row, dtype = float) for row in cash_flows]
+        values = np.full((len(rows), max(len(row) for row in rows)), np.nan)
+        for index, row in enumerate(rows):
+            values[index, :len(row)] = row
+
+    present = ~np.isnan(values)
+    lengths = values.shape[1] - np.argmax(present[:, ::-1], axis = 1)
+
+    return np.where(present, values, 0.0), lengths
+
+def batch_npv(rates, cash_flows):
+    # Rates broadcast against the projects: a scalar prices the whole portfolio, one rate per project prices
+    # each on its own, and a column of rates gives the NPV profile of every project
+    values, _ = cash_flow_matrix(cash_flows)
+    discount = (1 + np.asarray(rates, dtype = float)[..., None]) ** -np.arange(values.shape[1])
+
+    return (values * discount).sum(axis = -1)
+
+def _npv_and_slope(rates, values):
+    periods = np.arange(values.shape[1])
+    discount = (1 + rates[:, None]) ** -periods
+
+    return (values * discount).sum(axis = 1), -(values * periods * discount / (1 + rates[:, None])).sum(axis = 1)
+
+def batch_irr(cash_flows, guess = 0.1, lower = -0.99, upper = 10.0, scan_points = 64, tolerance = 1e-10, max_iterations = 100):
+    # A coarse scan brackets a sign change of the NPV for every project (the one closest to the guess when there
+    # are several), then Newton steps refine all of them at once, falling back to bisection whenever a step
+    # leaves its bracket. Projects without a sign change in [lower, upper] have no IRR and return NaN
+    values, _ = cash_flow_matrix(cash_flows)
+    n_projects = len(values)
+
+    grid = np.expm1(np.linspace(np.log1p(lower), np.log1p(upper), scan_points))
+    profile = (values[:, None, :] * (1 + grid[None, :, None]) ** -np.arange(values.shape[1])).sum(axis = 2)
+
+    crossings = np.signbit(profile[:, :-1]) != np.signbit(profile[:, 1:])
+    midpoints = (grid[:-1] + grid[1:]) / 2
+    distance = np.where(crossings, np.abs(midpoints - guess), np.inf)
+    bracket = np.argmin(distance, axis = 1)
+    found = np.isfinite(distance[np.arange(n_projects), bracket])
+
+    low, high = grid[bracket], grid[bracket + 1]
+    low_npv = profile[np.arange(n_projects), bracket]
+    rates = (low + high) / 2
+
+    for _ in range(max_iterations):
+        npv, slope = _npv_and_slope(rates, values)
+
+        # The bracket keeps the endpoint whose NPV has the sign of the low end
+        same_side = np.signbit(npv) == np.signbit(low_npv)
+        low, high = np.where(same_side, rates, low), np.where(same_side, high, rates)
+        low_npv = np.where(same_side, npv, low_npv)
+
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            newton = rates - npv / slope
+        inside = np.isfinite(newton) & (newton > low) & (newton < high)
+        updated = np.where(inside, newton, (low + high) / 2)
+
+        converged = np.abs(updated - rates) < tolerance
+        rates = updated
+        if converged[found].all():
+            break
+
+    return np.where(found, rates, np.nan)
+
+def batch_mirr(cash_flows, financing_rate, reinvestment_rate):
+    # Outflows are discounted at the financing rate and inflows compounded to each project's own last period;
+    # both rates broadcast against the projects like in batch_npv
+    values, lengths = cash_flow_matrix(cash_flows)
+    periods = np.arange(values.shape[1])
+
+    financing = (1 + np.asarray(financing_rate, dtype = float)[..., None]) ** -periods
+    reinvestment = (1 + np.asarray(reinvestment_rate, dtype = float)[..., None]) ** (lengths[:, None] - periods - 1)
+
+    present_value = (np.minimum(values, 0) * financing).sum(axis = -1)
+    future_value = (np.maximum(values, 0) * reinvestment).sum(axis = -1)
+
+    return np.abs(future_value / present_value) ** (1 / (lengths - 1)) - 1
+
+# ======================== 12. FINANCIAL RATIOS ========================
+
+def _weights(sides, headings):
+    weights = pd.DataFrame(list(sides), dtype = float).fillna(0.0)
+    return weights.reindex(columns = headings, fill_value = 0.0).values
+
+def financial_ratios(accounts, definitions):
+    # accounts is the heading × period matrix; every definition maps a ratio to (numerator, denominator), each a
+    # {heading: coefficient} combination, with an empty denominator meaning an absolute amount. All ratios for all
+    # periods come out of two matrix products
+    names = list(definitions)
+    numerators = [numerator for numerator, _ in definitions.values()]
+    denominators = [denominator for _, denominator in definitions.values()]
+
+    missing = {heading for side in numerators + denominators for heading in side} - set(accounts.index)
+    if missing:
+        raise KeyError(f"Rubricas não encontradas no balanço: {', '.join(sorted(missing))}")
+
+    values = accounts.apply(pd.to_numeric, errors = "coerce").values.astype(float)
+    numerator_weights = _weights(numerators, accounts.index)
+    denominator_weights = _weights(denominators, accounts.index)
+    absolute = np.array([not denominator for denominator in denominators], dtype = float)
+
+    # A missing heading only blanks the ratios that use it, instead of spreading through the products as NaN
+    missing_values = np.isnan(values)
+    uses_missing = ((numerator_weights != 0) | (denominator_weights != 0)).astype(float) @ missing_values > 0
+    values = np.where(missing_values, 0.0, values)
+
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        ratios = (numerator_weights @ values) / (denominator_weights @ values + absolute[:, None])
+
+    ratios = pd.DataFrame(np.where(np.isfinite(ratios) & ~uses_missing, ratios, np.nan), index = pd.Index(names, name = "ratio"),
+                          columns = pd.Index(accounts.columns, name = "period"))
+
+    return ratios.T.stack(future_stack = True).rename("value").reset_index()
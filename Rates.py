@@ -0,0 +1,287 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# ======================== 1. SERIES AND SETTINGS ========================
+
+# Point CONECTOR_BCB_URL at a local server to run the appraisals against a stub of the SGS API
+BASE_URL = os.environ.get("CONECTOR_BCB_URL", "https://api.bcb.gov.br/dados/serie")
+
+CACHE_DIRECTORY = os.path.join("data", ".rates")
+CACHE_TTL = float(os.environ.get("CONECTOR_BCB_TTL", 6 * 60 * 60))
+TIMEOUT = float(os.environ.get("CONECTOR_BCB_TIMEOUT", 5))
+RETRIES = int(os.environ.get("CONECTOR_BCB_RETRIES", 2))
+
+SELIC = 432
+IPCA = 433
+
+# First observation of each series, where a store without history starts its sync
+SERIES_START = {
+    SELIC: "1999-03-05",
+    IPCA: "1980-01-01"
+}
+
+# The SGS API refuses date ranges longer than ten years, so syncs walk the calendar in windows below that
+SYNC_WINDOW_DAYS = int(os.environ.get("CONECTOR_BCB_WINDOW_DAYS", 5 * 365))
+SYNC_CONCURRENCY = int(os.environ.get("CONECTOR_BCB_CONCURRENCY", 4))
+
+# IBGE publishes each IPCA around the 10th of the month after its reference month; the margin keeps late releases out
+IPCA_PUBLICATION_LAG_DAYS = int(os.environ.get("CONECTOR_IPCA_PUBLICATION_LAG_DAYS", 15))
+
+SERIES_NAMES = {
+    SELIC: "a taxa Selic",
+    IPCA: "o Índice Nacional de Preços ao Consumidor Amplo (IPCA)"
+}
+
+# ======================== 2. RATE CLIENT ========================
+
+class RateClient:
+    def __init__(self, base_url = None, cache_directory = None, ttl = None, timeout = None, retries = None):
+        self.base_url = (BASE_URL if base_url is None else base_url).rstrip("/")
+        self.cache_directory = CACHE_DIRECTORY if cache_directory is None else cache_directory
+        self.ttl = CACHE_TTL if ttl is None else ttl
+        self.timeout = TIMEOUT if timeout is None else timeout
+
+        # One pooled session for every call, so only the first request pays the TLS handshake
+        retry = Retry(total = RETRIES if retries is None else retries, backoff_factor = 0.3,
+                      status_forcelist = (429, 500, 502, 503, 504), allowed_methods = ["GET"])
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize = 4, max_retries = retry))
+        self.session.mount("http://", HTTPAdapter(pool_maxsize = 4, max_retries = retry))
+
+        self._memory = {}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _cache_path(self, series, last):
+        return os.path.join(self.cache_directory, f"sgs_{series}_ultimos_{last}.json")
+
+    def _read_cache(self, series, last):
+        try:
+            with open(self._cache_path(series, last), encoding = "utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, series, last, record):
+        os.makedirs(self.cache_directory, exist_ok = True)
+
+        # Swapped in whole, so a concurrent reader never finds half a response
+        descriptor, temporary_path = tempfile.mkstemp(dir = self.cache_directory, suffix = ".tmp")
+        with os.fdopen(descriptor, "w", encoding = "utf-8") as f:
+            json.dump(record, f)
+        os.replace(temporary_path, self._cache_path(series, last))
+
+    def latest(self, series, last = 1):
+        # Fresh values come from memory or disk; stale ones are refetched, and kept as the answer when offline
+        with self._lock((series, last)):
+            record = self._memory.get((series, last))
+
+            # A stale copy in memory may have been refreshed on disk by another process in the meantime
+            if record is None or time.time() - record["fetched_at"] >= self.ttl:
+                stored = self._read_cache(series, last)
+                if stored is not None and (record is None or stored["fetched_at"] > record["fetched_at"]):
+                    record = stored
+
+            if record is not None and time.time() - record["fetched_at"] < self.ttl:
+                self._memory[(series, last)] = record
+                return record["data"]
+
+            try:
+                response = self.session.get(f"{self.base_url}/bcdata.sgs.{series}/dados/ultimos/{last}",
+                                            params = {"formato": "json"}, timeout = self.timeout)
+                response.raise_for_status()
+                record = {"fetched_at": time.time(), "data": response.json()}
+            except (requests.RequestException, ValueError):
+                if record is None:
+                    raise ConnectionError(f"Falha ao acessar {SERIES_NAMES.get(series, f'a série {series}')}!")
+                return record["data"]
+
+            self._write_cache(series, last, record)
+            self._memory[(series, last)] = record
+
+            return record["data"]
+
+    def window(self, series, start, end):
+        # Observations between two dates, straight from the API; an empty window comes back as 404
+        response = self.session.get(f"{self.base_url}/bcdata.sgs.{series}/dados", timeout = self.timeout, params = {
+            "formato": "json",
+            "dataInicial": pd.Timestamp(start).strftime("%d/%m/%Y"),
+            "dataFinal": pd.Timestamp(end).strftime("%d/%m/%Y")
+        })
+
+        if response.status_code == 404:
+            return []
+        response.raise_for_status()
+
+        return response.json()
+
+    def selic_rate(self):
+        data = self.latest(SELIC, 1)
+
+        return float(data[0]["valor"]) / 100
+
+    def ipca_12_months(self):
+        data = self.latest(IPCA, 12)
+
+        compound = 1
+        for nibble in data:
+            compound *= 1 + float(nibble["valor"]) / 100
+        return compound - 1
+
+    def rates(self):
+        # Both series are requested at the same time over the shared pool
+        with ThreadPoolExecutor(max_workers = 2) as executor:
+            selic = executor.submit(self.selic_rate)
+            ipca = executor.submit(self.ipca_12_months)
+
+            return {"selic": selic.result(), "ipca_12_months": ipca.result()}
+
+    def close(self):
+        self.session.close()
+
+# ======================== 3. HISTORICAL STORE ========================
+
+HISTORY_DIRECTORY = os.path.join(CACHE_DIRECTORY, "history")
+
+def _observations(data):
+    frame = pd.DataFrame(data, columns = ["data", "valor"])
+
+    return pd.DataFrame({
+        "date": pd.to_datetime(frame["data"], format = "%d/%m/%Y"),
+        "value": frame["valor"].astype(float)
+    })
+
+class RateStore:
+    def __init__(self, client = None, directory = None):
+        self.client = RateClient() if client is None else client
+        self.directory = HISTORY_DIRECTORY if directory is None else directory
+        self._frames = {}
+
+    def _path(self, series):
+        return os.path.join(self.directory, f"sgs_{series}.parquet")
+
+    def history(self, series):
+        if series not in self._frames:
+            path = self._path(series)
+            self._frames[series] = pd.read_parquet(path) if os.path.exists(path) else _observations([])
+
+        return self._frames[series]
+
+    def _save(self, series, frame):
+        os.makedirs(self.directory, exist_ok = True)
+
+        # A unique temporary name per writer, so two syncs of the same series never write into each other's file
+        descriptor, temporary_path = tempfile.mkstemp(dir = self.directory, suffix = ".tmp")
+        os.close(descriptor)
+
+        try:
+            frame.to_parquet(temporary_path, index = False)
+            os.replace(temporary_path, self._path(series))
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+        self._frames[series] = frame
+
+    def _windows(self, series, end, window_days):
+        stored = self.history(series)
+        start = stored["date"].max() + pd.Timedelta(days = 1) if len(stored) else pd.Timestamp(SERIES_START[series])
+
+        starts = pd.date_range(start, end, freq = f"{window_days}D")
+        return [(window_start, min(window_start + pd.Timedelta(days = window_days - 1), end)) for window_start in starts]
+
+    async def _sync_series(self, series, end, window_days, semaphore):
+        # Only the days after the last stored observation are requested, a bounded window at a time
+        async def fetch(start, stop):
+            async with semaphore:
+                return await asyncio.to_thread(self.client.window, series, start, stop)
+
+        windows = self._windows(series, end, window_days)
+        try:
+            responses = await asyncio.gather(*(fetch(start, stop) for start, stop in windows))
+        except requests.RequestException:
+            # Nothing is written, so the store keeps answering with the history it already has
+            raise ConnectionError(f"Falha ao sincronizar o histórico da série {series} do Banco Central!")
+
+        new = _observations([observation for data in responses for observation in data])
+        if new.empty:
+            return 0
+
+        stored = self.history(series)
+        frame = pd.concat([stored, new[new["date"] > stored["date"].max()] if len(stored) else new], ignore_index = True)
+        frame = frame.drop_duplicates("date", keep = "last").sort_values("date", ignore_index = True)
+        self._save(series, frame)
+
+        return len(frame) - len(stored)
+
+    async def sync_async(self, series = (SELIC, IPCA), end = None, window_days = None, concurrency = None):
+        end = pd.Timestamp.today().normalize() if end is None else pd.Timestamp(end)
+        semaphore = asyncio.Semaphore(SYNC_CONCURRENCY if concurrency is None else concurrency)
+
+        counts = await asyncio.gather(*(self._sync_series(code, end, SYNC_WINDOW_DAYS if window_days is None else window_days, semaphore) for code in series))
+
+        return dict(zip(series, counts))
+
+    def sync(self, series = (SELIC, IPCA), end = None, window_days = None, concurrency = None):
+        coroutine = self.sync_async(series, end, window_days, concurrency)
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+
+        # Inside a notebook the event loop is already running, so the sync gets a thread of its own
+        with ThreadPoolExecutor(max_workers = 1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+
+    def _available_dates(self, series):
+        # SGS dates an IPCA observation on the first day of its reference month, weeks before anyone could know it
+        dates = self.history(series)["date"]
+
+        if series == IPCA:
+            return (dates + pd.offsets.MonthBegin(1) + pd.Timedelta(days = IPCA_PUBLICATION_LAG_DAYS)).values
+        return dates.values
+
+    def _as_of(self, series, values, dates):
+        # Last observation available on or before every date; dates before the first one get NaN
+        positions = np.searchsorted(self._available_dates(series), pd.to_datetime(np.atleast_1d(dates)).values, side = "right") - 1
+
+        return np.where(positions >= 0, np.asarray(values)[np.clip(positions, 0, None)], np.nan)
+
+    def selic_rate(self, dates):
+        return self._as_of(SELIC, self.history(SELIC)["value"].values / 100, dates)
+
+    def ipca_12_months(self, dates, months = 12):
+        # Compounded over the last twelve published reference months, as a rolling sum of log(1 + monthly rate)
+        monthly = np.log1p(self.history(IPCA)["value"].values / 100)
+        rolling = np.full(len(monthly), np.nan)
+
+        if len(monthly) >= months:
+            cumulative = np.concatenate([[0.0], np.cumsum(monthly)])
+            rolling[months - 1:] = np.expm1(cumulative[months:] - cumulative[:-months])
+
+        return self._as_of(IPCA, rolling, dates)
+
+    def rates_as_of(self, dates):
+        # Point-in-time rates answered from the store alone, for one date or an array of them
+        selic = self.selic_rate(dates)
+        ipca = self.ipca_12_months(dates)
+
+        if np.ndim(dates) == 0:
+            return {"selic": selic[0], "ipca_12_months": ipca[0]}
+
+        return pd.DataFrame({"date": pd.to_datetime(np.atleast_1d(dates)), "selic": selic, "ipca_12_months": ipca})
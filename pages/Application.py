@@ -2,8 +2,18 @@ import streamlit as st
 import base64
 import streamlit.components.v1 as components
 from streamlit.components.v1 import html
+import os
 import time
-import Conector as con
+import threading
+
+# Serve precomputed mode: with CONECTOR_ARTIFACTS pointing at a directory written by Artifacts.py,
+# the pipeline (and with it pygam and statsmodels) is never imported
+ARTIFACTS_DIRECTORY = os.environ.get("CONECTOR_ARTIFACTS")
+
+if ARTIFACTS_DIRECTORY:
+    import Artifacts as art
+else:
+    import Conector as con
 
 # ========================= 1. PAGE CONFIGURATION AND STYLE LOADING =========================
 st.set_page_config(
@@ -28,6 +38,52 @@ def load_css(file_name):
     except FileNotFoundError:
         pass
 
+@st.cache_data(max_entries = 16, show_spinner = False)
+def load_image_base64(file_name):
+    with open(file_name, "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+# Pipeline results are shared by every session and keyed on the fingerprint of the data file
+@st.cache_resource(show_spinner = False)
+def pipeline_state():
+    return {"fingerprint": None, "lock": threading.Lock()}
+
+def data_fingerprint():
+    if ARTIFACTS_DIRECTORY:
+        fingerprint = art.load_manifest(ARTIFACTS_DIRECTORY)["fingerprint"]
+    else:
+        fingerprint = con.data_fingerprint()
+    state = pipeline_state()
+
+    with state["lock"]:
+        if state["fingerprint"] != fingerprint:
+            # The data file changed, so nothing computed from the previous version is served again
+            if not ARTIFACTS_DIRECTORY:
+                con.reset()
+            load_artifact.clear()
+            load_excel.clear()
+            simulate_cash_flow.clear()
+            state["fingerprint"] = fingerprint
+
+    return fingerprint
+
+@st.cache_resource(max_entries = 32, show_spinner = False)
+def load_artifact(name, fingerprint):
+    if ARTIFACTS_DIRECTORY:
+        return art.load_artifact(name, ARTIFACTS_DIRECTORY)
+    return getattr(con, name)
+
+@st.cache_data(max_entries = 4, show_spinner = False)
+def load_excel(fingerprint):
+    if ARTIFACTS_DIRECTORY:
+        return art.load_deliverable(ARTIFACTS_DIRECTORY)
+    return con.buffer_excel_formatted(load_artifact("comparison_table", fingerprint))
+
+# Rerun on every change of the assumptions; 100k simulated paths take a fraction of a second
+@st.cache_data(max_entries = 64, show_spinner = False)
+def simulate_cash_flow(fingerprint, revenue_growth, expense_growth, volatility):
+    return con.simulate_projected_cash_flow(revenue_growth, expense_growth, volatility)
+
 # ======================== 2. SESSION STATE INITIALIZATION ========================
 
 # Controls the user's login state
@@ -173,8 +229,7 @@ def main_app():
 
         # Loading the sidebar header logo
         try:
-            with open("media/Cabecalho.svg", "rb") as f:
-                image_base64 = base64.b64encode(f.read()).decode()
+            image_base64 = load_image_base64("media/Cabecalho.svg")
             st.markdown(
                 f"""
                 <div class="logo-container" style='text-align: center; margin-bottom: -15rem; z-index: 1; margin-top: -4rem; cursor : pointer;'>
@@ -223,7 +278,7 @@ def main_app():
             unsafe_allow_html=True
         )
 
-    database = con.database_revenue
+    fingerprint = data_fingerprint()
 
     # ======================== APP SECTIONS ========================
 
@@ -231,6 +286,7 @@ def main_app():
     if st.session_state.current_section == "Introdução":
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.markdown("Qual é a fundamentação do estudo?")
+        database = load_artifact("database_revenue", fingerprint)
         st.dataframe(database.sample(25).style.format({
                                                 "date": "{:%d/%m/%Y}",
                                                 "price": "{:,.2f}"}, thousands=".", decimal=","),
@@ -241,45 +297,49 @@ def main_app():
     elif st.session_state.current_section == "Análise Exploratória":
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.subheader("Relação entre Quantidade Vendida e Preço por Item de Café (Demandas inversas)")
-        st.plotly_chart(con.figure1, use_container_width=True)
+        st.plotly_chart(load_artifact("figure1", fingerprint), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.subheader("Distribuições de Preços")
-        st.plotly_chart(con.figure2, use_container_width=True)
+        st.plotly_chart(load_artifact("figure2", fingerprint), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.subheader("Análise Exploratória — Receitas Acumuladas")
-        st.plotly_chart(con.figure4, use_container_width=True)
+        st.plotly_chart(load_artifact("figure4", fingerprint), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.subheader("Análise Exploratória — Receitas Diárias")
-        st.plotly_chart(con.figure5, use_container_width=True)
+        st.plotly_chart(load_artifact("figure5", fingerprint), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.subheader("Análise Exploratória — Receita por Dia da Semana")
-        st.plotly_chart(con.figure6, use_container_width=True)
+        st.plotly_chart(load_artifact("figure6", fingerprint), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.subheader("Análise Exploratória — Participação na Receita (Semanal)")
-        st.plotly_chart(con.figure7, use_container_width=True)
+        st.plotly_chart(load_artifact("figure7", fingerprint), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
     # Section: Elasticidades
     elif st.session_state.current_section == "Elasticidades":
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.subheader("Elasticidades-preço da Demanda Atuais")
-        st.plotly_chart(con.figure3, use_container_width=True)
+        st.plotly_chart(load_artifact("figure3", fingerprint), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.subheader("Elasticidades-preço nos Pontos Ótimos")
-        st.plotly_chart(con.figure9, use_container_width=True)
+        st.plotly_chart(load_artifact("figure9", fingerprint), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
     # Section: Forecasting
     elif st.session_state.current_section == "Forecasting":
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.subheader("Otimização de Preços Usando Modelos Aditivos Generalizados (GAM)")
-        st.plotly_chart(con.figure8, use_container_width=True)
+        st.plotly_chart(load_artifact("figure8", fingerprint), use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+        st.markdown('<div class="graph-container">', unsafe_allow_html=True)
+        st.subheader("Previsão de Vendas Diárias por Item")
+        st.plotly_chart(load_artifact("figure15", fingerprint), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
     # Section: Gerencial
@@ -287,43 +347,66 @@ def main_app():
         st.subheader("Fluxo de caixa")
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.text("Esse é o fluxo dos últimos x períodos.")
-        st.plotly_chart(con.figure11, use_container_width=True)
+        st.plotly_chart(load_artifact("figure11", fingerprint), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown("---")
         st.subheader("Liquidez")
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.text("Aqui mostra a capacidade de liquidar as suas dívidas(passivos).")
-        st.plotly_chart(con.figure12, use_container_width=True)
+        st.plotly_chart(load_artifact("figure12", fingerprint), use_container_width=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+        st.markdown("---")
+        st.markdown('<div class="graph-container">', unsafe_allow_html=True)
+        st.subheader("Indicadores Financeiros")
+        st.text("Liquidez, endividamento, capital de giro e giro do ativo por trimestre do balanço.")
+        financial_ratios = load_artifact("financial_ratios", fingerprint)
+        st.dataframe(financial_ratios.pivot(index="ratio", columns="period", values="value")
+                     .reindex(index=financial_ratios["ratio"].unique(), columns=financial_ratios["period"].unique())
+                     .rename_axis(index="Indicador", columns="Trimestre"), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown("---")
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.subheader("Fluxo de Caixa Projetado")
-        st.text("Projeção do resultado da empresa pelos próximos x períodos")
-        st.table(con.projected_cash_flow)
+        st.text("Trajetória mediana (P50) do resultado nos próximos cinco anos, com crescimento estimado a partir do histórico")
+        st.table(load_artifact("projected_cash_flow", fingerprint))
+        st.markdown('</div>', unsafe_allow_html=True)
+        st.markdown("---")
+        st.markdown('<div class="graph-container">', unsafe_allow_html=True)
+        st.subheader("Fluxo de Caixa Simulado")
+        st.text("Faixas de percentis (P5, P50 e P95) de trajetórias de crescimento estimadas a partir do histórico")
+        if ARTIFACTS_DIRECTORY:
+            st.table(load_artifact("simulated_cash_flow", fingerprint))
+        else:
+            growth_mean, _ = load_artifact("cash_flow_growth", fingerprint)
+            columns = st.columns(3)
+            revenue_growth = columns[0].slider("Crescimento das receitas (% a.a.)", -50.0, 100.0, min(max(round(float(growth_mean[0]) * 100, 1), -50.0), 100.0), 0.5)
+            expense_growth = columns[1].slider("Crescimento das despesas (% a.a.)", -50.0, 100.0, min(max(round(float(growth_mean[1]) * 100, 1), -50.0), 100.0), 0.5)
+            volatility = columns[2].slider("Volatilidade (× histórica)", 0.1, 3.0, 1.0, 0.1)
+            st.table(simulate_cash_flow(fingerprint, revenue_growth / 100, expense_growth / 100, volatility))
         st.markdown('</div>', unsafe_allow_html=True)
         st.markdown("---")
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.subheader("Controle Gerencial de Estoques por Produto")
-        st.plotly_chart(con.figure13, use_container_width=True)
+        st.plotly_chart(load_artifact("figure13", fingerprint), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
     # Section: Decomposição
     elif st.session_state.current_section == "Decomposição":
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
         st.subheader("Decomposição: Tendência, Sazonalidade e Resíduo")
-        st.plotly_chart(con.figure10, use_container_width=True)
+        st.plotly_chart(load_artifact("figure10", fingerprint), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
     # Section: Entregáveis
     elif st.session_state.current_section == "Entregáveis":
         st.markdown('<div class="graph-container">', unsafe_allow_html=True)
-        st.dataframe(con.comparison_table, hide_index=True, use_container_width=True)
+        st.dataframe(load_artifact("comparison_table", fingerprint), hide_index=True, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
         col1, col2 = st.columns([8,1])
         with col2:
             st.download_button(
                 label="Baixar",
-                data=con.buffer_excel_formatted(con.comparison_table),
+                data=load_excel(fingerprint),
                 file_name="Projeções.xlsx",
                 mime="text/csv",
                 )
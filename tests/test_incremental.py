@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import pytest
+import Incremental as inc
+
+# ======================== 1. SYNTHETIC SOURCE ========================
+
+def make_revenue(days = 80, seed = 0):
+    # Several sales a day over three months, in date order like the revenue sheet; "Mocha" starts selling late
+    random = np.random.default_rng(seed)
+    rows = []
+
+    for day in pd.date_range("2024-01-03", periods = days, freq = "D"):
+        items = ["Café", "Cappuccino", "Latte"] + (["Mocha"] if day >= pd.Timestamp("2024-03-10") else [])
+        for _ in range(random.integers(0, 6)):
+            item = items[random.integers(len(items))]
+            rows.append({"date": day, "price": float(random.choice([4.5, 5.0, 7.25])), "item": item})
+
+    revenue = pd.DataFrame(rows)
+    revenue["item"] = revenue["item"].astype("category")
+    return revenue
+
+def make_expense(revenue, seed = 1):
+    # Purchases are not date-sorted, like the expense sheet, and include a material that is never sold
+    random = np.random.default_rng(seed)
+    dates = revenue["date"].unique()
+    materials = list(revenue["item"].cat.categories) + ["Copos"]
+
+    expense = pd.DataFrame({
+        "date": random.choice(dates, 60),
+        "material": random.choice(materials, 60),
+        "quantity_purchased": random.integers(1, 20, 60).astype(float),
+        "subtotal": random.integers(10, 200, 60).astype(float)
+    })
+    expense["material"] = expense["material"].astype("category")
+    return expense
+
+def assert_same_state(directory, reference_directory):
+    for name in inc.COLUMNS:
+        pd.testing.assert_frame_equal(inc.load_aggregate(name, directory), inc.load_aggregate(name, reference_directory),
+                                      check_dtype = False, check_exact = False, rtol = 1e-9, obj = name)
+
+@pytest.fixture
+def source():
+    revenue = make_revenue()
+    return revenue, make_expense(revenue)
+
+@pytest.fixture
+def reference(source, tmp_path):
+    directory = str(tmp_path / "reference")
+    inc.update_aggregates(*source, directory)
+    return directory
+
+def mid_day_split(revenue):
+    # A row in the middle of a day with several sales, so the day is split between the two runs
+    counts = revenue.groupby("date").cumcount()
+    return int(counts[(counts == 1) & (revenue["date"] > pd.Timestamp("2024-03-12"))].index[0])
+
+# ======================== 2. TWO RUNS AGAINST A FULL REBUILD ========================
+
+def test_whole_history_split_mid_day(source, reference, tmp_path):
+    revenue, expense = source
+    split = mid_day_split(revenue)
+    directory = str(tmp_path / "state")
+
+    inc.update_aggregates(revenue.iloc[:split], expense.iloc[:40], directory)
+    inc.update_aggregates(revenue, expense, directory)
+
+    assert_same_state(directory, reference)
+    assert inc.ingested_rows(directory) == {"revenue": len(revenue), "expense": len(expense)}
+
+def test_appended_exports_split_mid_day(source, reference, tmp_path):
+    revenue, expense = source
+    split = mid_day_split(revenue)
+    directory = str(tmp_path / "state")
+
+    inc.update_aggregates(revenue.iloc[:split], expense.iloc[:40], directory)
+    offsets = inc.ingested_rows(directory)
+    inc.update_aggregates(revenue.iloc[offsets["revenue"]:], expense.iloc[offsets["expense"]:], directory,
+                          revenue_offset = offsets["revenue"], expense_offset = offsets["expense"])
+
+    assert_same_state(directory, reference)
+
+def test_one_run_per_day(source, reference, tmp_path):
+    revenue, expense = source
+    directory = str(tmp_path / "state")
+
+    for day in sorted(revenue["date"].unique()):
+        inc.update_aggregates(revenue[revenue["date"] <= day], expense[expense["date"] <= day].iloc[:0], directory)
+    inc.update_aggregates(revenue, expense, directory)
+
+    assert_same_state(directory, reference)
+
+def test_new_item_in_second_run(source, reference, tmp_path):
+    revenue, expense = source
+    before_mocha = int((revenue["date"] < pd.Timestamp("2024-03-10")).sum())
+    directory = str(tmp_path / "state")
+
+    inc.update_aggregates(revenue.iloc[:before_mocha], expense.iloc[:0], directory)
+    assert "Mocha" not in inc.load_aggregate("inventory", directory)["item"].values
+
+    inc.update_aggregates(revenue, expense, directory)
+
+    assert_same_state(directory, reference)
+
+def test_missing_rows_are_refused(source, tmp_path):
+    revenue, expense = source
+    directory = str(tmp_path / "state")
+
+    inc.update_aggregates(revenue.iloc[:100], expense.iloc[:10], directory)
+
+    with pytest.raises(ValueError):
+        inc.update_aggregates(revenue.iloc[120:], expense.iloc[10:], directory, revenue_offset = 120, expense_offset = 10)
+    with pytest.raises(ValueError):
+        inc.update_aggregates(revenue.iloc[:50], expense, directory)
+
+# ======================== 3. REFRESH COST ========================
+
+def test_refresh_rewrites_only_the_open_month(source, tmp_path, monkeypatch):
+    revenue, expense = source
+    last_day = revenue["date"].max()
+    directory = str(tmp_path / "state")
+
+    inc.update_aggregates(revenue[revenue["date"] < last_day], expense.iloc[:0], directory)
+
+    read, written = [], []
+    read_parquet, write_frame = pd.read_parquet, inc._write_frame
+    monkeypatch.setattr(pd, "read_parquet", lambda path, *args, **kwargs: read.append(path) or read_parquet(path, *args, **kwargs))
+    monkeypatch.setattr(inc, "_write_frame", lambda frame, path: written.append(path) or write_frame(frame, path))
+
+    offsets = inc.ingested_rows(directory)
+    inc.update_aggregates(revenue.iloc[offsets["revenue"]:], expense.iloc[:0], directory, revenue_offset = offsets["revenue"])
+
+    open_month = last_day.strftime("%Y-%m")
+    partitions = [path for path in read + written if path.endswith(".parquet") and "summary" not in path and "totals" not in path]
+
+    assert partitions
+    assert all(path.endswith(f"{open_month}.parquet") for path in partitions)
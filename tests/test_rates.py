@@ -0,0 +1,108 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import Rates as rt
+
+# ======================== 1. STUB SGS SERVER ========================
+
+SERIES_DATA = {
+    rt.SELIC: [{"data": "02/01/2025", "valor": "12.25"}],
+    rt.IPCA: [{"data": f"01/{month:02d}/2024", "valor": "0.5"} for month in range(1, 13)]
+}
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.paths.append(self.path.split("?")[0])
+        series = int(self.path.split("bcdata.sgs.")[1].split("/")[0])
+        body = json.dumps(SERIES_DATA[series]).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    stub.paths = []
+    thread = threading.Thread(target = stub.serve_forever, daemon = True)
+    thread.start()
+
+    yield stub
+
+    stub.shutdown()
+    stub.server_close()
+
+def make_client(server, cache_directory, ttl = 60):
+    return rt.RateClient(base_url = f"http://127.0.0.1:{server.server_address[1]}/dados/serie",
+                         cache_directory = str(cache_directory), ttl = ttl, timeout = 2, retries = 0)
+
+def counted(client):
+    calls = []
+    get = client.session.get
+
+    def counting_get(*args, **kwargs):
+        calls.append(args[0])
+        return get(*args, **kwargs)
+
+    client.session.get = counting_get
+    return calls
+
+# ======================== 2. RATE CLIENT ========================
+
+def test_both_series_come_through_the_pooled_session(server, tmp_path):
+    client = make_client(server, tmp_path)
+    calls = counted(client)
+
+    rates = client.rates()
+
+    assert rates["selic"] == pytest.approx(0.1225)
+    assert rates["ipca_12_months"] == pytest.approx(1.005 ** 12 - 1)
+    assert sorted(server.paths) == ["/dados/serie/bcdata.sgs.432/dados/ultimos/1", "/dados/serie/bcdata.sgs.433/dados/ultimos/12"]
+    assert len(calls) == 2
+
+def test_fresh_cache_makes_no_request(server, tmp_path):
+    make_client(server, tmp_path).rates()
+
+    # A new client finds the disk cache within the TTL, and its own memory on the second call
+    client = make_client(server, tmp_path)
+    calls = counted(client)
+    client.rates()
+    client.rates()
+
+    assert calls == []
+    assert len(server.paths) == 2
+
+def test_offline_serves_the_stale_cache(server, tmp_path):
+    expected = make_client(server, tmp_path).rates()
+
+    server.shutdown()
+    server.server_close()
+
+    client = make_client(server, tmp_path, ttl = 0)
+    calls = counted(client)
+
+    assert client.rates() == expected
+    assert len(calls) == 2
+
+def test_stale_memory_rereads_a_fresher_disk_entry(server, tmp_path):
+    client = make_client(server, tmp_path, ttl = 60)
+    client.selic_rate()
+
+    # Another process refreshed the cache after this client's copy went stale
+    client._memory[(rt.SELIC, 1)]["fetched_at"] -= 120
+    record = client._read_cache(rt.SELIC, 1)
+    record["data"] = [{"data": "03/01/2025", "valor": "13.25"}]
+    client._write_cache(rt.SELIC, 1, record)
+
+    calls = counted(client)
+
+    assert client.selic_rate() == pytest.approx(0.1325)
+    assert calls == []